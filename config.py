@@ -6,6 +6,14 @@ GAMMA_API_BASE = "https://gamma-api.polymarket.com"
 CLOB_API_BASE = "https://clob.polymarket.com"
 DATA_API_BASE = "https://data-api.polymarket.com"
 
+# 设置 POLYMARKET_MOCK_URL（如 http://127.0.0.1:8780）后，所有 REST / 订单簿 WebSocket
+# 都指向本地模拟服务器（python -m src.mock_server），用于离线压测与回归
+MOCK_API_URL = os.environ.get("POLYMARKET_MOCK_URL", "").rstrip("/")
+if MOCK_API_URL:
+    GAMMA_API_BASE = f"{MOCK_API_URL}/gamma"
+    CLOB_API_BASE = f"{MOCK_API_URL}/clob"
+    DATA_API_BASE = f"{MOCK_API_URL}/data"
+
 SPORTS_URL = f"{GAMMA_API_BASE}/sports"
 SPORTS_MARKET_TYPES_URL = f"{GAMMA_API_BASE}/sports/market-types"
 EVENTS_URL = f"{GAMMA_API_BASE}/events"
@@ -19,6 +27,8 @@ TRADES_URL = f"{DATA_API_BASE}/trades"
 
 # ── WebSocket ─────────────────────────────────────────────
 WS_MARKET_URL = "wss://ws-subscriptions-clob.polymarket.com/ws/market"
+if MOCK_API_URL:
+    WS_MARKET_URL = MOCK_API_URL.replace("http", "ws", 1) + "/ws/market"
 WS_SPORTS_URL = "wss://sports-api.polymarket.com/ws"
 
 # ── 分页与速率控制 ────────────────────────────────────────
@@ -26,16 +36,118 @@ EVENTS_PAGE_SIZE = 100
 TRADES_PAGE_SIZE = 1000
 TRADES_MAX_OFFSET = 3000       # offset + limit >= 4000 → 400 error
 BOOKS_BATCH_SIZE = 100         # 每批 order book 查询数量（上限 500）
+DISCOVERY_TAG_WORKERS = 4      # discover 多个运动时同时抓取的 tag 数
+EVENTS_PREFETCH_PAGES = 3      # 每个 tag 预取的 /events 页数（当前页入库时后续页已在下载）
+EVENTS_PROGRESS_EVERY = 10     # 每入库多少页写一次断点（中断时最多重抓这么多页）
+MARKETS_REFRESH_BATCH = 100    # refresh 每个 /markets 请求查询的市场 id 数
+MARKETS_REFRESH_WORKERS = 4    # refresh 同时在途的 /markets 批次数
 
-REQUEST_DELAY = 0.35           # 请求间隔（秒）
+REQUEST_DELAY = 0.35           # 未配置 host 的请求间隔（秒）
 MAX_RETRIES = 5
 RETRY_BACKOFF = 0.8            # 指数退避因子
 
+# 每个 API host 独立的令牌桶: (初始速率 请求/秒, 突发容量)
+RATE_LIMITS = {
+    GAMMA_API_BASE: (4.0, 8),
+    CLOB_API_BASE: (4.0, 8),
+    DATA_API_BASE: (3.0, 6),
+}
+RATE_LIMIT_MIN = 0.5           # 自适应速率下限（请求/秒）
+RATE_LIMIT_MAX_FACTOR = 3.0    # 自适应速率上限 = 初始速率 × 该系数
+RATE_LIMIT_INCREASE = 0.25     # 加性增：每个成功窗口提升的速率
+RATE_LIMIT_DECREASE = 0.5      # 乘性减：每次 429 后的速率系数
+RATE_LIMIT_SUCCESS_WINDOW = 20 # 连续成功多少次后提速一次
+
+HTTP_MAX_INFLIGHT_PER_HOST = 8 # 异步引擎每个 host 的最大并发请求数
+HTTP_KEEPALIVE_TIMEOUT = 30    # keep-alive 连接空闲保持时间（秒）
+HTTP_SINGLE_FLIGHT = True      # 合并并发进行中的相同请求
+
 # ── 路径 ──────────────────────────────────────────────────
 PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
 DATA_DIR = os.path.join(PROJECT_ROOT, "data")
 DB_PATH = os.path.join(DATA_DIR, "polymarket_sports.db")
 SNAPSHOTS_DIR = os.path.join(DATA_DIR, "orderbook_snapshots")
+SPORTS_CACHE_PATH = os.path.join(DATA_DIR, "sport_tags.json")
+
+# ── 存储后端 ──────────────────────────────────────────────
+# sqlite: 默认，行存 + 单写线程 + 按日分区；duckdb: 列存单文件（需 pip install duckdb），适合大规模历史采集后
+# 的扫描与聚合，可用 --storage 覆盖。两种库互不相通，切换后需重新采集（或自行导入）
+STORAGE_BACKEND = "sqlite"
+DUCKDB_PATH = os.path.join(DATA_DIR, "polymarket_sports.duckdb")
+
+# ── 订单簿存储 ────────────────────────────────────────────
+ORDERBOOK_LEVEL_ENCODING = "json"     # json: bids_json/asks_json 文本；binary: 定点打包的 book_blob
+ORDERBOOK_LEVEL_COMPRESSION = "none"  # binary 模式下 body 的压缩: none / zlib / zstd（需 zstandard）
+ORDERBOOK_DELTA_ENABLED = False       # 增量存储：关键帧之间只写变化的档位
+ORDERBOOK_KEYFRAME_EVERY = 30         # 每个 token 每多少条快照写一次完整关键帧
+ORDERBOOK_KEYFRAME_SECONDS = 600      # 距上个关键帧超过多少秒时写新关键帧
+ORDERBOOK_DELTA_MAX_RATIO = 0.5       # 变化档位数超过完整档位数的该比例时直接写关键帧
+
+# ── 分区与保留 ────────────────────────────────────────────
+STORAGE_PARTITION_BY_DAY = True       # 快照/成交按 UTC 日写入 orderbook_snapshots_YYYYMMDD / trades_YYYYMMDD
+RETENTION_DOWNSAMPLE_DAYS = 7         # 早于该天数的快照分区降采样
+RETENTION_DOWNSAMPLE_SECONDS = 60     # 降采样后每个 token 每多少秒保留一条快照
+RETENTION_SNAPSHOT_DAYS = 90          # 早于该天数的快照分区删除（None = 永久保留）
+RETENTION_TRADE_DAYS = None           # 早于该天数的成交分区删除（None = 永久保留）
+RETENTION_ARCHIVE = True              # 删除前把分区复制到 ARCHIVE_DIR/<表名>.db
+ARCHIVE_DIR = os.path.join(DATA_DIR, "archive")
+
+# ── K 线 ──────────────────────────────────────────────────
+CANDLE_INTERVALS = (60, 300, 3600)    # 随写入增量维护的 K 线周期（秒，须整除 86400）；空元组关闭
+
+# ── SQLite 写入线程 ───────────────────────────────────────
+DB_WRITER_QUEUE_SIZE = 1000    # 写入队列上限（请求数），满时生产者阻塞
+DB_WRITER_GROUP_ROWS = 5000    # 单次提交最多合并的行数
+DB_WRITER_GROUP_MS = 200       # 无同步等待者时，一组最多攒多久再提交（毫秒）
+TRADE_DEDUP_ENABLED = True     # 写入成交前先用内存指纹集合剔除已入库的重复成交
+TRADE_DEDUP_CAPACITY = 2_000_000  # 指纹集合上限（两代轮换，约 70 B/条）；关闭时存为 <库名>.trade_dedup
+
+# ── SQLite 性能配置 ───────────────────────────────────────
+# 每个连接（写线程、只读连接、管理连接）打开时按所选配置设置 PRAGMA；可用 --db-profile 覆盖。
+#   page_size           新建库的页大小（已有库需 VACUUM 后生效）
+#   cache_size_kb       每个连接的页缓存（KiB）
+#   mmap_bytes          内存映射读取上限（字节，0 = 不用 mmap）
+#   temp_store          临时表/排序的位置: DEFAULT / FILE / MEMORY
+#   synchronous         写连接的同步级别: OFF / NORMAL / FULL
+#   wal_autocheckpoint  WAL 达到多少页时自动检查点（0 = 不自动）
+#   checkpoint          auto: 只靠自动检查点；truncate: 另在 close_db 时 TRUNCATE 检查点，清空 WAL 文件
+SQLITE_PROFILE = "default"
+SQLITE_PROFILES = {
+    "default": {   # 通用：WAL + NORMAL，只读连接用较大缓存与 mmap
+        "page_size": 4096, "cache_size_kb": 64 * 1024, "mmap_bytes": 256 * 1024 * 1024,
+        "temp_store": "MEMORY", "synchronous": "NORMAL", "wal_autocheckpoint": 1000, "checkpoint": "auto",
+    },
+    "ingest": {    # 持续高吞吐采集：检查点间隔拉长（WAL 最多约 160MB），结束时截断 WAL
+        "page_size": 8192, "cache_size_kb": 128 * 1024, "mmap_bytes": 0,
+        "temp_store": "MEMORY", "synchronous": "NORMAL", "wal_autocheckpoint": 20000, "checkpoint": "truncate",
+    },
+    "analytics": {  # 导出/分析：大页、大缓存、大 mmap，加快区间扫描
+        "page_size": 16384, "cache_size_kb": 512 * 1024, "mmap_bytes": 4 * 1024 ** 3,
+        "temp_store": "MEMORY", "synchronous": "NORMAL", "wal_autocheckpoint": 1000, "checkpoint": "auto",
+    },
+    "safe": {      # 每次提交都落盘，断电不丢已提交事务
+        "page_size": 4096, "cache_size_kb": 16 * 1024, "mmap_bytes": 0,
+        "temp_store": "DEFAULT", "synchronous": "FULL", "wal_autocheckpoint": 1000, "checkpoint": "truncate",
+    },
+}
+
+# ── HTTP 响应缓存 ─────────────────────────────────────────
+HTTP_CACHE_ENABLED = True
+HTTP_CACHE_PATH = os.path.join(DATA_DIR, "http_cache.db")
+HTTP_CACHE_MAX_BYTES = 512 * 1024 * 1024
+HTTP_CACHE_TTLS = {            # Gamma 路径前缀 → TTL（秒），最长前缀优先
+    "/sports": 24 * 3600,
+    "/teams": 24 * 3600,
+    "/events": 5 * 60,
+}
+HTTP_CACHE_CLOSED_TTL = 30 * 24 * 3600  # 全部为已关闭事件的 /events 页（历史数据不再变化）
+SPORTS_TAG_MAP_TTL = 24 * 3600  # sport → tag_ids 映射（进程内缓存与 SPORTS_CACHE_PATH 热启动文件）的有效期
+
+# ── 请求指标 ──────────────────────────────────────────────
+METRICS_INTERVAL = 60          # --metrics 模式下定期导出的间隔（秒）
+
+# ── 本地模拟服务器 ────────────────────────────────────────
+MOCK_SERVER_PORT = 8780
 
 # ── Polygon 链上监听 ─────────────────────────────────────
 CTF_EXCHANGE = "0x4bfb41d5b3570defd03c39a9a4d8de6bd8b8982e"
@@ -11,15 +11,15 @@ import os
 import sqlite3
 from datetime import datetime, timezone
 
-from config import DB_PATH
+from src.database import close_db, get_reader, partition_tables
+from src.orderbook.delta import reconstruct_levels
 
 SAMPLE_DIR = os.path.expanduser("~/Desktop/polymarket_sample_data")
 
 
 def main():
     os.makedirs(SAMPLE_DIR, exist_ok=True)
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
+    conn = get_reader()
 
     print("=" * 60)
     print("  Polymarket 体育数据 — 样本数据生成")
@@ -45,25 +45,29 @@ def main():
     print(f"[2/6] 市场样本 → {markets_path} ({len(markets)} 条)")
 
     # ── 3. 订单簿样本（选取有深度的 20 个快照）──────────────
-    orderbooks = conn.execute(
-        "SELECT * FROM orderbook_snapshots "
-        "WHERE total_bid_depth > 0 AND total_ask_depth > 0 "
-        "ORDER BY total_bid_depth + total_ask_depth DESC LIMIT 20"
-    ).fetchall()
+    orderbooks = sorted(
+        (
+            {**dict(r), "_table": table}
+            for table in partition_tables(conn, "orderbook_snapshots")
+            for r in conn.execute(
+                f"SELECT * FROM {table} "
+                "WHERE total_bid_depth > 0 AND total_ask_depth > 0 "
+                "ORDER BY total_bid_depth + total_ask_depth DESC LIMIT 20"
+            )
+        ),
+        key=lambda d: d["total_bid_depth"] + d["total_ask_depth"], reverse=True,
+    )[:20]
     ob_path = os.path.join(SAMPLE_DIR, "sample_orderbooks.csv")
-    _write_ob_csv(ob_path, orderbooks)
+    _write_ob_csv(ob_path, orderbooks, conn)
     print(f"[3/6] 订单簿样本(摘要) → {ob_path} ({len(orderbooks)} 条)")
 
     # ── 4. 订单簿完整样本（含 bids/asks 明细，JSON）────────
     ob_full = []
     for row in orderbooks[:5]:
         d = dict(row)
-        try:
-            d["bids"] = json.loads(d.pop("bids_json", "[]"))
-            d["asks"] = json.loads(d.pop("asks_json", "[]"))
-        except (json.JSONDecodeError, TypeError):
-            d["bids"] = []
-            d["asks"] = []
+        d["bids"], d["asks"] = reconstruct_levels(conn, d, table=d["_table"]) or ([], [])
+        for col in ("bids_json", "asks_json", "book_blob", "base_time", "_table"):
+            d.pop(col, None)
         ob_full.append(d)
     ob_full_path = os.path.join(SAMPLE_DIR, "sample_orderbooks_full.json")
     with open(ob_full_path, "w", encoding="utf-8") as f:
@@ -76,15 +80,19 @@ def main():
         if len(markets) > 1:
             sample_conds.append(markets[1]["condition_id"])
         ph = ",".join("?" * len(sample_conds))
-        trades = conn.execute(
-            f"SELECT * FROM trades WHERE condition_id IN ({ph}) "
-            "ORDER BY trade_timestamp",
-            sample_conds,
-        ).fetchall()
+        trades = [
+            r for table in partition_tables(conn, "trades")
+            for r in conn.execute(
+                f"SELECT * FROM {table} WHERE condition_id IN ({ph}) "
+                "ORDER BY trade_timestamp",
+                sample_conds,
+            )
+        ]
     else:
-        trades = conn.execute(
-            "SELECT * FROM trades ORDER BY trade_timestamp LIMIT 500"
-        ).fetchall()
+        trades = [
+            r for table in partition_tables(conn, "trades")
+            for r in conn.execute(f"SELECT * FROM {table} ORDER BY trade_timestamp LIMIT 500")
+        ][:500]
     trades_path = os.path.join(SAMPLE_DIR, "sample_trades.csv")
     _write_csv(trades_path, trades)
     print(f"[5/6] 成交样本 → {trades_path} ({len(trades)} 条)")
@@ -92,8 +100,10 @@ def main():
     # ── 6. TXT 说明文件 ──────────────────────────────────────
     total_events = conn.execute("SELECT COUNT(*) FROM events").fetchone()[0]
     total_markets = conn.execute("SELECT COUNT(*) FROM markets").fetchone()[0]
-    total_snapshots = conn.execute("SELECT COUNT(*) FROM orderbook_snapshots").fetchone()[0]
-    total_trades = conn.execute("SELECT COUNT(*) FROM trades").fetchone()[0]
+    total_snapshots = sum(conn.execute(f"SELECT COUNT(*) FROM {t}").fetchone()[0]
+                          for t in partition_tables(conn, "orderbook_snapshots"))
+    total_trades = sum(conn.execute(f"SELECT COUNT(*) FROM {t}").fetchone()[0]
+                       for t in partition_tables(conn, "trades"))
 
     txt_path = os.path.join(SAMPLE_DIR, "样本数据说明.txt")
     now = datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M UTC")
@@ -286,7 +296,7 @@ def main():
         f.write(txt_content)
     print(f"[6/6] 说明文件 → {txt_path}")
 
-    conn.close()
+    close_db()
 
     print(f"\n{'=' * 60}")
     print(f"  所有样本数据已输出到: {SAMPLE_DIR}")
@@ -304,7 +314,7 @@ def _write_csv(path: str, rows: list):
             writer.writerow(dict(r))
 
 
-def _write_ob_csv(path: str, rows: list):
+def _write_ob_csv(path: str, rows: list, conn: sqlite3.Connection):
     """订单簿 CSV：排除 raw JSON，增加价位数统计。"""
     if not rows:
         return
@@ -320,11 +330,7 @@ def _write_ob_csv(path: str, rows: list):
         writer.writeheader()
         for r in rows:
             d = dict(r)
-            try:
-                bids = json.loads(d.get("bids_json", "[]"))
-                asks = json.loads(d.get("asks_json", "[]"))
-            except (json.JSONDecodeError, TypeError):
-                bids, asks = [], []
+            bids, asks = reconstruct_levels(conn, d, table=d["_table"]) or ([], [])
             writer.writerow({
                 "id": d["id"],
                 "token_id": d["token_id"],
@@ -6,6 +6,10 @@ Polymarket 体育赛事预测市场 — 数据采集工具
     python main.py discover                    # 发现所有体育事件和市场
     python main.py discover --sport nba,nfl    # 只发现指定运动
     python main.py discover --active-only      # 只发现当前活跃事件
+    python main.py discover --incremental      # 只抓新事件 + 刷新未关闭事件的状态
+
+    python main.py refresh                     # 只按 id 批量刷新库中未关闭市场的状态
+    python main.py refresh --sport nba         # 只刷新 NBA 的市场
 
     python main.py orderbook                   # 获取订单簿快照
     python main.py orderbook --sport nba       # 只获取 NBA 的订单簿
@@ -30,30 +34,62 @@ Polymarket 体育赛事预测市场 — 数据采集工具
 
     python main.py summary                     # 数据库摘要
     python main.py sports                      # 列出所有可用运动
+
+    python main.py bench writes                # 写入基准 (10k/100k/1M 行, rows/sec)
+    python main.py bench writes --rows 10000 --tables trades
+    python main.py bench books --rows 10000 --depth 15   # 订单簿档位编码: JSON vs 二进制
+    python main.py bench books --churn 0.1     # 相邻快照只变 10% 档位时的增量存储效果
+    python main.py bench queries               # 热点查询的 EXPLAIN QUERY PLAN 与耗时 (默认 2M 行，旧索引 vs 新索引)
+    python main.py bench dedup --rows 200000   # 回放链上回补式重复写入：开/关成交去重过滤器
+    python main.py bench profiles --rows 100000   # 各 SQLite 性能配置的写入速度与区间查询延迟
+    python main.py bench backends --rows 1000000  # SQLite vs DuckDB: 写入速度、库大小、扫描/聚合查询耗时
+    python main.py bench classify --rows 500000   # 事件运动分类: 原始算法 vs 倒排索引分类器
+
+    python main.py migrate-books --to binary --compression zlib --vacuum
+                                               # 把已有快照的档位转为二进制存储
+    python main.py retention                   # 旧快照降采样、过期分区归档后删除（按 config 保留策略）
+    python main.py retention --keep-days 30 --no-archive --vacuum
+    python main.py rebuild-candles             # 由已有成交/快照重建 K 线（首次启用或回补后）
+    python main.py rebuild-candles --from 20250101 --to 20250131
+
+    python main.py --no-cache discover         # 跳过 HTTP 响应缓存与运动 tag 热启动缓存，强制走网络
+    python main.py --metrics prom trades       # 定期导出请求指标到 data/metrics.prom
+    python main.py --db-profile ingest stream-trades --rpc-url wss://...
+                                               # 按 config.SQLITE_PROFILES 中的配置打开数据库
+    python main.py --storage duckdb trades     # 写入 DuckDB 列存库 data/polymarket_sports.duckdb（需 pip install duckdb）
+    python main.py --no-cache --record data/rec.jsonl.gz discover
+                                               # 录制 API 响应，供 python -m src.mock_server --replay 回放
 """
 from __future__ import annotations
 
 import argparse
 import json
+import os
 import sys
 
-from config import DATA_DIR
+from config import (
+    DATA_DIR, MARKETS_REFRESH_BATCH, METRICS_INTERVAL, ORDERBOOK_LEVEL_ENCODING,
+    SQLITE_PROFILE, SQLITE_PROFILES, STORAGE_BACKEND,
+    RETENTION_DOWNSAMPLE_DAYS, RETENTION_DOWNSAMPLE_SECONDS, RETENTION_SNAPSHOT_DAYS, RETENTION_TRADE_DAYS,
+)
 from src.database import (
     init_db, close_db, get_event_count, get_market_count,
     get_snapshot_count, get_trade_count, get_result_count,
-    get_active_markets,
+    get_active_tokens, set_backend, set_profile,
 )
 
 
+def _sport_names(value: str | None) -> list[str] | None:
+    """--sport 参数（逗号分隔）→ 小写运动名列表；未指定返回 None（不过滤）。"""
+    if not value:
+        return None
+    return [s.strip().lower() for s in value.split(",") if s.strip()]
+
+
 def cmd_discover(args):
-    from src.discovery.sports_meta import fetch_sports_metadata
     from src.discovery.events_fetcher import fetch_sports_events
 
-    fetch_sports_metadata()
-
-    sport_names = None
-    if args.sport:
-        sport_names = [s.strip().lower() for s in args.sport.split(",")]
+    sport_names = _sport_names(args.sport)
 
     fetch_sports_events(
         sport_names=sport_names,
@@ -61,35 +97,29 @@ def cmd_discover(args):
         include_closed=not args.active_only,
         resume=not args.no_resume,
         limit=args.limit,
+        incremental=args.incremental,
     )
 
 
+def cmd_refresh(args):
+    from src.discovery.markets_refresh import refresh_open_markets
+
+    refresh_open_markets(_sport_names(args.sport), batch_size=args.batch_size)
+
+
 def cmd_orderbook(args):
     from src.orderbook.rest_fetcher import fetch_all_active_orderbooks
 
     if args.stream:
         _stream_orderbook(args)
     else:
-        fetch_all_active_orderbooks(sport_filter=args.sport)
+        fetch_all_active_orderbooks(_sport_names(args.sport))
 
 
 def _stream_orderbook(args):
     from src.orderbook.ws_streamer import OrderBookStreamer
 
-    markets = get_active_markets()
-    if args.sport:
-        sport_lower = args.sport.lower()
-        markets = [m for m in markets
-                   if sport_lower in (m.get("slug") or "").lower()
-                   or sport_lower in (m.get("question") or "").lower()]
-
-    token_ids = []
-    for m in markets:
-        try:
-            ids = json.loads(m.get("clob_token_ids", "[]"))
-            token_ids.extend([t for t in ids if t])
-        except (json.JSONDecodeError, TypeError):
-            pass
+    token_ids = [t["token_id"] for t in get_active_tokens(_sport_names(args.sport))]
 
     if not token_ids:
         print("[OrderBook] 没有可订阅的 token，请先运行 discover 命令")
@@ -116,7 +146,7 @@ def cmd_trades(args):
     from src.realized.trades_fetcher import fetch_all_trades
 
     fetch_all_trades(
-        sport_filter=args.sport,
+        sport_names=_sport_names(args.sport),
         resume=not args.no_resume,
     )
 
@@ -126,7 +156,7 @@ def cmd_stream_trades(args):
 
     streamer = ChainTradeStreamer(
         rpc_url=args.rpc_url,
-        sport_filter=args.sport,
+        sport_names=_sport_names(args.sport),
         ws_port=args.ws_port,
         backfill_blocks=args.backfill,
     )
@@ -165,21 +195,19 @@ def cmd_export(args):
 
 def cmd_all(args):
     """完整流程: discover → orderbook → trades → results → export"""
-    from src.discovery.sports_meta import fetch_sports_metadata
+    from src.discovery.sports_meta import get_sport_tag_map
     from src.discovery.events_fetcher import fetch_sports_events
     from src.orderbook.rest_fetcher import fetch_all_active_orderbooks
     from src.realized.trades_fetcher import fetch_all_trades
     from src.realized.results_fetcher import extract_results_from_db
     from src.export.exporter import export_all
 
-    sport_names = None
-    if args.sport:
-        sport_names = [s.strip().lower() for s in args.sport.split(",")]
+    sport_names = _sport_names(args.sport)
 
     print("=" * 60)
     print("Step 1/5: 获取体育元数据")
     print("=" * 60)
-    fetch_sports_metadata()
+    print(f"[Sports] {len(get_sport_tag_map())} 种运动")
 
     print("\n" + "=" * 60)
     print("Step 2/5: 发现体育事件和市场")
@@ -195,15 +223,13 @@ def cmd_all(args):
     print("\n" + "=" * 60)
     print("Step 3/5: 获取订单簿快照")
     print("=" * 60)
-    fetch_all_active_orderbooks(
-        sport_filter=args.sport.split(",")[0] if args.sport else None
-    )
+    fetch_all_active_orderbooks(sport_names)
 
     print("\n" + "=" * 60)
     print("Step 4/5: 获取成交记录")
     print("=" * 60)
     fetch_all_trades(
-        sport_filter=args.sport.split(",")[0] if args.sport else None,
+        sport_names=sport_names,
         resume=not args.no_resume,
     )
 
@@ -244,12 +270,150 @@ def cmd_sports(args):
         print(f"  {sport:<12} tags: {tags}")
 
 
+def cmd_bench(args):
+    rows = [int(n.replace("_", "")) for n in args.rows.split(",")] if args.rows else None
+    tables = [t.strip() for t in args.tables.split(",")] if args.tables else None
+
+    if args.target == "writes":
+        from src.bench.db_writes import run
+        modes = [m.strip() for m in args.modes.split(",")] if args.modes else None
+        results = run(sizes=rows, tables=tables, modes=modes)
+    elif args.target == "books":
+        from src.bench.book_codec import run
+        results = run(n=rows[0] if rows else 10_000, depth=args.depth, churn=args.churn)
+    elif args.target == "queries":
+        from src.bench.query_plans import run
+        results = run(n=rows[0] if rows else 2_000_000)
+    elif args.target == "dedup":
+        from src.bench.trade_dedup import run
+        results = run(n=rows[0] if rows else 200_000)
+    elif args.target == "profiles":
+        from src.bench.db_profiles import run
+        results = run(n=rows[0] if rows else 200_000)
+    elif args.target == "backends":
+        from src.bench.backends import run
+        results = run(n=rows[0] if rows else 1_000_000)
+    elif args.target == "classify":
+        from src.bench.sport_classifier import run
+        results = run(n=rows[0] if rows else 500_000)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+        print(f"[Bench] 结果已写入 → {args.output}")
+
+
+def cmd_migrate_books(args):
+    from src.database import migrate_orderbook_levels, vacuum
+
+    print(f"[Migrate] 转换订单簿档位存储 → {args.to}"
+          + (f" ({args.compression})" if args.to == "binary" else ""))
+    n = migrate_orderbook_levels(args.to, args.compression)
+    print(f"[Migrate] 完成: 转换 {n} 个快照")
+    if args.vacuum:
+        print("[Migrate] VACUUM 回收空间...")
+        vacuum()
+    if args.to != ORDERBOOK_LEVEL_ENCODING:
+        print(f"[Migrate] 提示: 新快照仍按 config.ORDERBOOK_LEVEL_ENCODING={ORDERBOOK_LEVEL_ENCODING!r} 写入")
+
+
+def cmd_retention(args):
+    from src.database import vacuum
+    from src.retention import run_retention
+
+    print(f"[Retention] 快照: {args.downsample_days} 天前降采样为每 {args.interval}s 一条, "
+          f"保留 {args.keep_days if args.keep_days is not None else '∞'} 天 | "
+          f"成交: 保留 {args.keep_trade_days if args.keep_trade_days is not None else '∞'} 天")
+    st = run_retention(
+        downsample_days=args.downsample_days, interval=args.interval,
+        snapshot_days=args.keep_days, trade_days=args.keep_trade_days, archive=not args.no_archive,
+    )
+    print(f"[Retention] 完成: 降采样 {st['downsampled_partitions']} 个分区 (删除 {st['downsampled_rows']} 条) | "
+          f"删除快照分区 {st['dropped_snapshot_partitions']} 个 ({st['dropped_snapshot_rows']} 条) | "
+          f"删除成交分区 {st['dropped_trade_partitions']} 个 ({st['dropped_trade_rows']} 条)")
+    if args.vacuum:
+        print("[Retention] VACUUM 回收空间...")
+        vacuum()
+
+
+def _start_metrics(args):
+    """--metrics 模式：后台定期把请求指标写入文件。"""
+    if not args.metrics:
+        return None
+    from src.api_client import start_metrics_reporter
+
+    args.metrics_file = args.metrics_file or os.path.join(DATA_DIR, f"metrics.{args.metrics}")
+    os.makedirs(os.path.dirname(os.path.abspath(args.metrics_file)), exist_ok=True)
+    return start_metrics_reporter(args.metrics_interval, args.metrics, args.metrics_file)
+
+
+def _report_http_stats(args):
+    from src.api_client import metrics, dump_metrics, single_flight_stats
+    from src.http_cache import cache_stats, close_cache
+
+    lines = metrics.summary_lines()
+    if lines:
+        print("[Metrics] 请求统计:")
+        for line in lines:
+            print(line)
+    coalesced = single_flight_stats()["coalesced"]
+    if coalesced:
+        print(f"[Metrics] 合并并发重复请求 {coalesced} 次")
+    stats = cache_stats()
+    if stats:
+        print(f"[Cache] 命中 {stats['hits']} / 未命中 {stats['misses']} / "
+              f"304 重验证 {stats['revalidated']} / 淘汰 {stats['evictions']}")
+    if args.metrics:
+        dump_metrics(args.metrics, args.metrics_file)
+        print(f"[Metrics] 已导出 → {args.metrics_file}")
+    if args.record:
+        from src.api_client import stop_recording
+        print(f"[Record] 录制 {stop_recording()} 条响应 → {args.record}")
+    close_cache()
+
+
+def cmd_rebuild_candles(args):
+    from src.database import rebuild_candles
+
+    span = f"{args.first_day or '最早'} ~ {args.last_day or '最晚'}"
+    print(f"[Candles] 重建 K 线: {span}")
+    n = rebuild_candles(args.first_day, args.last_day)
+    print(f"[Candles] 完成: 成交 {n['trades']:,} 条 / 快照 {n['orderbook_snapshots']:,} 条")
+
+
+def _report_db_stats():
+    from src.database import trade_dedup_stats, writer_stats
+
+    st = writer_stats()
+    if st.get("commits"):
+        print(f"[DB-Writer] 写入请求 {st['requests']} / 提交 {st['commits']} 次 / 变更 {st['changes']} 行 | "
+              f"K 线累加 {st.get('candle_rows', 0)} 行 / 维护操作 {st['maintenance_changes']} 行 | 队列峰值 {st['max_queue_depth']} | 背压 {st['backpressure_waits']} 次 "
+              f"{st['backpressure_seconds']:.1f}s | 事务耗时 {st['commit_seconds']:.1f}s")
+    dedup = trade_dedup_stats()
+    if dedup.get("checked"):
+        print(f"[Dedup] 成交 {dedup['checked']} 条 / 过滤重复 {dedup['filtered']} 条 "
+              f"(命中率 {dedup['hit_rate']:.1%}) / 漏判由 SQLite 拒绝 {dedup['db_duplicates']} 条 | "
+              f"指纹 {dedup['size']:,} 条")
+
+
 def main():
     parser = argparse.ArgumentParser(
         description="Polymarket 体育赛事预测市场数据采集工具",
         formatter_class=argparse.RawDescriptionHelpFormatter,
         epilog=__doc__,
     )
+    parser.add_argument("--no-cache", action="store_true", help="禁用 Gamma 元数据的 HTTP 响应缓存（及运动 tag 热启动缓存）")
+    parser.add_argument("--record", type=str, default=None,
+                        help="把所有 API 响应录制到 gzip JSONL 存档（建议配合 --no-cache）")
+    parser.add_argument("--metrics", choices=["prom", "json"], default=None,
+                        help="导出请求指标（Prometheus 文本 / JSON），运行中定期刷新，结束时写最终值")
+    parser.add_argument("--metrics-file", type=str, default=None, help="指标文件路径 (默认 data/metrics.<格式>)")
+    parser.add_argument("--metrics-interval", type=float, default=METRICS_INTERVAL,
+                        help=f"定期导出间隔秒数 (默认 {METRICS_INTERVAL})")
+    parser.add_argument("--db-profile", choices=list(SQLITE_PROFILES), default=SQLITE_PROFILE,
+                        help=f"SQLite 性能配置 (默认 {SQLITE_PROFILE}，见 config.SQLITE_PROFILES)")
+    parser.add_argument("--storage", choices=["sqlite", "duckdb"], default=STORAGE_BACKEND,
+                        help=f"存储后端 (默认 {STORAGE_BACKEND}；duckdb 为列存库，需 pip install duckdb)")
     sub = parser.add_subparsers(dest="command", help="子命令")
 
     # discover
@@ -258,22 +422,30 @@ def main():
     p_disc.add_argument("--active-only", action="store_true", help="只采集当前活跃事件")
     p_disc.add_argument("--no-resume", action="store_true", help="不使用断点续传")
     p_disc.add_argument("--limit", type=int, default=None, help="最多采集事件数")
+    p_disc.add_argument("--incremental", action="store_true",
+                        help="增量: 只抓各 tag 高水位以上的新事件，并按 id 刷新库中未关闭的事件")
+
+    # refresh
+    p_ref = sub.add_parser("refresh", help="按 id 批量刷新库中未关闭市场的状态（closed/接单/价格）")
+    p_ref.add_argument("--sport", type=str, default=None, help="运动类型 (逗号分隔)")
+    p_ref.add_argument("--batch-size", type=int, default=MARKETS_REFRESH_BATCH,
+                       help=f"每个 /markets 请求的市场数 (默认 {MARKETS_REFRESH_BATCH})")
 
     # orderbook
     p_ob = sub.add_parser("orderbook", help="获取订单簿快照")
-    p_ob.add_argument("--sport", type=str, default=None, help="运动类型过滤")
+    p_ob.add_argument("--sport", type=str, default=None, help="运动类型 (逗号分隔)")
     p_ob.add_argument("--stream", action="store_true", help="WebSocket 实时流模式")
 
     # trades
     p_tr = sub.add_parser("trades", help="获取成交记录（批量拉取）")
-    p_tr.add_argument("--sport", type=str, default=None, help="运动类型过滤")
+    p_tr.add_argument("--sport", type=str, default=None, help="运动类型 (逗号分隔)")
     p_tr.add_argument("--no-resume", action="store_true", help="不使用断点续传")
 
     # stream-trades
     p_st = sub.add_parser("stream-trades", help="实时监听链上成交（Polygon OrderFilled）")
     p_st.add_argument("--rpc-url", type=str, required=True,
                        help="Polygon WebSocket RPC URL (e.g. wss://polygon-mainnet.g.alchemy.com/v2/KEY)")
-    p_st.add_argument("--sport", type=str, default=None, help="运动类型过滤")
+    p_st.add_argument("--sport", type=str, default=None, help="运动类型 (逗号分隔)")
     p_st.add_argument("--ws-port", type=int, default=8765, help="本地 WebSocket 推送端口 (默认 8765)")
     p_st.add_argument("--backfill", type=int, default=100, help="启动时回补的区块数 (默认 100)")
 
@@ -298,15 +470,77 @@ def main():
     # sports
     sub.add_parser("sports", help="列出所有可用运动类型")
 
+    # bench
+    p_bench = sub.add_parser("bench", help="本地性能基准（使用临时库，不触碰 data/）")
+    p_bench.add_argument("target", choices=["writes", "books", "queries", "dedup", "profiles", "backends", "classify"], help="基准项目")
+    p_bench.add_argument("--rows", type=str, default=None, help="行数规模 (逗号分隔, 默认 10000,100000,1000000)")
+    p_bench.add_argument("--tables", type=str, default=None,
+                         help="目标表 (逗号分隔: trades,snapshots,markets,events; 默认 trades,snapshots)")
+    p_bench.add_argument("--modes", type=str, default=None,
+                         help="写入方式 (逗号分隔: executemany,per-row,writer; 默认全部)")
+    p_bench.add_argument("--depth", type=int, default=15, help="books: 每侧档位数 (默认 15)")
+    p_bench.add_argument("--churn", type=float, default=1.0,
+                         help="books: 相邻快照每个档位改量的概率 (默认 1 = 全部变化)")
+    p_bench.add_argument("--output", type=str, default=None, help="把结果另存为 JSON")
+
+    # migrate-books
+    p_mig = sub.add_parser("migrate-books", help="转换已有订单簿快照的档位存储方式")
+    p_mig.add_argument("--to", choices=["binary", "json"], default="binary", help="目标存储方式")
+    p_mig.add_argument("--compression", choices=["none", "zlib", "zstd"], default="none",
+                       help="binary 的 body 压缩方式 (zstd 需安装 zstandard)")
+    p_mig.add_argument("--vacuum", action="store_true", help="转换后 VACUUM 回收空间")
+
+    # retention
+    p_ret = sub.add_parser("retention", help="旧数据拆入日分区、旧快照降采样、过期分区归档后删除")
+    p_ret.add_argument("--downsample-days", type=int, default=RETENTION_DOWNSAMPLE_DAYS,
+                       help=f"早于多少天的快照分区降采样 (默认 {RETENTION_DOWNSAMPLE_DAYS})")
+    p_ret.add_argument("--interval", type=int, default=RETENTION_DOWNSAMPLE_SECONDS,
+                       help=f"降采样后每个 token 每多少秒保留一条 (默认 {RETENTION_DOWNSAMPLE_SECONDS})")
+    p_ret.add_argument("--keep-days", type=int, default=RETENTION_SNAPSHOT_DAYS,
+                       help=f"快照分区保留天数 (默认 {RETENTION_SNAPSHOT_DAYS})")
+    p_ret.add_argument("--keep-trade-days", type=int, default=RETENTION_TRADE_DAYS,
+                       help=f"成交分区保留天数 (默认 {RETENTION_TRADE_DAYS or '永久'})")
+    p_ret.add_argument("--no-archive", action="store_true", help="删除分区前不归档到 data/archive/")
+    p_ret.add_argument("--vacuum", action="store_true", help="完成后 VACUUM 回收空间")
+
+    # rebuild-candles
+    p_can = sub.add_parser("rebuild-candles", help="由已有成交/快照重建 K 线表")
+    p_can.add_argument("--from", dest="first_day", type=str, default=None,
+                       help="起始 UTC 日 YYYYMMDD (默认原始数据最早日期)")
+    p_can.add_argument("--to", dest="last_day", type=str, default=None,
+                       help="结束 UTC 日 YYYYMMDD，含当天 (默认原始数据最晚日期)")
+
     args = parser.parse_args()
     if not args.command:
         parser.print_help()
         sys.exit(1)
 
-    init_db()
+    if args.no_cache:
+        from src.http_cache import set_enabled
+        from src.discovery.sports_meta import invalidate_sport_tag_map
+        set_enabled(False)
+        invalidate_sport_tag_map()
+    if args.record:
+        from src.api_client import start_recording
+        start_recording(args.record)
+
+    try:
+        set_backend(args.storage)
+    except ValueError as e:
+        print(f"[Storage] {e}")
+        sys.exit(1)
+    if args.storage != "sqlite" and args.command in ("migrate-books", "retention", "rebuild-candles"):
+        print(f"[Storage] {args.command} 仅用于 SQLite 存储后端"
+              "（DuckDB 库不分区、不做档位编码，K 线是查询时聚合的视图）")
+        sys.exit(1)
+    set_profile(args.db_profile)
+    if args.command != "bench":   # 基准只用自己的临时库
+        init_db()
+    metrics_stop = _start_metrics(args)
 
     commands = {
         "discover": cmd_discover,
+        "refresh": cmd_refresh,
         "orderbook": cmd_orderbook,
         "trades": cmd_trades,
         "stream-trades": cmd_stream_trades,
@@ -315,6 +549,10 @@ def main():
         "all": cmd_all,
         "summary": cmd_summary,
         "sports": cmd_sports,
+        "bench": cmd_bench,
+        "migrate-books": cmd_migrate_books,
+        "retention": cmd_retention,
+        "rebuild-candles": cmd_rebuild_candles,
     }
 
     try:
@@ -322,7 +560,12 @@ def main():
     except KeyboardInterrupt:
         print("\n操作已取消")
     finally:
+        if metrics_stop:
+            metrics_stop.set()
         close_db()
+        _report_db_stats()
+        _report_http_stats(args)
+
 
 
 if __name__ == "__main__":
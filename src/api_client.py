@@ -1,13 +1,25 @@
-"""HTTP 客户端 — 封装 GET/POST 请求，含重试、指数退避、速率控制"""
+"""HTTP 客户端 — 封装 GET/POST 请求，含重试、指数退避、速率控制
+
+同步接口 (api_get / gamma_get / ...) 基于 requests.Session；
+异步接口 (api_get_async / gamma_get_async / ...) 基于 aiohttp，
+共享同一套重试与 429 退避语义，连接池按 host 限制并发数；
+限流由 src.rate_limiter 的按 host 自适应令牌桶完成，
+Gamma 元数据 GET 经 src.http_cache 磁盘缓存并做条件重验证。
+"""
 from __future__ import annotations
 
+import asyncio
+import bisect
+import concurrent.futures
 import json
+import os
+import threading
 import time
 from typing import Any
 
+import aiohttp
 import requests
 from requests.adapters import HTTPAdapter
-from urllib3.util.retry import Retry
 
 from config import (
     GAMMA_API_BASE,
@@ -15,40 +27,416 @@ from config import (
     DATA_API_BASE,
     MAX_RETRIES,
     RETRY_BACKOFF,
-    REQUEST_DELAY,
+    HTTP_MAX_INFLIGHT_PER_HOST,
+    HTTP_KEEPALIVE_TIMEOUT,
+    HTTP_SINGLE_FLIGHT,
 )
+from src.database import trade_dedup_stats, writer_stats
+from src.http_cache import HttpCache, CacheEntry, get_cache, cache_key, ttl_for, cache_stats
+from src.rate_limiter import get_bucket, current_rates
+from src.replay import Recorder, split_api_url, canonical_query, body_hash
+
+_HEADERS = {
+    "User-Agent": "polymarket-sports-data/1.0",
+    "Accept": "application/json",
+}
+
+
+# ── 指标 ──────────────────────────────────────────────────
+
+# 延迟直方图桶上界（秒）：5ms 起按 1.5 倍递增到约 60s
+_LATENCY_BUCKETS = tuple(round(0.005 * 1.5 ** i, 4) for i in range(24))
+
+
+def endpoint_label(url: str) -> str:
+    """把 URL 归类为 "gamma:/events" 这样的端点标签（不含查询参数）。"""
+    api, path = split_api_url(url)
+    return f"{api}:{path}"
+
+
+class _EndpointStats:
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.retries = 0
+        self.throttled = 0
+        self.bytes_received = 0
+        self.latency_sum = 0.0
+        self.rate_limit_sleep = 0.0
+        self.backoff_sleep = 0.0
+        self.status: dict[str, int] = {}
+        self.buckets = [0] * (len(_LATENCY_BUCKETS) + 1)
+
+    def percentile(self, q: float) -> float:
+        """由直方图线性插值估算分位数（秒）。"""
+        total = sum(self.buckets)
+        if total == 0:
+            return 0.0
+        rank = q * total
+        seen = 0
+        for i, n in enumerate(self.buckets):
+            if n and seen + n >= rank:
+                lo = _LATENCY_BUCKETS[i - 1] if i > 0 else 0.0
+                hi = _LATENCY_BUCKETS[i] if i < len(_LATENCY_BUCKETS) else lo * 1.5
+                return lo + (hi - lo) * (rank - seen) / n
+            seen += n
+        return _LATENCY_BUCKETS[-1]
+
+
+class ApiMetrics:
+    """按端点统计请求数、延迟直方图、接收字节、重试、429 与限流等待时间（线程安全）。"""
+
+    def __init__(self):
+        self._stats: dict[str, _EndpointStats] = {}
+        self._lock = threading.Lock()
+        self.started_at = time.time()
+
+    def _get(self, endpoint: str) -> _EndpointStats:
+        st = self._stats.get(endpoint)
+        if st is None:
+            st = self._stats[endpoint] = _EndpointStats()
+        return st
+
+    def observe(self, url: str, status: int | str, latency: float, nbytes: int = 0):
+        with self._lock:
+            st = self._get(endpoint_label(url))
+            st.requests += 1
+            st.latency_sum += latency
+            st.bytes_received += nbytes
+            st.buckets[bisect.bisect_left(_LATENCY_BUCKETS, latency)] += 1
+            key = str(status)
+            st.status[key] = st.status.get(key, 0) + 1
+            if status == 429:
+                st.throttled += 1
+            elif status == "error" or (isinstance(status, int) and status >= 500):
+                st.errors += 1
+
+    def add_retry(self, url: str, backoff: float = 0.0):
+        with self._lock:
+            st = self._get(endpoint_label(url))
+            st.retries += 1
+            st.backoff_sleep += backoff
+
+    def add_rate_limit_sleep(self, url: str, seconds: float):
+        with self._lock:
+            self._get(endpoint_label(url)).rate_limit_sleep += seconds
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+            self.started_at = time.time()
+
+    def snapshot(self) -> dict[str, dict]:
+        with self._lock:
+            return {
+                ep: {
+                    "requests": st.requests,
+                    "errors": st.errors,
+                    "retries": st.retries,
+                    "throttled_429": st.throttled,
+                    "bytes_received": st.bytes_received,
+                    "latency_avg": round(st.latency_sum / st.requests, 4) if st.requests else 0.0,
+                    "latency_p50": round(st.percentile(0.50), 4),
+                    "latency_p95": round(st.percentile(0.95), 4),
+                    "latency_p99": round(st.percentile(0.99), 4),
+                    "rate_limit_sleep_seconds": round(st.rate_limit_sleep, 3),
+                    "backoff_sleep_seconds": round(st.backoff_sleep, 3),
+                    "status": dict(st.status),
+                }
+                for ep, st in sorted(self._stats.items())
+            }
+
+    def to_json(self) -> str:
+        return json.dumps({
+            "uptime_seconds": round(time.time() - self.started_at, 1),
+            "endpoints": self.snapshot(),
+            "http_cache": cache_stats(),
+            "single_flight": single_flight_stats(),
+            "rate_limits": current_rates(),
+            "db_writer": writer_stats(),
+            "trade_dedup": trade_dedup_stats(),
+        }, ensure_ascii=False, indent=2)
+
+    def to_prometheus(self) -> str:
+        lines = []
+
+        def metric(name: str, mtype: str, help_text: str):
+            lines.append(f"# HELP polymarket_{name} {help_text}")
+            lines.append(f"# TYPE polymarket_{name} {mtype}")
+
+        with self._lock:
+            items = sorted(self._stats.items())
+            metric("http_requests_total", "counter", "HTTP responses by endpoint and status")
+            for ep, st in items:
+                for status, n in sorted(st.status.items()):
+                    lines.append(f'polymarket_http_requests_total{{endpoint="{ep}",status="{status}"}} {n}')
+            metric("http_request_duration_seconds", "histogram", "HTTP request latency")
+            for ep, st in items:
+                cumulative = 0
+                for bound, n in zip(_LATENCY_BUCKETS, st.buckets):
+                    cumulative += n
+                    lines.append(f'polymarket_http_request_duration_seconds_bucket'
+                                 f'{{endpoint="{ep}",le="{bound}"}} {cumulative}')
+                lines.append(f'polymarket_http_request_duration_seconds_bucket'
+                             f'{{endpoint="{ep}",le="+Inf"}} {st.requests}')
+                lines.append(f'polymarket_http_request_duration_seconds_sum{{endpoint="{ep}"}} '
+                             f'{st.latency_sum:.6f}')
+                lines.append(f'polymarket_http_request_duration_seconds_count{{endpoint="{ep}"}} '
+                             f'{st.requests}')
+            for name, attr, mtype, help_text in (
+                ("http_response_bytes_total", "bytes_received", "counter", "Response bytes received"),
+                ("http_retries_total", "retries", "counter", "Retried requests"),
+                ("http_throttled_total", "throttled", "counter", "HTTP 429 responses"),
+                ("rate_limit_sleep_seconds_total", "rate_limit_sleep", "counter",
+                 "Time spent waiting in the rate limiter"),
+                ("backoff_sleep_seconds_total", "backoff_sleep", "counter",
+                 "Time spent in error backoff"),
+            ):
+                metric(name, mtype, help_text)
+                for ep, st in items:
+                    lines.append(f'polymarket_{name}{{endpoint="{ep}"}} {getattr(st, attr)}')
+
+        for key, value in cache_stats().items():
+            metric(f"http_cache_{key}_total", "counter", f"HTTP cache {key}")
+            lines.append(f"polymarket_http_cache_{key}_total {value}")
+        sf = single_flight_stats()
+        metric("http_coalesced_total", "counter", "Requests served by an identical in-flight request")
+        lines.append(f"polymarket_http_coalesced_total {sf['coalesced']}")
+        metric("rate_limit_current_rps", "gauge", "Adaptive token bucket rate per host")
+        for host, rate in current_rates().items():
+            lines.append(f'polymarket_rate_limit_current_rps{{host="{host}"}} {rate}')
+        db = writer_stats()
+        for key, mtype, help_text in (
+            ("requests", "counter", "Write requests submitted to the SQLite writer"),
+            ("changes", "counter", "Data rows changed by the SQLite writer"),
+            ("maintenance_changes", "counter", "Rows touched by maintenance calls (rebuild, retention)"),
+            ("candle_rows", "counter", "Raw rows accumulated into candle tables"),
+            ("commits", "counter", "Group commits"),
+            ("errors", "counter", "Failed write requests"),
+            ("backpressure_waits", "counter", "Producers blocked on a full write queue"),
+            ("backpressure_seconds", "counter", "Time producers spent blocked on the write queue"),
+            ("commit_seconds", "counter", "Time spent inside write transactions"),
+            ("queue_depth", "gauge", "Pending write requests"),
+            ("max_queue_depth", "gauge", "Peak pending write requests"),
+        ):
+            if key in db:
+                name = f"db_writer_{key}" + ("_total" if mtype == "counter" else "")
+                metric(name, mtype, help_text)
+                lines.append(f"polymarket_{name} {db[key]}")
+        dedup = trade_dedup_stats()
+        for key, mtype, help_text in (
+            ("checked", "counter", "Trades checked against the dedup filter"),
+            ("filtered", "counter", "Trades dropped by the dedup filter before INSERT"),
+            ("db_duplicates", "counter", "Duplicate trades missed by the filter and rejected by SQLite"),
+            ("size", "gauge", "Trade fingerprints held by the dedup filter"),
+            ("hit_rate", "gauge", "Fraction of checked trades dropped by the dedup filter"),
+        ):
+            if key in dedup:
+                name = f"trade_dedup_{key}" + ("_total" if mtype == "counter" else "")
+                metric(name, mtype, help_text)
+                lines.append(f"polymarket_{name} {dedup[key]}")
+        return "\n".join(lines) + "\n"
+
+    def summary_lines(self) -> list[str]:
+        """命令结束时打印的紧凑摘要。"""
+        out = []
+        for ep, st in self.snapshot().items():
+            out.append(
+                f"  {ep:<28} n={st['requests']:<6} "
+                f"p50={st['latency_p50'] * 1000:.0f}ms p95={st['latency_p95'] * 1000:.0f}ms "
+                f"p99={st['latency_p99'] * 1000:.0f}ms "
+                f"{st['bytes_received'] / 1048576:.1f}MB "
+                f"retry={st['retries']} 429={st['throttled_429']} "
+                f"限流等待={st['rate_limit_sleep_seconds']:.1f}s"
+            )
+        return out
+
+
+metrics = ApiMetrics()
+
+
+def dump_metrics(fmt: str = "prom", path: str | None = None) -> str:
+    """导出当前指标（fmt: prom / json）。给定 path 时原子写入文件。"""
+    text = metrics.to_json() if fmt == "json" else metrics.to_prometheus()
+    if path:
+        tmp = f"{path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(tmp, path)
+    return text
+
+
+def start_metrics_reporter(interval: float, fmt: str, path: str) -> threading.Event:
+    """后台线程每 interval 秒导出一次指标；set 返回的 Event 即停止。"""
+    stop = threading.Event()
+
+    def _loop():
+        while not stop.wait(interval):
+            dump_metrics(fmt, path)
+
+    threading.Thread(target=_loop, daemon=True).start()
+    return stop
+
+
+# ── 录制 ──────────────────────────────────────────────────
+
+_recorder: Recorder | None = None
+
+
+def start_recording(path: str):
+    """开启录制：之后每个网络响应都追加写入 path（gzip JSONL），供 src.mock_server 回放。"""
+    global _recorder
+    stop_recording()
+    _recorder = Recorder(path)
+
+
+def stop_recording() -> int:
+    """结束录制，返回录制的响应条数。"""
+    global _recorder
+    if _recorder is None:
+        return 0
+    _recorder.close()
+    count, _recorder = _recorder.count, None
+    return count
+
+
+def _record(method: str, url: str, params: Any, json_body: Any, status: int, text: str):
+    if _recorder is not None and status not in (304, 429):
+        _recorder.record(method, url, params, json_body, status, text)
+
+
+def _rate_limit(url: str):
+    wait = get_bucket(url).reserve()
+    if wait > 0:
+        metrics.add_rate_limit_sleep(url, wait)
+        time.sleep(wait)
+
+
+async def _rate_limit_async(url: str):
+    wait = get_bucket(url).reserve()
+    if wait > 0:
+        metrics.add_rate_limit_sleep(url, wait)
+        await asyncio.sleep(wait)
+
+
+def _retry_after(headers: Any) -> float | None:
+    """解析 Retry-After（仅支持秒数形式）。"""
+    value = headers.get("Retry-After") if headers else None
+    try:
+        return max(0.0, float(value)) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+def _throttled(url: str, headers: Any, attempt: int):
+    """429: 按 Retry-After（缺省用指数退避）暂停该 host，并降低其速率。"""
+    wait = _retry_after(headers)
+    if wait is None:
+        wait = RETRY_BACKOFF * (2 ** attempt)
+    get_bucket(url).on_throttle(wait)
+    metrics.add_retry(url)
+    print(f"  [429] 被限流，等待 {wait:.1f}s (尝试 {attempt}/{MAX_RETRIES})")
+
+
+# ── 并发请求合并 (single-flight) ──────────────────────────
+
+class _SingleFlight:
+    """相同请求并发进行时只发一次网络请求，其余调用方（线程或协程）等待并共享同一结果。
+
+    共享的是同一个 JSON 对象，调用方不应原地修改响应。
+    """
+
+    def __init__(self):
+        self._calls: dict[str, concurrent.futures.Future] = {}
+        self._lock = threading.Lock()
+        self.stats = {"leaders": 0, "coalesced": 0}
+
+    def _join(self, key: str) -> tuple[concurrent.futures.Future, bool]:
+        with self._lock:
+            fut = self._calls.get(key)
+            if fut is not None:
+                self.stats["coalesced"] += 1
+                return fut, False
+            fut = self._calls[key] = concurrent.futures.Future()
+            self.stats["leaders"] += 1
+            return fut, True
+
+    def _finish(self, key: str, fut: concurrent.futures.Future, result: Any = None,
+                exc: BaseException | None = None):
+        with self._lock:
+            self._calls.pop(key, None)
+        if exc is not None:
+            fut.set_exception(exc)
+        else:
+            fut.set_result(result)
+
+    def do(self, key: str, fn):
+        fut, leader = self._join(key)
+        if not leader:
+            return fut.result()
+        try:
+            result = fn()
+        except BaseException as exc:
+            self._finish(key, fut, exc=exc)
+            raise
+        self._finish(key, fut, result)
+        return result
+
+    async def do_async(self, key: str, coro_fn):
+        fut, leader = self._join(key)
+        if not leader:
+            return await asyncio.wrap_future(fut)
+        try:
+            result = await coro_fn()
+        except BaseException as exc:
+            self._finish(key, fut, exc=exc)
+            raise
+        self._finish(key, fut, result)
+        return result
+
+
+_single_flight = _SingleFlight()
 
-_last_request_time = 0.0
 
+def _flight_key(
+    mode: str, method: str, url: str, params: Any, json_body: Any, use_cache: bool,
+) -> str | None:
+    # 同步与异步调用分开合并：避免事件循环线程里的同步调用阻塞等待本线程上的协程
+    if not HTTP_SINGLE_FLIGHT:
+        return None
+    query = canonical_query(params)
+    return f"{mode} {method} {url}?{query}#{body_hash(json_body) or ''}#{int(use_cache)}"
 
-def _rate_limit():
-    global _last_request_time
-    elapsed = time.time() - _last_request_time
-    if elapsed < REQUEST_DELAY:
-        time.sleep(REQUEST_DELAY - elapsed)
-    _last_request_time = time.time()
+
+def single_flight_stats() -> dict[str, int]:
+    return dict(_single_flight.stats)
+
+
+def _cache_lookup(
+    method: str, url: str, params: dict[str, Any] | None, use_cache: bool,
+) -> tuple[HttpCache | None, str, CacheEntry | None]:
+    """返回 (缓存实例, key, 已有条目)；该请求不走缓存时缓存实例为 None。"""
+    if method != "GET" or not use_cache or ttl_for(url) is None:
+        return None, "", None
+    cache = get_cache()
+    if cache is None:
+        return None, "", None
+    key = cache_key(url, params)
+    return cache, key, cache.lookup(key)
 
 
 def _build_session() -> requests.Session:
     session = requests.Session()
-    retry = Retry(
-        total=MAX_RETRIES,
-        connect=MAX_RETRIES,
-        read=MAX_RETRIES,
-        status=MAX_RETRIES,
-        allowed_methods=["GET", "POST"],
-        status_forcelist=[500, 502, 503, 504],
-        backoff_factor=RETRY_BACKOFF,
-        respect_retry_after_header=True,
-        raise_on_status=False,
+    # 适配器不做重试：连接错误、5xx 与 429 都回到 _api_request_once 的循环，
+    # 每次尝试各计一次延迟样本与重试数（metrics），429 同时降低 host 速率
+    adapter = HTTPAdapter(
+        max_retries=0,
+        pool_connections=4,
+        pool_maxsize=HTTP_MAX_INFLIGHT_PER_HOST,
     )
-    adapter = HTTPAdapter(max_retries=retry)
     session.mount("https://", adapter)
     session.mount("http://", adapter)
-    session.headers.update({
-        "User-Agent": "polymarket-sports-data/1.0",
-        "Accept": "application/json",
-    })
+    session.headers.update(_HEADERS)
     return session
 
 
@@ -62,71 +450,256 @@ def _get_session() -> requests.Session:
     return _session
 
 
-def api_get(url: str, params: dict[str, Any] | None = None, timeout: int = 30) -> Any | None:
-    """GET 请求，含 429 退避和错误处理。成功返回 JSON，失败返回 None。"""
-    _rate_limit()
+def _api_request(
+    method: str,
+    url: str,
+    params: dict[str, Any] | None = None,
+    json_body: Any = None,
+    timeout: int = 30,
+    use_cache: bool = True,
+) -> Any | None:
+    key = _flight_key("sync", method, url, params, json_body, use_cache)
+    if key is None:
+        return _api_request_once(method, url, params, json_body, timeout, use_cache)
+    return _single_flight.do(
+        key, lambda: _api_request_once(method, url, params, json_body, timeout, use_cache),
+    )
+
+
+def _api_request_once(
+    method: str,
+    url: str,
+    params: dict[str, Any] | None,
+    json_body: Any,
+    timeout: int,
+    use_cache: bool,
+) -> Any | None:
+    cache, key, entry = _cache_lookup(method, url, params, use_cache)
+    if entry is not None and entry.fresh:
+        return entry.data()
+    headers = entry.validators() if entry is not None else None
+
     session = _get_session()
+    bucket = get_bucket(url)
     for attempt in range(1, MAX_RETRIES + 1):
+        _rate_limit(url)
+        t0 = time.perf_counter()
         try:
-            resp = session.get(url, params=params, timeout=timeout)
+            resp = session.request(
+                method, url, params=params, json=json_body, headers=headers, timeout=timeout,
+            )
+            metrics.observe(url, resp.status_code, time.perf_counter() - t0, len(resp.content))
+            if _recorder is not None:
+                _record(method, url, params, json_body, resp.status_code, resp.text)
             if resp.status_code == 429:
-                wait = RETRY_BACKOFF * (2 ** attempt)
-                print(f"  [429] 被限流，等待 {wait:.1f}s (尝试 {attempt}/{MAX_RETRIES})")
-                time.sleep(wait)
+                _throttled(url, resp.headers, attempt)
                 continue
+            bucket.on_success()
+            if resp.status_code == 304 and entry is not None:
+                data = entry.data()
+                cache.revalidated(entry, ttl_for(url, data))
+                return data
             if resp.status_code == 400:
                 return None
             resp.raise_for_status()
-            return json.loads(resp.text, strict=False)
+            data = json.loads(resp.text, strict=False)
+            if cache is not None:
+                cache.store(key, url, resp.text, resp.headers, ttl_for(url, data))
+            return data
         except requests.exceptions.RequestException as exc:
+            if not isinstance(exc, requests.exceptions.HTTPError):
+                metrics.observe(url, "error", time.perf_counter() - t0)
             if attempt < MAX_RETRIES:
                 wait = RETRY_BACKOFF * (2 ** attempt)
+                metrics.add_retry(url, wait)
                 print(f"  [ERR] {exc} — 重试 {attempt}/{MAX_RETRIES}，等待 {wait:.1f}s")
                 time.sleep(wait)
             else:
-                print(f"  [FAIL] 请求最终失败: {url}")
+                print(f"  [FAIL] {method} 请求最终失败: {url}")
                 return None
     return None
 
 
+def api_get(
+    url: str,
+    params: dict[str, Any] | None = None,
+    timeout: int = 30,
+    use_cache: bool = True,
+) -> Any | None:
+    """GET 请求，含 429 退避和错误处理。成功返回 JSON，失败返回 None。
+    Gamma 元数据端点经磁盘缓存（见 src.http_cache），use_cache=False 强制走网络。"""
+    return _api_request("GET", url, params=params, timeout=timeout, use_cache=use_cache)
+
+
 def api_post(url: str, json_body: Any, timeout: int = 30) -> Any | None:
     """POST 请求（用于批量 order book 查询等）。"""
-    _rate_limit()
-    session = _get_session()
+    return _api_request("POST", url, json_body=json_body, timeout=timeout)
+
+
+def gamma_get(
+    path: str, params: dict[str, Any] | None = None, use_cache: bool = True,
+) -> Any | None:
+    return api_get(f"{GAMMA_API_BASE}{path}", params=params, use_cache=use_cache)
+
+
+def clob_get(path: str, params: dict[str, Any] | None = None) -> Any | None:
+    return api_get(f"{CLOB_API_BASE}{path}", params=params)
+
+
+def clob_post(path: str, json_body: Any) -> Any | None:
+    return api_post(f"{CLOB_API_BASE}{path}", json_body)
+
+
+def data_get(path: str, params: dict[str, Any] | None = None) -> Any | None:
+    return api_get(f"{DATA_API_BASE}{path}", params=params)
+
+
+# ── 异步引擎 ──────────────────────────────────────────────
+
+_async_session: aiohttp.ClientSession | None = None
+_async_loop: asyncio.AbstractEventLoop | None = None
+
+
+def _get_async_session() -> aiohttp.ClientSession:
+    """返回绑定当前事件循环的 aiohttp 会话（keep-alive 连接池，按 host 限并发）。"""
+    global _async_session, _async_loop
+    loop = asyncio.get_running_loop()
+    if _async_session is None or _async_session.closed or _async_loop is not loop:
+        connector = aiohttp.TCPConnector(
+            limit=0,
+            limit_per_host=HTTP_MAX_INFLIGHT_PER_HOST,
+            keepalive_timeout=HTTP_KEEPALIVE_TIMEOUT,
+            ttl_dns_cache=300,
+        )
+        _async_session = aiohttp.ClientSession(connector=connector, headers=_HEADERS)
+        _async_loop = loop
+    return _async_session
+
+
+async def close_async_session():
+    """关闭异步连接池（事件循环结束前调用）。"""
+    global _async_session, _async_loop
+    if _async_session is not None and not _async_session.closed:
+        await _async_session.close()
+    _async_session = None
+    _async_loop = None
+
+
+def _clean_params(params: dict[str, Any] | None) -> list[tuple[str, Any]] | None:
+    """aiohttp 只接受 str/int/float 参数：布尔值等转成字符串，列表值展开为重复 key（与 requests 一致）。"""
+    if params is None:
+        return None
+    pairs = []
+    for k, v in params.items():
+        for item in (v if isinstance(v, (list, tuple)) else [v]):
+            if item is None:
+                continue
+            ok = isinstance(item, (str, int, float)) and not isinstance(item, bool)
+            pairs.append((k, item if ok else str(item)))
+    return pairs
+
+
+async def _api_request_async(
+    method: str,
+    url: str,
+    params: dict[str, Any] | None = None,
+    json_body: Any = None,
+    timeout: int = 30,
+    use_cache: bool = True,
+) -> Any | None:
+    key = _flight_key("async", method, url, params, json_body, use_cache)
+    if key is None:
+        return await _api_request_once_async(method, url, params, json_body, timeout, use_cache)
+    return await _single_flight.do_async(
+        key, lambda: _api_request_once_async(method, url, params, json_body, timeout, use_cache),
+    )
+
+
+async def _api_request_once_async(
+    method: str,
+    url: str,
+    params: dict[str, Any] | None,
+    json_body: Any,
+    timeout: int,
+    use_cache: bool,
+) -> Any | None:
+    cache, key, entry = _cache_lookup(method, url, params, use_cache)
+    if entry is not None and entry.fresh:
+        return entry.data()
+    headers = entry.validators() if entry is not None else None
+
+    session = _get_async_session()
+    bucket = get_bucket(url)
+    client_timeout = aiohttp.ClientTimeout(total=timeout)
     for attempt in range(1, MAX_RETRIES + 1):
+        await _rate_limit_async(url)
+        t0 = time.perf_counter()
         try:
-            resp = session.post(url, json=json_body, timeout=timeout)
-            if resp.status_code == 429:
-                wait = RETRY_BACKOFF * (2 ** attempt)
-                print(f"  [429] 被限流，等待 {wait:.1f}s (尝试 {attempt}/{MAX_RETRIES})")
-                time.sleep(wait)
-                continue
-            if resp.status_code == 400:
-                return None
-            resp.raise_for_status()
-            return json.loads(resp.text, strict=False)
-        except requests.exceptions.RequestException as exc:
+            async with session.request(
+                method, url, params=_clean_params(params), json=json_body,
+                headers=headers, timeout=client_timeout,
+            ) as resp:
+                body = await resp.read()
+                metrics.observe(url, resp.status, time.perf_counter() - t0, len(body))
+                text = body.decode(resp.charset or "utf-8", errors="replace")
+                _record(method, url, params, json_body, resp.status, text)
+                if resp.status == 429:
+                    _throttled(url, resp.headers, attempt)
+                    continue
+                bucket.on_success()
+                if resp.status == 304 and entry is not None:
+                    data = entry.data()
+                    cache.revalidated(entry, ttl_for(url, data))
+                    return data
+                if resp.status == 400:
+                    return None
+                resp.raise_for_status()
+                data = json.loads(text, strict=False)
+                if cache is not None:
+                    cache.store(key, url, text, resp.headers, ttl_for(url, data))
+                return data
+        except (aiohttp.ClientError, asyncio.TimeoutError) as exc:
+            if not isinstance(exc, aiohttp.ClientResponseError):
+                metrics.observe(url, "error", time.perf_counter() - t0)
             if attempt < MAX_RETRIES:
                 wait = RETRY_BACKOFF * (2 ** attempt)
-                print(f"  [ERR] {exc} — 重试 {attempt}/{MAX_RETRIES}，等待 {wait:.1f}s")
-                time.sleep(wait)
+                metrics.add_retry(url, wait)
+                print(f"  [ERR] {exc!r} — 重试 {attempt}/{MAX_RETRIES}，等待 {wait:.1f}s")
+                await asyncio.sleep(wait)
             else:
-                print(f"  [FAIL] POST 请求最终失败: {url}")
+                print(f"  [FAIL] {method} 请求最终失败: {url}")
                 return None
     return None
 
 
-def gamma_get(path: str, params: dict[str, Any] | None = None) -> Any | None:
-    return api_get(f"{GAMMA_API_BASE}{path}", params=params)
+async def api_get_async(
+    url: str,
+    params: dict[str, Any] | None = None,
+    timeout: int = 30,
+    use_cache: bool = True,
+) -> Any | None:
+    """api_get 的异步版本。"""
+    return await _api_request_async("GET", url, params=params, timeout=timeout, use_cache=use_cache)
 
 
-def clob_get(path: str, params: dict[str, Any] | None = None) -> Any | None:
-    return api_get(f"{CLOB_API_BASE}{path}", params=params)
+async def api_post_async(url: str, json_body: Any, timeout: int = 30) -> Any | None:
+    """api_post 的异步版本。"""
+    return await _api_request_async("POST", url, json_body=json_body, timeout=timeout)
 
 
-def clob_post(path: str, json_body: Any) -> Any | None:
-    return api_post(f"{CLOB_API_BASE}{path}", json_body)
+async def gamma_get_async(
+    path: str, params: dict[str, Any] | None = None, use_cache: bool = True,
+) -> Any | None:
+    return await api_get_async(f"{GAMMA_API_BASE}{path}", params=params, use_cache=use_cache)
 
 
-def data_get(path: str, params: dict[str, Any] | None = None) -> Any | None:
-    return api_get(f"{DATA_API_BASE}{path}", params=params)
+async def clob_get_async(path: str, params: dict[str, Any] | None = None) -> Any | None:
+    return await api_get_async(f"{CLOB_API_BASE}{path}", params=params)
+
+
+async def clob_post_async(path: str, json_body: Any) -> Any | None:
+    return await api_post_async(f"{CLOB_API_BASE}{path}", json_body)
+
+
+async def data_get_async(path: str, params: dict[str, Any] | None = None) -> Any | None:
+    return await api_get_async(f"{DATA_API_BASE}{path}", params=params)
@@ -0,0 +1,139 @@
+"""存储后端基准 — 同一批合成数据分别写入 SQLite 与 DuckDB，对比写入速度、库大小与各类查询耗时
+
+两个后端都经由 database.py 的 save_* 写入（同一写线程、同样按批提交），查询也走 get_reader() /
+get_* 公共函数：SQLite 上的全表聚合与 database.py 一样逐个日分区执行后在 Python 中合并。
+查询分两类：全表扫描聚合（列存的强项）与按 token / condition 的点查、区间查（行存 + 索引的强项）。
+"""
+from __future__ import annotations
+
+import os
+import random
+import statistics
+import tempfile
+import time
+from collections import defaultdict
+from datetime import timedelta
+from typing import Callable
+
+from src import database, duckdb_store
+from src.bench import synthetic
+
+N_TOKENS = 2000
+N_TRADE_MARKETS = 1000
+REPEAT = 5
+
+
+def _dir_size(path: str) -> int:
+    return sum(os.path.getsize(os.path.join(path, f)) for f in os.listdir(path))
+
+
+def _volume_by_condition() -> int:
+    conn = database.get_reader()
+    totals: dict[str, list[float]] = defaultdict(lambda: [0.0, 0])
+    for table in database.partition_tables(conn, "trades"):
+        for cond, notional, n in conn.execute(
+            f"SELECT condition_id, SUM(price * size), COUNT(*) FROM {table} GROUP BY condition_id"
+        ):
+            totals[cond][0] += notional
+            totals[cond][1] += n
+    return len(totals)
+
+
+def _hourly_spread() -> int:
+    conn = database.get_reader()
+    hours = set()
+    for table in database.partition_tables(conn, "orderbook_snapshots"):
+        for (hour, _, _) in conn.execute(
+            f"SELECT substr(snapshot_time, 1, 13), AVG(spread), MAX(total_bid_depth) FROM {table} GROUP BY 1"
+        ):
+            hours.add(hour)
+    return len(hours)
+
+
+class _Queries:
+    def __init__(self, n: int):
+        self.rng = random.Random(11)
+        self.tokens = [synthetic.token_id(i, 0) for i in range(N_TOKENS)]
+        self.conditions = [synthetic.condition_id(i) for i in range(N_TRADE_MARKETS)]
+        self.minutes = max(1, n // N_TOKENS)
+
+    def token_window(self) -> int:
+        lo = synthetic.BASE_TIME + timedelta(minutes=self.rng.randrange(self.minutes))
+        return sum(1 for _ in database.iter_snapshots(
+            self.rng.choice(self.tokens), lo.isoformat(), (lo + timedelta(hours=1)).isoformat()))
+
+    def condition_trades(self) -> int:
+        return sum(1 for _ in database.iter_trades([self.rng.choice(self.conditions)]))
+
+    def trade_candles(self) -> int:
+        return len(database.get_trade_candles(self.rng.choice(self.conditions), 3600))
+
+    def mid_candles(self) -> int:
+        return len(database.get_mid_candles(self.rng.choice(self.tokens), 3600))
+
+
+# (名称, 类别, 查询)；类别: scan = 全表扫描聚合，lookup = 点查/区间查
+def _queries(q: _Queries) -> list[tuple[str, str, Callable[[], int]]]:
+    return [
+        ("成交计数", "scan", database.get_trade_count),
+        ("各 condition 成交额", "scan", _volume_by_condition),
+        ("每小时平均价差", "scan", _hourly_spread),
+        ("token 1 小时快照", "lookup", q.token_window),
+        ("condition 全部成交", "lookup", q.condition_trades),
+        ("condition 1h 成交 K 线", "lookup", q.trade_candles),
+        ("token 1h 中间价 K 线", "lookup", q.mid_candles),
+    ]
+
+
+def _run_backend(name: str, n: int) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        database.set_backend(name, os.path.join(tmp, f"bench.{name}"))
+        database.init_db()
+        t0 = time.perf_counter()
+        database.save_trades(synthetic.trade_rows(n, n_markets=N_TRADE_MARKETS))
+        trade_s = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        database.save_orderbook_snapshots(synthetic.snapshot_rows(n, n_tokens=N_TOKENS, depth=10))
+        snapshot_s = time.perf_counter() - t0
+        database.close_db()
+        size = _dir_size(tmp)
+
+        q = _Queries(n)
+        timings = {}
+        for label, kind, fn in _queries(q):
+            times = []
+            for _ in range(REPEAT):
+                t0 = time.perf_counter()
+                fn()
+                times.append((time.perf_counter() - t0) * 1000)
+            timings[label] = (kind, round(statistics.median(times), 2))
+        database.close_db()
+    return {
+        "backend": name, "rows": n,
+        "trades_per_sec": round(n / trade_s), "snapshots_per_sec": round(n / snapshot_s),
+        "size_mb": round(size / 1048576, 1),
+        "queries": [{"query": k, "kind": kind, "ms_p50": ms} for k, (kind, ms) in timings.items()],
+    }
+
+
+def run(n: int = 1_000_000) -> list[dict]:
+    backends = ["sqlite"] + (["duckdb"] if duckdb_store.available() else [])
+    if len(backends) == 1:
+        print("[Bench] 未安装 duckdb，只测 SQLite（pip install duckdb）")
+    saved_backend, saved_path = database._backend, database._db_path
+    results = []
+    try:
+        for name in backends:
+            results.append(_run_backend(name, n))
+    finally:
+        database.set_backend(saved_backend, saved_path)
+
+    print(f"\n[Bench] 成交 {n:,} + 快照 {n:,} 条（{N_TOKENS} 个 token，每侧 10 档）")
+    print(f"{'':<24}" + "".join(f"{r['backend']:>12}" for r in results))
+    print(f"{'成交写入 行/s':<24}" + "".join(f"{r['trades_per_sec']:>12,}" for r in results))
+    print(f"{'快照写入 行/s':<24}" + "".join(f"{r['snapshots_per_sec']:>12,}" for r in results))
+    print(f"{'库大小 MB':<24}" + "".join(f"{r['size_mb']:>12}" for r in results))
+    for i, row in enumerate(results[0]["queries"]):
+        label = f"{row['query']} ({'扫描' if row['kind'] == 'scan' else '点查'}) ms"
+        print(f"{label:<24}" + "".join(f"{r['queries'][i]['ms_p50']:>12,.2f}" for r in results))
+    return results
@@ -0,0 +1,163 @@
+"""订单簿档位编码基准 — JSON 文本 vs 定点二进制 (无压缩 / zlib / zstd)，以及关键帧 + 增量存储
+
+对每种编码报告: 单快照档位字节数、编码/解码速度，以及写入临时库后的实际库文件字节数/快照；
+增量部分报告开/关增量时的库字节数/快照、写入与还原读取速度。
+"""
+from __future__ import annotations
+
+import json
+import os
+import tempfile
+import time
+
+from src import database
+from src.bench import synthetic
+from src.orderbook.codec import encode_levels, decode_levels, decode_levels_float, zstd_available
+
+
+def _encodings() -> list[tuple[str, str]]:
+    out = [("json", "none"), ("binary", "none"), ("binary", "zlib")]
+    if zstd_available():
+        out.append(("binary", "zstd"))
+    return out
+
+
+def _db_bytes_per_snapshot(rows: list[dict], encoding: str, compression: str) -> float:
+    saved_path = database._db_path
+    saved_encoding = (database._level_encoding, database._level_compression)
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "books.db")
+            database.use_database(path)
+            database.init_db()
+            database.set_level_encoding(encoding, compression)
+            database.save_orderbook_snapshots(rows)
+            database.get_connection().execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            database.close_db()
+            size = os.path.getsize(path)
+    finally:
+        database.set_level_encoding(*saved_encoding)
+        database.use_database(saved_path)
+    return size / len(rows)
+
+
+def run(n: int = 10_000, depth: int = 15, churn: float = 1.0) -> list[dict]:
+    rows = list(synthetic.snapshot_rows(n, depth=depth, churn=churn))
+    books = [(r["bids"], r["asks"]) for r in rows]
+    results = []
+
+    print(f"[Bench] {n:,} 个快照, 每侧最多 {depth} 档, 档位变化率 {churn:g}")
+    print(f"{'编码':<14} {'档位 B/快照':>12} {'库 B/快照':>10} {'编码/s':>10} {'解码/s':>10} {'解码(float)/s':>14}")
+    for encoding, compression in _encodings():
+        label = encoding if encoding == "json" else f"binary-{compression}"
+        t0 = time.perf_counter()
+        if encoding == "json":
+            payloads = [(json.dumps(b), json.dumps(a)) for b, a in books]
+        else:
+            payloads = [encode_levels(b, a, compression) for b, a in books]
+        enc_s = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        if encoding == "json":
+            for pb, pa in payloads:
+                json.loads(pb), json.loads(pa)
+        else:
+            for p in payloads:
+                decode_levels(p)
+        dec_s = time.perf_counter() - t0
+
+        float_s = None
+        if encoding == "json":
+            nbytes = sum(len(pb.encode()) + len(pa.encode()) for pb, pa in payloads)
+            t0 = time.perf_counter()
+            for pb, pa in payloads:
+                [(float(lv["price"]), float(lv["size"])) for lv in json.loads(pb)]
+                [(float(lv["price"]), float(lv["size"])) for lv in json.loads(pa)]
+            float_s = time.perf_counter() - t0
+        else:
+            nbytes = sum(len(p) for p in payloads)
+            t0 = time.perf_counter()
+            for p in payloads:
+                decode_levels_float(p)
+            float_s = time.perf_counter() - t0
+
+        row = {
+            "encoding": label,
+            "level_bytes_per_snapshot": round(nbytes / n, 1),
+            "db_bytes_per_snapshot": round(_db_bytes_per_snapshot(rows, encoding, compression), 1),
+            "encode_per_sec": round(n / enc_s),
+            "decode_per_sec": round(n / dec_s),
+            "decode_float_per_sec": round(n / float_s),
+        }
+        results.append(row)
+        print(f"{label:<14} {row['level_bytes_per_snapshot']:>12,} {row['db_bytes_per_snapshot']:>10,} "
+              f"{row['encode_per_sec']:>10,} {row['decode_per_sec']:>10,} {row['decode_float_per_sec']:>14,}")
+
+    _check_roundtrip(books)
+    results.extend(_delta_section(rows))
+    return results
+
+
+def _delta_section(rows: list[dict]) -> list[dict]:
+    """增量存储开/关的库大小、写入速度、还原读取速度，并校验还原结果。"""
+    n = len(rows)
+    saved_path = database._db_path
+    saved_encoding = (database._level_encoding, database._level_compression)
+    saved_delta = database._delta_encoder
+    results = []
+    print(f"\n{'存储':<20} {'库 B/快照':>10} {'写入/s':>10} {'还原读取/s':>12} {'关键帧占比':>10}")
+    try:
+        for encoding in ("json", "binary"):
+            for delta in (False, True):
+                with tempfile.TemporaryDirectory() as tmp:
+                    path = os.path.join(tmp, "delta.db")
+                    database.use_database(path)
+                    database.init_db()
+                    database.set_level_encoding(encoding)
+                    database.set_delta_encoding(delta)
+                    t0 = time.perf_counter()
+                    database.save_orderbook_snapshots(rows)
+                    write_s = time.perf_counter() - t0
+                    database.get_connection().execute("PRAGMA wal_checkpoint(TRUNCATE)")
+                    size = os.path.getsize(path)
+
+                    t0 = time.perf_counter()
+                    restored = list(database.iter_snapshots())
+                    read_s = time.perf_counter() - t0
+                    ok = all(
+                        [(float(x["price"]), float(x["size"])) for x in got[side]]
+                        == [(float(x["price"]), float(x["size"])) for x in orig[side]]
+                        for got, orig in zip(restored, rows) for side in ("bids", "asks")
+                    )
+                    kf_ratio = 1.0
+                    if delta:
+                        st = database._delta_encoder.stats
+                        kf_ratio = st["keyframes"] / max(1, st["keyframes"] + st["deltas"])
+                    database.close_db()
+
+                label = f"{encoding}{' + 增量' if delta else ''}"
+                row = {
+                    "storage": label, "db_bytes_per_snapshot": round(size / n, 1),
+                    "write_per_sec": round(n / write_s), "read_per_sec": round(n / read_s),
+                    "keyframe_ratio": round(kf_ratio, 3), "roundtrip_ok": ok,
+                }
+                results.append(row)
+                print(f"{label:<20} {row['db_bytes_per_snapshot']:>10,} {row['write_per_sec']:>10,} "
+                      f"{row['read_per_sec']:>12,} {kf_ratio:>10.1%}" + ("" if ok else "  还原不一致!"))
+    finally:
+        database._delta_encoder = saved_delta
+        database.set_level_encoding(*saved_encoding)
+        database.use_database(saved_path)
+    return results
+
+
+def _check_roundtrip(books: list[tuple[list[dict], list[dict]]]):
+    """二进制解码结果与原始档位数值一致。"""
+    bad = 0
+    for bids, asks in books:
+        dec_b, dec_a = decode_levels(encode_levels(bids, asks))
+        for orig, dec in ((bids, dec_b), (asks, dec_a)):
+            if [(float(x["price"]), float(x["size"])) for x in orig] != \
+                    [(float(x["price"]), float(x["size"])) for x in dec]:
+                bad += 1
+    print(f"\n[Bench] 往返校验: {len(books) - bad}/{len(books)} 个快照一致")
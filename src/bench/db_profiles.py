@@ -0,0 +1,103 @@
+"""SQLite 性能配置基准 — 逐个 config.SQLITE_PROFILES 写入同一批合成数据，对比写入速度与区间查询延迟
+
+每个配置使用独立的临时库：set_profile → init_db → 经写线程写入成交与快照（按日分区），
+写入耗时含 close_db（truncate 配置的收尾检查点也计入）。随后重新打开库，用只读连接执行
+database.py 中的两类区间查询（逐个分区执行），多组随机参数取 p50 / p95。
+"""
+from __future__ import annotations
+
+import os
+import random
+import statistics
+import tempfile
+import time
+from datetime import timedelta
+
+from config import SQLITE_PROFILES
+from src import database
+from src.bench import synthetic
+
+N_TOKENS = 500
+N_TRADE_MARKETS = 1000
+REPEAT = 200
+
+_TOKEN_WINDOW = ("SELECT * FROM {table} WHERE token_id=? AND snapshot_time>=? AND snapshot_time<? "
+                 "ORDER BY snapshot_time")
+_CONDITION_TRADES = "SELECT * FROM {table} WHERE condition_id=? ORDER BY trade_timestamp"
+
+
+def _size(path: str) -> int:
+    return os.path.getsize(path) if os.path.exists(path) else 0
+
+
+def _latency(conn, base: str, sql: str, params_of) -> tuple[float, float]:
+    tables = database.partition_tables(conn, base)
+    times = []
+    for _ in range(REPEAT):
+        params = params_of()
+        t0 = time.perf_counter()
+        for table in tables:
+            conn.execute(sql.format(table=table), params).fetchall()
+        times.append((time.perf_counter() - t0) * 1000)
+    times.sort()
+    return round(statistics.median(times), 3), round(times[int(len(times) * 0.95) - 1], 3)
+
+
+def _run_profile(name: str, n: int) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "profile.db")
+        database.set_profile(name)
+        database.use_database(path)
+        database.init_db()
+
+        t0 = time.perf_counter()
+        database.save_trades(synthetic.trade_rows(n, n_markets=N_TRADE_MARKETS))
+        database.save_orderbook_snapshots(synthetic.snapshot_rows(n, n_tokens=N_TOKENS, depth=10))
+        wal = _size(path + "-wal")
+        database.close_db()
+        elapsed = time.perf_counter() - t0
+
+        rng = random.Random(11)
+        tokens = [synthetic.token_id(i, 0) for i in range(N_TOKENS)]
+        conditions = [synthetic.condition_id(i) for i in range(N_TRADE_MARKETS)]
+        minutes = max(1, n // N_TOKENS)
+
+        def token_window() -> tuple:
+            m = rng.randrange(minutes)
+            lo = synthetic.BASE_TIME + timedelta(minutes=m)
+            return rng.choice(tokens), lo.isoformat(), (lo + timedelta(minutes=60)).isoformat()
+
+        conn = database.get_reader()
+        page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+        window = _latency(conn, "orderbook_snapshots", _TOKEN_WINDOW, token_window)
+        trades = _latency(conn, "trades", _CONDITION_TRADES, lambda: (rng.choice(conditions),))
+        database.close_db()
+        return {
+            "profile": name, "page_size": page_size, "rows": 2 * n,
+            "seconds": round(elapsed, 3), "rows_per_sec": round(2 * n / elapsed),
+            "wal_mb": round(wal / 1048576, 1), "db_mb": round(_size(path) / 1048576, 1),
+            "wal_after_close_mb": round(_size(path + "-wal") / 1048576, 1),
+            "token_window_ms_p50": window[0], "token_window_ms_p95": window[1],
+            "condition_trades_ms_p50": trades[0], "condition_trades_ms_p95": trades[1],
+        }
+
+
+def run(n: int = 200_000, profiles: list[str] | None = None) -> list[dict]:
+    profiles = profiles or list(SQLITE_PROFILES)
+    saved_path, saved_profile = database._db_path, database._profile_name
+    print(f"[Bench] 每个配置写入成交 {n:,} + 快照 {n:,} 条，区间查询各 {REPEAT} 次")
+    print(f"{'配置':<10} {'页大小':>6} {'写入 s':>8} {'行/s':>9} {'WAL MB':>7} {'关闭后 WAL':>10} {'库 MB':>7} "
+          f"{'token 区间 p50/p95 ms':>22} {'condition 成交 p50/p95 ms':>26}")
+    results = []
+    try:
+        for name in profiles:
+            r = _run_profile(name, n)
+            results.append(r)
+            print(f"{name:<10} {r['page_size']:>6} {r['seconds']:>8.2f} {r['rows_per_sec']:>9,} "
+                  f"{r['wal_mb']:>7} {r['wal_after_close_mb']:>10} {r['db_mb']:>7} "
+                  f"{r['token_window_ms_p50']:>12.3f} / {r['token_window_ms_p95']:<7.3f} "
+                  f"{r['condition_trades_ms_p50']:>14.3f} / {r['condition_trades_ms_p95']:<7.3f}")
+    finally:
+        database.set_profile(saved_profile)
+        database.use_database(saved_path)
+    return results
@@ -0,0 +1,135 @@
+"""写入基准 — executemany 单事务 / 旧版逐行 execute / 经 DbWriter 写入线程 (save_*) 的 rows/sec
+
+每个规模使用独立的临时库。先合成一个至多 POOL_SIZE 行的样本池，再循环复用并
+只改写唯一键，惰性产出目标行数 —— 1M 行既不整批驻留内存，合成开销也足够小；
+剩余的迭代耗时单独测量并从写入耗时中扣除。
+"""
+from __future__ import annotations
+
+import os
+import tempfile
+import time
+from itertools import cycle, islice
+from typing import Callable, Iterable, Iterator
+
+from src import database
+from src.bench import synthetic
+
+# 表名 → (写入类别, 写入函数名, 行生成器)
+TARGETS: dict[str, tuple[str, str, Callable[[int], Iterator[dict]]]] = {
+    "trades": ("trades", "save_trades", synthetic.trade_rows),
+    "snapshots": ("orderbook_snapshots", "save_orderbook_snapshots", synthetic.snapshot_rows),
+    "markets": ("markets", "save_markets", synthetic.market_rows),
+    "events": ("events", "save_events", synthetic.event_rows),
+}
+MODES = ["executemany", "per-row", "writer"]
+
+DEFAULT_SIZES = [10_000, 100_000, 1_000_000]
+POOL_SIZE = 10_000
+
+
+def _unique(table: str, r: dict, i: int) -> dict:
+    """改写唯一键，保证循环复用的样本行不会被 INSERT OR IGNORE 吞掉。"""
+    if table == "trades":
+        return {**r, "transaction_hash": f"0x{i:064x}"}
+    if table == "markets":
+        return {**r, "id": str(i)}
+    if table == "events":
+        return {**r, "id": i, "slug": f"{r['slug']}-{i}"}
+    return r
+
+
+def _row_source(table: str, n: int) -> Callable[[], Iterator[dict]]:
+    pool = list(TARGETS[table][2](min(n, POOL_SIZE)))
+    return lambda: (_unique(table, r, i) for i, r in enumerate(islice(cycle(pool), n)))
+
+
+def _per_row_execute(conn, kind: str, rows: Iterable[dict]) -> int:
+    """旧版写法：逐行 conn.execute，最后统一 commit。"""
+    params = database._WRITES[kind][1]
+    changes = 0
+    for _, sql, group in database.partition_groups(conn, kind, rows):
+        before = conn.total_changes
+        for p in params(group):
+            conn.execute(sql, p)
+        changes += conn.total_changes - before
+    conn.commit()
+    return changes
+
+
+def _executemany(conn, kind: str, rows: Iterable[dict]) -> int:
+    with conn:
+        return database.write_rows(conn, kind, rows)
+
+
+def _time_generation(rows: Callable[[], Iterator[dict]]) -> float:
+    t0 = time.perf_counter()
+    for _ in rows():
+        pass
+    return time.perf_counter() - t0
+
+
+def _time_write(table: str, rows: Callable[[], Iterator[dict]], mode: str) -> tuple[float, int]:
+    kind, save_name, _ = TARGETS[table]
+    with tempfile.TemporaryDirectory() as tmp:
+        database.use_database(os.path.join(tmp, "bench.db"))
+        database.init_db()
+        conn = database.get_connection()
+        t0 = time.perf_counter()
+        if mode == "writer":
+            changed = getattr(database, save_name)(rows())
+        elif mode == "per-row":
+            changed = _per_row_execute(conn, kind, rows())
+        else:
+            changed = _executemany(conn, kind, rows())
+        elapsed = time.perf_counter() - t0
+        database.close_db()
+    return elapsed, changed
+
+
+def run(sizes: list[int] | None = None, tables: list[str] | None = None,
+        modes: list[str] | None = None) -> list[dict]:
+    """运行基准并打印结果表，返回每个 (表, 规模, 模式) 的结果。"""
+    sizes = sizes or DEFAULT_SIZES
+    tables = tables or ["trades", "snapshots"]
+    modes = modes or MODES
+    saved_path = database._db_path
+    results = []
+
+    print(f"{'表':<10} {'行数':>9} {'模式':<12} {'写入 s':>8} {'rows/s':>11} {'变更行':>9}")
+    try:
+        for table in tables:
+            for n in sizes:
+                rows = _row_source(table, n)
+                gen_s = _time_generation(rows)
+                for mode in modes:
+                    total_s, changed = _time_write(table, rows, mode)
+                    write_s = max(total_s - gen_s, 1e-9)
+                    row = {
+                        "table": table, "rows": n, "mode": mode,
+                        "seconds": round(write_s, 4), "rows_per_sec": round(n / write_s),
+                        "changed": changed, "gen_seconds": round(gen_s, 4),
+                    }
+                    results.append(row)
+                    print(f"{table:<10} {n:>9,} {mode:<12} {write_s:>8.2f} "
+                          f"{row['rows_per_sec']:>11,} {changed:>9,}")
+    finally:
+        database.use_database(saved_path)
+
+    _check_dedup_count()
+    return results
+
+
+def _check_dedup_count():
+    """同一批交易写两次：第二次应返回 0（旧实现会返回整批行数）。"""
+    saved_path = database._db_path
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            database.use_database(os.path.join(tmp, "dedup.db"))
+            database.init_db()
+            first = database.save_trades(synthetic.trade_rows(1000))
+            second = database.save_trades(synthetic.trade_rows(1000))
+            database.close_db()
+    finally:
+        database.use_database(saved_path)
+    print(f"\n[Bench] 重复写入校验: 首次 {first} 行, 重复写入 {second} 行")
@@ -0,0 +1,210 @@
+"""读路径查询计划基准 — 在合成的多百万行库上对比旧单列索引与复合/部分索引
+
+先用 save_* 写入合成的事件、市场、快照与成交（按日分区），然后分别在旧索引集与当前
+init_db 的索引集下，对每条热点查询执行 EXPLAIN QUERY PLAN 并计时（多组随机参数取中位数）。
+分区表上的查询与 database.py 一样逐个分区执行；计划取最新分区的结果。
+"""
+from __future__ import annotations
+
+import os
+import random
+import re
+import statistics
+import tempfile
+import time
+from datetime import timedelta
+from typing import Callable
+
+from src import database
+from src.bench import synthetic
+
+N_TOKENS = 2000
+REPEAT = 20
+
+# 旧版索引（单列）: 索引名 → 建索引语句，用于对比
+_OLD_INDEXES = {
+    "idx_ob_token": "CREATE INDEX idx_ob_token ON orderbook_snapshots(token_id)",
+    "idx_trades_cond": "CREATE INDEX idx_trades_cond ON trades(condition_id)",
+}
+_OLD_PARTITION_INDEXES = {
+    "orderbook_snapshots": {"idx_{table}_token": "CREATE INDEX idx_{table}_token ON {table}(token_id)"},
+    "trades": {"idx_{table}_cond": "CREATE INDEX idx_{table}_cond ON {table}(condition_id)"},
+}
+_NEW_PARTITION_INDEXES = {"orderbook_snapshots": ["idx_{table}_token_time"], "trades": ["idx_{table}_cond_time"]}
+
+
+class _Ctx:
+    """查询参数来源：合成数据中的 token / condition / event 与时间范围。"""
+
+    def __init__(self, n_snapshots: int, n_markets: int, n_trade_markets: int):
+        self.rng = random.Random(11)
+        self.tokens = [synthetic.token_id(i, 0) for i in range(N_TOKENS)]
+        self.conditions = [synthetic.condition_id(i) for i in range(n_trade_markets)]
+        self.events = [100000 + i for i in range(max(1, n_markets // 3))]
+        self.minutes = max(1, n_snapshots // N_TOKENS)
+
+    def iso(self, minute: int) -> str:
+        return (synthetic.BASE_TIME + timedelta(minutes=minute)).isoformat()
+
+    def token_window(self) -> tuple:
+        m = self.rng.randrange(self.minutes)
+        return self.rng.choice(self.tokens), self.iso(m), self.iso(m + 60)
+
+    def keyframe(self) -> tuple:
+        return self.rng.choice(self.tokens), self.iso(self.rng.randrange(self.minutes))
+
+    def minute_window(self) -> tuple:
+        m = self.rng.randrange(self.minutes)
+        return self.iso(m), self.iso(m + 1)
+
+    def condition(self) -> tuple:
+        return (self.rng.choice(self.conditions),)
+
+    def event(self) -> tuple:
+        return (self.rng.choice(self.events),)
+
+
+# (名称, 表, SQL, 参数)；SQL 与 database.py / exporter / generate_sample 中的读路径一致
+QUERIES: list[tuple[str, str, str, Callable[[_Ctx], tuple]]] = [
+    ("快照: token 时间区间", "orderbook_snapshots",
+     "SELECT * FROM {table} WHERE token_id=? AND snapshot_time>=? AND snapshot_time<? ORDER BY snapshot_time",
+     _Ctx.token_window),
+    ("快照: 关键帧查找", "orderbook_snapshots",
+     "SELECT bids_json, asks_json, book_blob FROM {table} "
+     "WHERE token_id=? AND snapshot_time=? AND base_time IS NULL LIMIT 1",
+     _Ctx.keyframe),
+    ("快照: 1 分钟窗口", "orderbook_snapshots",
+     "SELECT * FROM {table} WHERE snapshot_time>=? AND snapshot_time<? ORDER BY snapshot_time",
+     _Ctx.minute_window),
+    ("成交: condition 按时间", "trades",
+     "SELECT * FROM {table} WHERE condition_id=? ORDER BY trade_timestamp", _Ctx.condition),
+    ("成交: condition 计数", "trades",
+     "SELECT COUNT(*) FROM {table} WHERE condition_id=?", _Ctx.condition),
+    ("市场: 活跃市场", "markets",
+     "SELECT * FROM markets WHERE closed=0 AND accepting_orders=1 ORDER BY event_id", lambda ctx: ()),
+    ("市场: 按事件", "markets", "SELECT * FROM markets WHERE event_id=?", _Ctx.event),
+    ("Token: 活跃市场 token", "tokens",
+     "SELECT t.token_id, t.condition_id, t.market_id, t.outcome_index, t.outcome "
+     "FROM markets m JOIN tokens t ON t.market_id = m.id "
+     "WHERE m.closed=0 AND m.accepting_orders=1 ORDER BY m.event_id, t.market_id, t.outcome_index",
+     lambda ctx: ()),
+]
+
+_SCAN = re.compile(r"^SCAN (\w+)(?: USING (?:COVERING )?INDEX (\w+))?")
+_INDEX_NAME = re.compile(r"EXISTS (\w+)")
+
+
+def _build(n: int, n_markets: int, n_trade_markets: int):
+    t0 = time.perf_counter()
+    database.save_events(synthetic.event_rows(max(1, n_markets // 3)))
+    database.save_markets(synthetic.market_rows(n_markets))
+    database.save_trades(synthetic.trade_rows(n, n_markets=n_trade_markets))
+    database.save_orderbook_snapshots(synthetic.snapshot_rows(n, n_tokens=N_TOKENS, depth=3))
+    database.close_db()
+    print(f"[Bench] 合成库: 快照 {n:,} / 成交 {n:,} / 市场 {n_markets:,}, "
+          f"写入耗时 {time.perf_counter() - t0:.0f}s")
+
+
+def _tables(conn, base: str) -> list[str]:
+    if base in ("orderbook_snapshots", "trades"):
+        return database.partition_tables(conn, base)
+    return [base]
+
+
+def _set_indexes(conn, which: str):
+    """切换到旧索引集 (old) 或当前 init_db 的索引集 (new)。"""
+    if which == "old":
+        for stmt in database._INDEXES:
+            conn.execute(f"DROP INDEX IF EXISTS {_INDEX_NAME.search(stmt).group(1)}")
+        for stmt in _OLD_INDEXES.values():
+            conn.execute(stmt)
+        for base, names in _NEW_PARTITION_INDEXES.items():
+            for table in database.partition_tables(conn, base)[1:]:
+                for name in names:
+                    conn.execute(f"DROP INDEX IF EXISTS {name.format(table=table)}")
+                for stmt in _OLD_PARTITION_INDEXES[base].values():
+                    conn.execute(stmt.format(table=table))
+    else:
+        for name in _OLD_INDEXES:
+            conn.execute(f"DROP INDEX IF EXISTS {name}")
+        for base, old in _OLD_PARTITION_INDEXES.items():
+            for table in database.partition_tables(conn, base)[1:]:
+                for name in old:
+                    conn.execute(f"DROP INDEX IF EXISTS {name.format(table=table)}")
+        database.ensure_indexes(conn)
+    conn.execute("ANALYZE")
+    conn.commit()
+
+
+def _plan(conn, sql: str, table: str, params: tuple) -> list[str]:
+    return [r[3] for r in conn.execute(f"EXPLAIN QUERY PLAN {sql.format(table=table)}", params)]
+
+
+def _full_scan(conn, step: str) -> bool:
+    """SCAN 步骤读遍整表（或整个非部分索引）即视为全表扫描；只含目标行的部分索引除外。"""
+    m = _SCAN.match(step)
+    if m is None:
+        return False
+    if m.group(2) is None:
+        return True
+    sql = conn.execute("SELECT sql FROM sqlite_master WHERE name=?", (m.group(2),)).fetchone()
+    return not (sql and sql[0] and " WHERE " in sql[0].upper())
+
+
+def _measure(conn, ctx: _Ctx) -> list[dict]:
+    out = []
+    for name, base, sql, params_of in QUERIES:
+        tables = _tables(conn, base)
+        plan = _plan(conn, sql, tables[-1], params_of(ctx)) if tables else []
+        times = []
+        for _ in range(REPEAT):
+            params = params_of(ctx)
+            t0 = time.perf_counter()
+            for table in tables:
+                conn.execute(sql.format(table=table), params).fetchall()
+            times.append((time.perf_counter() - t0) * 1000)
+        out.append({
+            "query": name, "plan": plan, "ms_p50": round(statistics.median(times), 3),
+            "full_scan": any(_full_scan(conn, p) for p in plan),
+            "temp_sort": any("TEMP B-TREE" in p for p in plan),
+        })
+    return out
+
+
+def run(n: int = 2_000_000, n_markets: int | None = None) -> list[dict]:
+    n_markets = n_markets or max(3000, n // 20)
+    n_trade_markets = min(n_markets, 1000)
+    saved_path = database._db_path
+    results = []
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            database.use_database(os.path.join(tmp, "queries.db"))
+            database.init_db()
+            _build(n, n_markets, n_trade_markets)
+            conn = database.get_connection()
+            ctx = _Ctx(n, n_markets, n_trade_markets)
+            measured = {}
+            for which in ("old", "new"):
+                _set_indexes(conn, which)
+                ctx.rng.seed(11)
+                measured[which] = _measure(conn, ctx)
+            database.close_db()
+    finally:
+        database.use_database(saved_path)
+
+    print(f"\n{'查询':<22} {'旧索引 ms':>10} {'新索引 ms':>10}  新索引查询计划")
+    for old, new in zip(measured["old"], measured["new"]):
+        flags = "".join([" [全表扫描]" if new["full_scan"] else "", " [临时排序]" if new["temp_sort"] else ""])
+        print(f"{new['query']:<22} {old['ms_p50']:>10,.2f} {new['ms_p50']:>10,.2f}  "
+              f"{' | '.join(new['plan'])}{flags}")
+        results.append({"query": new["query"], "old_ms_p50": old["ms_p50"], "new_ms_p50": new["ms_p50"],
+                        "old_plan": old["plan"], "new_plan": new["plan"],
+                        "old_full_scan": old["full_scan"], "new_full_scan": new["full_scan"]})
+
+    scans = [r["query"] for r in results if r["new_full_scan"]]
+    if scans:
+        print(f"\n[Bench] 仍有全表扫描: {', '.join(scans)}")
+    else:
+        old_scans = sum(r["old_full_scan"] for r in results)
+        print(f"\n[Bench] 新索引下无全表扫描（旧索引下 {old_scans} 条查询为全表扫描）")
+    return results
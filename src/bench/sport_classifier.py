@@ -0,0 +1,132 @@
+"""运动分类基准 — 合成事件语料上对比逐运动比对 tag 的原始算法与 SportClassifier（倒排索引 + Aho-Corasick）
+
+语料按 Gamma /sports 的形态构造约 N_SPORTS 种运动（每种 1 个通用 tag + 1~2 个具体 tag，少数运动共享 tag），
+事件分四类：带本运动 tag、同时带两种运动的 tag（比对命中数与并列顺序）、只有通用 tag 但 slug 含运动名
+（走子串兜底）、完全无法识别。两种实现对每个事件的结果必须完全一致。
+"""
+from __future__ import annotations
+
+import random
+import time
+
+from src.bench import synthetic
+from src.discovery.markets_parser import SportClassifier
+
+N_SPORTS = 120
+_EXTRA = ["cfb", "cbb", "wta", "mls", "ucl", "uel", "bun", "sea", "fl1", "ipl", "cs2", "lol", "dota2",
+          "val", "kbo", "npb", "afl", "nrl", "pga", "f1", "boxing", "cricket", "ncaaf", "epl2"]
+
+
+def _legacy_detect(event: dict, sport_tag_map: dict[str, list[int]]) -> str:
+    """SportClassifier 之前的实现（逐运动重建 tag 集合并求交集，再逐运动做子串判断），作为对照。"""
+    event_tags = set()
+    for tag in event.get("tags", []):
+        tag_id = tag.get("id")
+        if tag_id:
+            event_tags.add(int(tag_id))
+
+    generic_tags = {1, 100639}
+    best_match = ""
+    best_score = 0
+
+    for sport, sport_tags in sport_tag_map.items():
+        specific = [t for t in sport_tags if t not in generic_tags]
+        overlap = len(event_tags & set(specific))
+        if overlap > best_score:
+            best_score = overlap
+            best_match = sport
+
+    if not best_match:
+        series_slug = event.get("seriesSlug", "") or ""
+        slug = event.get("slug", "") or ""
+        for sport in sport_tag_map:
+            if sport in series_slug.lower() or sport in slug.lower():
+                return sport
+
+    return best_match
+
+
+def sport_tag_map(n_sports: int = N_SPORTS, seed: int = 7) -> dict[str, list[int]]:
+    rng = random.Random(seed)
+    names = list(dict.fromkeys(synthetic.SPORTS + _EXTRA))
+    names += [f"lg{i}" for i in range(n_sports - len(names))]
+    result = {}
+    for i, name in enumerate(names[:n_sports]):
+        tags = [1, 1000 + i, 100639]
+        if rng.random() < 0.2:
+            tags.insert(2, 5000 + i)
+        if i and rng.random() < 0.05:
+            tags.append(1000 + rng.randrange(i))   # 与前面某个运动共享一个具体 tag
+        result[name] = tags
+    return result
+
+
+def event_corpus(n: int, tag_map: dict[str, list[int]], seed: int = 11) -> list[dict]:
+    rng = random.Random(seed)
+    sports = list(tag_map)
+    generic = [{"id": "1", "label": "Sports"}, {"id": "100639", "label": "Games"}]
+    events = []
+    for i in range(n):
+        sport = rng.choice(sports)
+        r = rng.random()
+        slug = f"{sport}-team{rng.randint(1, 30)}-team{rng.randint(31, 60)}-{i}"
+        series = sport
+        if r < 0.80:
+            tags = generic + [{"id": str(t)} for t in tag_map[sport] if t not in (1, 100639)]
+        elif r < 0.85:
+            other = rng.choice(sports)
+            tags = generic + [{"id": str(t)} for t in tag_map[sport] + tag_map[other] if t not in (1, 100639)]
+        elif r < 0.95:
+            tags, series = list(generic), rng.choice(["", sport])
+        else:
+            tags, series, slug = list(generic), "", f"exhibition-match-{i}"
+        events.append({"id": str(100000 + i), "slug": slug, "seriesSlug": series, "tags": tags})
+    return events
+
+
+def run(n: int = 500_000) -> dict:
+    tag_map = sport_tag_map()
+    events = event_corpus(n, tag_map)
+
+    t0 = time.perf_counter()
+    classifier = SportClassifier(tag_map)
+    build_ms = (time.perf_counter() - t0) * 1000
+
+    t0 = time.perf_counter()
+    legacy = [_legacy_detect(e, tag_map) for e in events]
+    legacy_s = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    fast = [classifier.classify(e) for e in events]
+    fast_s = time.perf_counter() - t0
+
+    mismatches = sum(a != b for a, b in zip(legacy, fast))
+    fallback = [e for e in events if len(e["tags"]) == 2]
+    t0 = time.perf_counter()
+    for e in fallback:
+        _legacy_detect(e, tag_map)
+    legacy_fb_s = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    for e in fallback:
+        classifier.classify(e)
+    fast_fb_s = time.perf_counter() - t0
+
+    result = {
+        "events": n, "sports": len(tag_map), "build_ms": round(build_ms, 2),
+        "legacy_s": round(legacy_s, 3), "classifier_s": round(fast_s, 3),
+        "legacy_per_sec": round(n / legacy_s), "classifier_per_sec": round(n / fast_s),
+        "speedup": round(legacy_s / fast_s, 1),
+        "fallback_events": len(fallback),
+        "fallback_legacy_us": round(legacy_fb_s / max(1, len(fallback)) * 1e6, 2),
+        "fallback_classifier_us": round(fast_fb_s / max(1, len(fallback)) * 1e6, 2),
+        "unclassified": fast.count(""), "mismatches": mismatches,
+    }
+    print(f"[Bench] {n:,} 个事件，{len(tag_map)} 种运动；分类器构建 {result['build_ms']} ms")
+    print(f"  原始算法:   {legacy_s:8.2f}s  {result['legacy_per_sec']:>10,} 事件/s")
+    print(f"  分类器:     {fast_s:8.2f}s  {result['classifier_per_sec']:>10,} 事件/s  ({result['speedup']}x)")
+    print(f"  slug 兜底 {len(fallback):,} 个: 原始 {result['fallback_legacy_us']} µs/个, "
+          f"分类器 {result['fallback_classifier_us']} µs/个")
+    print(f"  未识别 {result['unclassified']:,} 个，结果不一致 {mismatches} 个")
+    if mismatches:
+        raise AssertionError(f"分类结果与原始算法不一致: {mismatches} 个事件")
+    return result
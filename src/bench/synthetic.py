@@ -0,0 +1,124 @@
+"""基准测试用的合成数据行 — 与 save_* 接收的 dict 结构一致，按需惰性生成"""
+from __future__ import annotations
+
+import hashlib
+import json
+import random
+from datetime import datetime, timedelta, timezone
+from typing import Iterator
+
+BASE_TIME = datetime(2026, 1, 1, tzinfo=timezone.utc)
+SPORTS = ["nba", "nfl", "mlb", "nhl", "epl", "wnba", "ncaab", "ufc", "atp", "lal"]
+
+
+def _hex(seed: int, *parts) -> str:
+    return hashlib.sha256(f"{seed}:{':'.join(map(str, parts))}".encode()).hexdigest()
+
+
+def condition_id(i: int, seed: int = 7) -> str:
+    return "0x" + _hex(seed, "cond", i)
+
+
+def token_id(i: int, outcome: int, seed: int = 7) -> str:
+    return str(int(_hex(seed, "tok", i, outcome)[:62], 16))
+
+
+def event_rows(n: int, seed: int = 7) -> Iterator[dict]:
+    rng = random.Random(seed)
+    for i in range(n):
+        sport = SPORTS[i % len(SPORTS)]
+        start = BASE_TIME + timedelta(hours=i)
+        slug = f"{sport}-team{rng.randint(1, 30)}-team{rng.randint(31, 60)}-{start:%Y-%m-%d}-{i}"
+        closed = rng.random() < 0.8
+        yield {
+            "id": 100000 + i, "slug": slug, "title": slug, "sport": sport,
+            "start_time": start.isoformat(), "end_time": (start + timedelta(hours=3)).isoformat(),
+            "game_id": str(900000 + i), "game_status": "Final" if closed else "Scheduled",
+            "score": "101-99" if closed else "", "volume": rng.uniform(1e3, 1e6),
+            "active": True, "closed": closed, "neg_risk": False,
+            "polymarket_url": f"https://polymarket.com/event/{slug}",
+        }
+
+
+def market_rows(n: int, markets_per_event: int = 3, seed: int = 7) -> Iterator[dict]:
+    rng = random.Random(seed)
+    for i in range(n):
+        ev = i // markets_per_event
+        sport = SPORTS[ev % len(SPORTS)]
+        closed = rng.random() < 0.8
+        yield {
+            "id": str(500000 + i), "event_id": 100000 + ev, "condition_id": condition_id(i, seed),
+            "slug": f"{sport}-market-{i}", "question": f"{sport.upper()} market {i}?",
+            "sports_market_type": ("moneyline", "spreads", "totals")[i % 3], "line": None,
+            "outcomes": json.dumps(["Home", "Away"]), "outcome_prices": json.dumps(["0.5", "0.5"]),
+            "clob_token_ids": json.dumps([token_id(i, 0, seed), token_id(i, 1, seed)]),
+            "team_a_id": "1", "team_b_id": "2", "volume": rng.uniform(100, 1e6),
+            "closed": closed, "accepting_orders": not closed, "tick_size": 0.01, "neg_risk": False,
+        }
+
+
+def trade_rows(n: int, n_markets: int = 1000, seed: int = 7) -> Iterator[dict]:
+    rng = random.Random(seed)
+    conds = [condition_id(i, seed) for i in range(n_markets)]
+    wallets = ["0x" + _hex(seed, "w", i)[:40] for i in range(5000)]
+    ts0 = int(BASE_TIME.timestamp())
+    for i in range(n):
+        m = rng.randrange(n_markets)
+        ts = ts0 + i // 10
+        yield {
+            "event_slug": f"event-{m // 3}", "condition_id": conds[m],
+            "trade_timestamp": ts, "side": "BUY" if rng.random() < 0.55 else "SELL",
+            "outcome": "Home" if rng.random() < 0.5 else "Away",
+            "size": round(rng.uniform(1, 2000), 2), "price": round(rng.uniform(0.01, 0.99), 3),
+            "proxy_wallet": wallets[rng.randrange(len(wallets))],
+            "transaction_hash": "0x" + _hex(seed, "tx", i),
+            "timestamp_ms": ts * 1000 + i % 1000, "server_received_ms": None,
+        }
+
+
+def book_levels(rng: random.Random, mid: float, depth: int) -> tuple[list[dict], list[dict]]:
+    bids, asks = [], []
+    for k in range(depth):
+        bp, ap = round(mid - 0.01 * (k + 1), 2), round(mid + 0.01 * (k + 1), 2)
+        if bp > 0:
+            bids.append({"price": f"{bp:.2f}", "size": f"{rng.uniform(10, 5000):.2f}"})
+        if ap < 1:
+            asks.append({"price": f"{ap:.2f}", "size": f"{rng.uniform(10, 5000):.2f}"})
+    return bids, asks
+
+
+def snapshot_rows(n: int, n_tokens: int = 500, depth: int = 15, seed: int = 7,
+                  churn: float = 1.0) -> Iterator[dict]:
+    """按轮询顺序生成快照：每轮 n_tokens 个 token 各一条，间隔 60s。
+
+    churn=1 时每条快照中间价游走、全部档位重新生成；churn<1 时中间价不变，
+    每个档位以 churn 的概率改量（模拟高频轮询下相邻快照只差几档）。
+    """
+    rng = random.Random(seed)
+    tokens = [token_id(i, 0, seed) for i in range(n_tokens)]
+    mids = [rng.uniform(0.2, 0.8) for _ in range(n_tokens)]
+    books: dict[int, tuple[list[dict], list[dict]]] = {}
+    for i in range(n):
+        t = i % n_tokens
+        if churn >= 1 or t not in books:
+            mids[t] = min(0.9, max(0.1, mids[t] + rng.uniform(-0.01, 0.01)))
+            bids, asks = book_levels(rng, round(mids[t], 2), depth)
+        else:
+            bids, asks = (
+                [{"price": lv["price"], "size": f"{rng.uniform(10, 5000):.2f}"}
+                 if rng.random() < churn else lv for lv in side]
+                for side in books[t]
+            )
+        books[t] = (bids, asks)
+        best_bid = float(bids[0]["price"]) if bids else 0
+        best_ask = float(asks[0]["price"]) if asks else 0
+        yield {
+            "token_id": tokens[t], "condition_id": condition_id(t, seed),
+            "snapshot_time": (BASE_TIME + timedelta(seconds=60 * (i // n_tokens))).isoformat(),
+            "bids": bids, "asks": asks,
+            "best_bid": best_bid, "best_ask": best_ask,
+            "spread": round(best_ask - best_bid, 6), "mid_price": round((best_ask + best_bid) / 2, 6),
+            "last_trade_price": round(mids[t], 3), "tick_size": "0.01",
+            "total_bid_depth": round(sum(float(b["size"]) for b in bids), 2),
+            "total_ask_depth": round(sum(float(a["size"]) for a in asks), 2),
+        }
@@ -0,0 +1,128 @@
+"""成交去重基准 — 回放链上回补式的重复写入，对比开/关去重过滤器的写入耗时与命中率
+
+模拟 stream-trades：每个区块一批成交逐块写入；每隔 reconnect_every 个区块断线重连一次，
+重连后按 100 块一段重放最近 backfill 个区块（与 ChainTradeStreamer._backfill 相同）。
+最后模拟进程重启：关闭（持久化过滤器）→ 重新打开 → 再回补一次，检验热启动命中率。
+另测 Data API 断点续传式的整页重复下载：全部成交入库后按 TRADES_PAGE_SIZE 一页一批再写一遍。
+两种模式的最终行数必须都等于唯一成交数（过滤器不能挡掉新成交）。
+"""
+from __future__ import annotations
+
+import os
+import sys
+import tempfile
+import time
+
+from config import TRADES_PAGE_SIZE
+from src import database
+from src.bench import synthetic
+
+BACKFILL_CHUNK = 100
+
+
+def _stream(n_blocks: int, backfill: int, reconnect_every: int) -> list[tuple[int, int]]:
+    """写入顺序：(起始区块, 结束区块) 列表，含重连后的重放段。"""
+    out = []
+    for b in range(n_blocks):
+        if b and b % reconnect_every == 0:
+            for start in range(max(0, b - backfill), b, BACKFILL_CHUNK):
+                out.append((start, min(start + BACKFILL_CHUNK, b)))
+        out.append((b, b + 1))
+    return out
+
+
+def _run_mode(blocks: list[list[dict]], order: list[tuple[int, int]], backfill: int, dedup: bool) -> dict:
+    saved_path = database._db_path
+    saved_dedup = database._trade_dedup
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            database.use_database(os.path.join(tmp, "dedup.db"))
+            database.init_db()
+            database.set_trade_dedup(dedup)
+            submitted = 0
+            t0 = time.perf_counter()
+            for start, end in order:
+                batch = [t for blk in blocks[start:end] for t in blk]
+                submitted += len(batch)
+                database.save_trades(batch)
+            elapsed = time.perf_counter() - t0
+            stats = database.trade_dedup_stats()
+            memory = _filter_bytes()
+
+            # 重启：持久化 → 重新加载 → 回补最近 backfill 个区块
+            database.close_db()
+            database.init_db()
+            database.set_trade_dedup(dedup)
+            tail = [t for blk in blocks[-backfill:] for t in blk]
+            t0 = time.perf_counter()
+            database.save_trades(tail)
+            restart_s = time.perf_counter() - t0
+            restart = database.trade_dedup_stats()
+            rows = database.get_trade_count()
+            database.close_db()
+    finally:
+        database.set_trade_dedup(saved_dedup)
+        database.use_database(saved_path)
+    return {
+        "dedup": dedup, "submitted": submitted, "rows": rows,
+        "seconds": round(elapsed, 3), "rows_per_sec": round(submitted / elapsed),
+        "hit_rate": stats.get("hit_rate", 0.0), "db_duplicates": stats.get("db_duplicates", submitted - rows),
+        "filter_mb": round(memory / 1048576, 1),
+        "restart_seconds": round(restart_s, 4), "restart_hit_rate": restart.get("hit_rate", 0.0),
+    }
+
+
+def _redownload(rows: list[dict], dedup: bool) -> float:
+    """全部成交入库后整页重写一遍（全是重复），返回重写耗时。"""
+    saved_path = database._db_path
+    saved_dedup = database._trade_dedup
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            database.use_database(os.path.join(tmp, "redownload.db"))
+            database.init_db()
+            database.set_trade_dedup(dedup)
+            database.save_trades(rows)
+            t0 = time.perf_counter()
+            for i in range(0, len(rows), TRADES_PAGE_SIZE):
+                database.save_trades(rows[i:i + TRADES_PAGE_SIZE])
+            elapsed = time.perf_counter() - t0
+            database.close_db()
+    finally:
+        database.set_trade_dedup(saved_dedup)
+        database.use_database(saved_path)
+    return elapsed
+
+
+def _filter_bytes() -> int:
+    f = database._trade_filter
+    if f is None:
+        return 0
+    sets = (f._current, f._previous)
+    return sum(sys.getsizeof(s) for s in sets) + 32 * len(f)   # 集合槽位 + int 对象
+
+
+def run(n: int = 200_000, per_block: int = 20, backfill: int = 100, reconnect_every: int = 200) -> list[dict]:
+    n_blocks = max(1, n // per_block)
+    rows = list(synthetic.trade_rows(n_blocks * per_block))
+    blocks = [rows[i * per_block:(i + 1) * per_block] for i in range(n_blocks)]
+    order = _stream(n_blocks, backfill, reconnect_every)
+    submitted = sum(min(end, n_blocks) - start for start, end in order) * per_block
+    print(f"[Bench] {len(rows):,} 笔唯一成交 / {n_blocks:,} 个区块, 每 {reconnect_every} 块重连并回补 "
+          f"{backfill} 块 → 共提交 {submitted:,} 笔 (重复 {1 - len(rows) / submitted:.0%})")
+    print(f"{'过滤器':<8} {'写入 s':>8} {'提交/s':>10} {'命中率':>8} {'SQLite 拒绝':>12} "
+          f"{'内存 MB':>8} {'重启回补 s':>11} {'重启命中率':>10} {'行数':>9}")
+    results = []
+    for dedup in (False, True):
+        r = _run_mode(blocks, order, backfill, dedup)
+        results.append(r)
+        ok = "" if r["rows"] == len(rows) else f"  行数不符（应为 {len(rows):,}）!"
+        print(f"{'开' if dedup else '关':<8} {r['seconds']:>8.2f} {r['rows_per_sec']:>10,} {r['hit_rate']:>8.1%} "
+              f"{r['db_duplicates']:>12,} {r['filter_mb']:>8} {r['restart_seconds']:>11.3f} "
+              f"{r['restart_hit_rate']:>10.1%} {r['rows']:>9,}{ok}")
+
+    off, on = _redownload(rows, False), _redownload(rows, True)
+    print(f"\n[Bench] 整页重复下载 {len(rows):,} 笔 (每页 {TRADES_PAGE_SIZE}): "
+          f"过滤器关 {off:.2f}s / 开 {on:.2f}s ({len(rows) / off:,.0f} → {len(rows) / on:,.0f} 笔/s)")
+    for r, seconds in zip(results, (off, on)):
+        r["redownload_seconds"] = round(seconds, 3)
+    return results
@@ -1,28 +1,204 @@
-"""SQLite 存储层 — 建表、CRUD、进度管理"""
+"""SQLite 存储层 — 建表、CRUD、进度管理
+
+查询走 get_reader()：每个线程一条只读 WAL 连接（mode=ro），与写入互不阻塞；所有写操作经由
+DbWriter 的单写线程分组提交；get_connection() 是建表、VACUUM 等管理操作使用的读写连接。
+
+orderbook_snapshots / trades 按 UTC 日分区：新数据写入 <表名>_YYYYMMDD 分区表（首次写入时创建），
+启用分区前写入的数据留在原表。读取统一经 partition_tables() 依次扫描原表与各分区；
+分区表 id 从 YYYYMMDD × PARTITION_ID_SPAN 起编号，全局唯一且可由 id 反查所在分区。
+
+trade_candles / mid_candles 是成交价与订单簿中间价的 OHLCV K 线（CANDLE_INTERVALS 各周期），
+由写线程在同一事务内随 save_trades / save_orderbook_snapshots 的新行增量累加；
+tokens 同样随 save_markets 写入，把市场的 clob_token_ids / outcomes 展开为一 token 一行。
+
+存储后端（STORAGE_BACKEND / set_backend）默认为 SQLite；duckdb 后端由 src/duckdb_store.py 提供只读连接
+与写线程的写入函数，其余函数不变。按日分区、增量/二进制档位、K 线增量表、成交去重过滤器与
+VACUUM / 保留任务等维护操作只属于 SQLite 后端。
+"""
 from __future__ import annotations
 
+import hashlib
+import json
 import os
 import sqlite3
-from datetime import datetime, timezone
-from typing import Any
-
-from config import DB_PATH, DATA_DIR
+import threading
+import time
+from datetime import date, datetime, timedelta, timezone
+from itertools import groupby
+from typing import Any, Callable, Iterable, Iterator
+
+from config import (
+    DB_PATH, ORDERBOOK_LEVEL_ENCODING, ORDERBOOK_LEVEL_COMPRESSION, ORDERBOOK_DELTA_ENABLED,
+    STORAGE_PARTITION_BY_DAY, CANDLE_INTERVALS, TRADE_DEDUP_ENABLED, SQLITE_PROFILE, SQLITE_PROFILES,
+    STORAGE_BACKEND, DUCKDB_PATH,
+)
+from src import duckdb_store
+from src.db_writer import DbWriter
+from src.orderbook.codec import encode_levels, decode_levels
+from src.orderbook.delta import DeltaEncoder, reconstruct_levels
+from src.trade_dedup import TradeDedupFilter
 
 _conn: sqlite3.Connection | None = None
+_backend = STORAGE_BACKEND
+_db_path = DUCKDB_PATH if STORAGE_BACKEND == "duckdb" else DB_PATH
+_store: duckdb_store.DuckDBStore | None = None   # duckdb 后端的库（首次使用时打开）
+_profile_name = SQLITE_PROFILE
+_writer: DbWriter | None = None
+_writer_lock = threading.Lock()
+_readers = threading.local()
+_reader_pool: list[sqlite3.Connection] = []   # 所有线程的只读连接，close_db 时统一关闭
+_reader_lock = threading.Lock()
+_reader_generation = 0
+_last_writer_stats: dict[str, Any] = {}
+_candle_rows = {"pending": 0, "committed": 0}   # 累加进 K 线表的原始行数（本事务 / 已提交）
+_level_encoding = ORDERBOOK_LEVEL_ENCODING
+_level_compression = ORDERBOOK_LEVEL_COMPRESSION
+_delta_encoder: DeltaEncoder | None = DeltaEncoder() if ORDERBOOK_DELTA_ENABLED else None
+_partition_by_day = STORAGE_PARTITION_BY_DAY
+_partition_tables: set[str] = set()   # 写连接上已确认存在的分区表（仅写线程访问）
+_epoch_days: dict[int, str] = {}
+_candle_intervals: tuple[int, ...] = tuple(CANDLE_INTERVALS)
+_trade_dedup = TRADE_DEDUP_ENABLED
+_trade_filter: TradeDedupFilter | None = None   # 写线程首次写成交时创建，close_db 时保存
+_last_dedup_stats: dict[str, Any] = {}
+
+PARTITION_ID_SPAN = 10 ** 8
+
+
+def use_database(path: str):
+    """切换后续连接使用的数据库文件（基准测试、临时库等）。"""
+    global _db_path
+    close_db()
+    _db_path = path
+
+
+def set_backend(name: str, path: str | None = None):
+    """切换存储后端（sqlite / duckdb）并关闭现有连接；path 省略时使用该后端的默认库文件。"""
+    global _backend, _db_path
+    if name not in ("sqlite", "duckdb"):
+        raise ValueError(f"未知的存储后端: {name}（可选: sqlite, duckdb）")
+    if name == "duckdb" and not duckdb_store.available():
+        raise ValueError("未安装 duckdb，无法使用 DuckDB 存储后端（pip install duckdb）")
+    close_db()
+    _backend = name
+    _db_path = path or (DUCKDB_PATH if name == "duckdb" else DB_PATH)
+
+
+def _get_store() -> duckdb_store.DuckDBStore:
+    global _store
+    if _store is None:
+        params = {kind: fn for kind, (_, fn) in _WRITES.items()}
+        params.update(tokens=_tokens_params, orderbook_snapshots=duckdb_store.snapshot_params)
+        _store = duckdb_store.DuckDBStore(_db_path, params)
+    return _store
+
+
+def _require_sqlite(what: str):
+    if _backend != "sqlite":
+        raise RuntimeError(f"{what} 仅支持 SQLite 存储后端（当前: {_backend}）")
+
+
+def set_profile(name: str):
+    """切换 SQLite 性能配置（config.SQLITE_PROFILES 中的名称）；关闭现有连接，之后打开的连接按新配置设置。"""
+    global _profile_name
+    if name not in SQLITE_PROFILES:
+        raise ValueError(f"未知的 SQLite 配置: {name}（可选: {', '.join(SQLITE_PROFILES)}）")
+    close_db()
+    _profile_name = name
+
+
+def _profile() -> dict[str, Any]:
+    return SQLITE_PROFILES[_profile_name]
+
+
+def _apply_read_pragmas(conn: sqlite3.Connection):
+    p = _profile()
+    conn.execute(f"PRAGMA cache_size=-{p['cache_size_kb']}")
+    conn.execute(f"PRAGMA mmap_size={p['mmap_bytes']}")
+    conn.execute(f"PRAGMA temp_store={p['temp_store']}")
+
+
+def _connect(path: str) -> sqlite3.Connection:
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    p = _profile()
+    conn = sqlite3.connect(path)
+    conn.row_factory = sqlite3.Row
+    conn.execute(f"PRAGMA page_size={p['page_size']}")   # 只对尚未建表的新库生效
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute(f"PRAGMA synchronous={p['synchronous']}")
+    conn.execute(f"PRAGMA wal_autocheckpoint={p['wal_autocheckpoint']}")
+    _apply_read_pragmas(conn)
+    return conn
 
 
 def get_connection() -> sqlite3.Connection:
+    """读写连接：建表、迁移、VACUUM 等管理操作使用；普通查询请用 get_reader()。"""
     global _conn
+    _require_sqlite("get_connection")
     if _conn is None:
-        os.makedirs(DATA_DIR, exist_ok=True)
-        _conn = sqlite3.connect(DB_PATH)
-        _conn.row_factory = sqlite3.Row
-        _conn.execute("PRAGMA journal_mode=WAL")
-        _conn.execute("PRAGMA synchronous=NORMAL")
+        _conn = _connect(_db_path)
     return _conn
 
 
+def get_reader() -> sqlite3.Connection:
+    """当前线程的只读连接（首次调用时打开，之后复用）。
+
+    以 mode=ro 打开、只执行查询，WAL 下读取已提交的快照，不会阻塞写线程，也不会被写入阻塞；
+    数据库需已由 init_db() 创建。duckdb 后端返回 DuckDB 库的只读查询入口（用法相同）。
+    """
+    if _backend != "sqlite":
+        return _get_store().reader()
+    conn = getattr(_readers, "conn", None)
+    if conn is not None and _readers.generation == _reader_generation:
+        return conn
+    conn = sqlite3.connect(f"file:{os.path.abspath(_db_path)}?mode=ro", uri=True, check_same_thread=False)
+    conn.row_factory = sqlite3.Row
+    _apply_read_pragmas(conn)
+    with _reader_lock:
+        _reader_pool.append(conn)
+        _readers.conn, _readers.generation = conn, _reader_generation
+    return conn
+
+
+def _close_readers():
+    """关闭所有线程的只读连接；各线程下次 get_reader() 时重新打开。"""
+    global _reader_generation
+    with _reader_lock:
+        for conn in _reader_pool:
+            conn.close()
+        _reader_pool.clear()
+        _reader_generation += 1
+
+
+def get_writer() -> DbWriter:
+    """全局写入线程（首次调用时启动）。"""
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            if _backend != "sqlite":
+                store = _get_store()
+                _writer = DbWriter(store.connect, store.write_rows)
+            else:
+                path = _db_path
+                _writer = DbWriter(lambda: _connect(path), write_rows,
+                                   on_rollback=_on_write_rollback, on_commit=_on_write_commit,
+                                   maintenance_kinds=("call",))
+            _writer.start()
+        return _writer
+
+
+def writer_stats() -> dict[str, Any]:
+    """写入线程统计；线程已停止时返回停止前的最终值。"""
+    st = _writer.stats() if _writer is not None else dict(_last_writer_stats)
+    if st:
+        st["candle_rows"] = _candle_rows["committed"]
+    return st
+
+
 def init_db():
+    if _backend != "sqlite":
+        _get_store().init_db(_candle_intervals)
+        return
     conn = get_connection()
     conn.executescript("""
     CREATE TABLE IF NOT EXISTS sports (
@@ -48,7 +224,8 @@ def init_db():
         closed          INTEGER,
         neg_risk        INTEGER,
         polymarket_url  TEXT,
-        fetched_at      TEXT
+        fetched_at      TEXT,
+        content_hash    TEXT
     );
 
     CREATE TABLE IF NOT EXISTS markets (
@@ -70,11 +247,25 @@ def init_db():
         tick_size            REAL,
         neg_risk            INTEGER,
         fetched_at          TEXT,
+        content_hash        TEXT,
+        sport               TEXT,
         FOREIGN KEY (event_id) REFERENCES events(id)
     );
     CREATE INDEX IF NOT EXISTS idx_markets_event ON markets(event_id);
     CREATE INDEX IF NOT EXISTS idx_markets_condition ON markets(condition_id);
 
+    CREATE TABLE IF NOT EXISTS tokens (
+        token_id        TEXT PRIMARY KEY,
+        condition_id    TEXT,
+        market_id       TEXT,
+        event_id        INTEGER,
+        outcome_index   INTEGER,
+        outcome         TEXT,
+        sport           TEXT
+    );
+    CREATE INDEX IF NOT EXISTS idx_tokens_market ON tokens(market_id, outcome_index);
+    CREATE INDEX IF NOT EXISTS idx_tokens_condition ON tokens(condition_id);
+
     CREATE TABLE IF NOT EXISTS orderbook_snapshots (
         id               INTEGER PRIMARY KEY AUTOINCREMENT,
         token_id         TEXT,
@@ -91,7 +282,6 @@ def init_db():
         total_bid_depth  REAL,
         total_ask_depth  REAL
     );
-    CREATE INDEX IF NOT EXISTS idx_ob_token ON orderbook_snapshots(token_id);
     CREATE INDEX IF NOT EXISTS idx_ob_time  ON orderbook_snapshots(snapshot_time);
 
     CREATE TABLE IF NOT EXISTS trades (
@@ -108,7 +298,37 @@ def init_db():
         fetched_at       TEXT,
         UNIQUE(transaction_hash, trade_timestamp, size, side, proxy_wallet)
     );
-    CREATE INDEX IF NOT EXISTS idx_trades_cond ON trades(condition_id);
+
+    CREATE TABLE IF NOT EXISTS trade_candles (
+        condition_id    TEXT,
+        outcome         TEXT,
+        interval        INTEGER,
+        bucket          INTEGER,
+        open            REAL,
+        high            REAL,
+        low             REAL,
+        close           REAL,
+        volume          REAL,
+        notional        REAL,
+        n_trades        INTEGER,
+        first_ts        REAL,
+        last_ts         REAL,
+        PRIMARY KEY (condition_id, outcome, interval, bucket)
+    ) WITHOUT ROWID;
+
+    CREATE TABLE IF NOT EXISTS mid_candles (
+        token_id        TEXT,
+        interval        INTEGER,
+        bucket          INTEGER,
+        open            REAL,
+        high            REAL,
+        low             REAL,
+        close           REAL,
+        samples         INTEGER,
+        first_ts        REAL,
+        last_ts         REAL,
+        PRIMARY KEY (token_id, interval, bucket)
+    ) WITHOUT ROWID;
 
     CREATE TABLE IF NOT EXISTS game_results (
         event_id         INTEGER PRIMARY KEY,
@@ -132,84 +352,361 @@ def init_db():
     );
     """)
 
-    for col, ctype in [("timestamp_ms", "INTEGER"), ("server_received_ms", "INTEGER")]:
+    for table, col, ctype in [
+        ("trades", "timestamp_ms", "INTEGER"),
+        ("trades", "server_received_ms", "INTEGER"),
+        ("orderbook_snapshots", "book_blob", "BLOB"),
+        ("orderbook_snapshots", "base_time", "TEXT"),
+        ("events", "content_hash", "TEXT"),
+        ("markets", "content_hash", "TEXT"),
+        ("markets", "sport", "TEXT"),
+    ]:
         try:
-            conn.execute(f"ALTER TABLE trades ADD COLUMN {col} {ctype}")
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN {col} {ctype}")
         except sqlite3.OperationalError:
             pass
+    ensure_indexes(conn)
+    moved = _split_legacy_trades(conn)
+    if moved:
+        print(f"[Partition] 原表成交按日移入分区: {moved} 条")
+    # 旧库：市场的 sport 由所属事件补齐（走 idx_markets_sport，已补齐的库只是一次空查找）
+    conn.execute("UPDATE markets SET sport = (SELECT sport FROM events WHERE events.id = markets.event_id) "
+                 "WHERE sport IS NULL")
+    if conn.execute("SELECT 1 FROM tokens LIMIT 1").fetchone() is None:
+        # 旧库：由已有市场一次性补齐 tokens
+        markets = conn.execute("SELECT id, event_id, condition_id, outcomes, clob_token_ids, sport FROM markets")
+        conn.executemany(_TOKENS_SQL, _tokens_params(dict(r) for r in markets))
+    else:
+        # 旧版写入时 sport 取自当时的事件行，事件尚未入库的 token 为 NULL：按所属市场补齐
+        conn.execute("UPDATE tokens SET sport = (SELECT sport FROM markets WHERE markets.id = tokens.market_id) "
+                     "WHERE sport IS NULL")
 
     conn.commit()
 
 
+# 热点读路径的索引：token 的时间区间、condition 按时间排序的成交、活跃市场（部分索引，只含活跃行）、
+# 按运动过滤市场（--sport，按 event_id 顺序读出）
+_INDEXES = [
+    "CREATE INDEX IF NOT EXISTS idx_ob_token_time ON orderbook_snapshots(token_id, snapshot_time)",
+    "CREATE INDEX IF NOT EXISTS idx_trades_cond_time ON trades(condition_id, trade_timestamp)",
+    "CREATE INDEX IF NOT EXISTS idx_markets_active ON markets(event_id) WHERE closed=0 AND accepting_orders=1",
+    "CREATE INDEX IF NOT EXISTS idx_markets_sport ON markets(sport, event_id)",
+]
+# 已被同前缀的复合索引取代，删除以减少写入开销
+_OBSOLETE_INDEXES = ["idx_ob_token", "idx_trades_cond"]
+_OBSOLETE_PARTITION_INDEXES = {"trades": ["idx_{table}_cond"]}
+
+
+def ensure_indexes(conn: sqlite3.Connection):
+    """补建缺失的索引（含已有分区表）并删除被取代的旧索引；已存在时均为空操作。"""
+    for stmt in _INDEXES:
+        conn.execute(stmt)
+    for name in _OBSOLETE_INDEXES:
+        conn.execute(f"DROP INDEX IF EXISTS {name}")
+    for base, ddl in _PARTITION_DDL.items():
+        for table in partition_tables(conn, base):
+            if partition_day(table) is None:
+                continue
+            for stmt in ddl[1:]:
+                conn.execute(stmt.format(table=table))
+            for name in _OBSOLETE_PARTITION_INDEXES.get(base, []):
+                conn.execute(f"DROP INDEX IF EXISTS {name.format(table=table)}")
+
+
 def _now() -> str:
     return datetime.now(timezone.utc).isoformat()
 
 
+def _submit(kind: str, rows: Iterable[dict]) -> int:
+    """同步写入：入队并等待提交，返回实际变更的行数（INSERT OR IGNORE 跳过的不计）。"""
+    return get_writer().submit(kind, rows, urgent=True).result()
+
+
+def run_in_writer(fn: Callable[[sqlite3.Connection], int]) -> int:
+    """在写线程上以写连接执行 fn(conn)（与其他写入串行、同事务提交），返回 fn 的返回值。
+
+    供分区拆分、降采样、删表等维护操作使用；fn 内不要提交或开启事务。
+    """
+    _require_sqlite("run_in_writer")
+    return _submit("call", [fn])
+
+
+# ── Partitions ────────────────────────────────────────────
+
+# 分区表结构（列与原表一致，原表经 ALTER 追加的列直接建入）
+_PARTITION_DDL = {
+    "orderbook_snapshots": [
+        """CREATE TABLE IF NOT EXISTS {table} (
+            id               INTEGER PRIMARY KEY AUTOINCREMENT,
+            token_id         TEXT,
+            condition_id     TEXT,
+            snapshot_time    TEXT,
+            base_time        TEXT,
+            bids_json        TEXT,
+            asks_json        TEXT,
+            book_blob        BLOB,
+            best_bid         REAL,
+            best_ask         REAL,
+            spread           REAL,
+            mid_price        REAL,
+            last_trade_price REAL,
+            tick_size        TEXT,
+            total_bid_depth  REAL,
+            total_ask_depth  REAL
+        )""",
+        "CREATE INDEX IF NOT EXISTS idx_{table}_token_time ON {table}(token_id, snapshot_time)",
+        "CREATE INDEX IF NOT EXISTS idx_{table}_time ON {table}(snapshot_time)",
+    ],
+    "trades": [
+        """CREATE TABLE IF NOT EXISTS {table} (
+            id                 INTEGER PRIMARY KEY AUTOINCREMENT,
+            event_slug         TEXT,
+            condition_id       TEXT,
+            trade_timestamp    INTEGER,
+            side               TEXT,
+            outcome            TEXT,
+            size               REAL,
+            price              REAL,
+            proxy_wallet       TEXT,
+            transaction_hash   TEXT,
+            fetched_at         TEXT,
+            timestamp_ms       INTEGER,
+            server_received_ms INTEGER,
+            UNIQUE(transaction_hash, trade_timestamp, size, side, proxy_wallet)
+        )""",
+        "CREATE INDEX IF NOT EXISTS idx_{table}_cond_time ON {table}(condition_id, trade_timestamp)",
+    ],
+}
+
+
+def set_partitioning(enabled: bool):
+    """开关后续快照/成交写入的按日分区（关闭时写入原表）；增量编码随之重新从关键帧开始。"""
+    global _partition_by_day
+    _partition_by_day = enabled
+    _reset_delta_state()
+
+
+def partition_day(table: str) -> str | None:
+    """分区表名 → YYYYMMDD；原表返回 None。"""
+    suffix = table.rsplit("_", 1)[-1]
+    return suffix if len(suffix) == 8 and suffix.isdigit() else None
+
+
+def partition_tables(
+    conn: sqlite3.Connection, base: str, first_day: str | None = None, last_day: str | None = None,
+) -> list[str]:
+    """base 的全部存储表：原表在前，其后是日期落在 [first_day, last_day] 内的分区表（按日期排序）。"""
+    names = [r[0] for r in conn.execute(
+        "SELECT name FROM sqlite_master WHERE type='table' AND (name=? OR name GLOB ?)",
+        (base, base + "_" + "[0-9]" * 8),
+    )]
+    days = sorted(partition_day(n) for n in names if n != base)
+    return ([base] if base in names else []) + [
+        f"{base}_{d}" for d in days
+        if (first_day is None or d >= first_day) and (last_day is None or d <= last_day)
+    ]
+
+
+def day_after(day: str) -> str:
+    return (date(int(day[:4]), int(day[4:6]), int(day[6:])) + timedelta(days=1)).strftime("%Y%m%d")
+
+
+def epoch_day(ts: int) -> str:
+    """Unix 秒 → UTC 日 YYYYMMDD。"""
+    d = ts // 86400
+    day = _epoch_days.get(d)
+    if day is None:
+        day = _epoch_days[d] = time.strftime("%Y%m%d", time.gmtime(d * 86400))
+    return day
+
+
+def _iso_day(ts: str | None) -> str | None:
+    return ts[:10].replace("-", "") if ts else None
+
+
+def _snapshot_day(r: dict) -> str | None:
+    return r["snapshot_time"][:10].replace("-", "") if _partition_by_day else None
+
+
+def _trade_day(r: dict) -> str | None:
+    return epoch_day(r["trade_timestamp"]) if _partition_by_day else None
+
+
+def _id_day(r: dict) -> str | None:
+    day = r["id"] // PARTITION_ID_SPAN
+    return str(day) if day else None
+
+
+def ensure_partition(conn: sqlite3.Connection, base: str, day: str) -> str:
+    """在写连接上建好 base 的 day 分区表（含索引与 id 起点），返回表名。"""
+    table = f"{base}_{day}"
+    if table not in _partition_tables:
+        for stmt in _PARTITION_DDL[base]:
+            conn.execute(stmt.format(table=table))
+        conn.execute(
+            "INSERT INTO sqlite_sequence (name, seq) SELECT ?, ? "
+            "WHERE NOT EXISTS (SELECT 1 FROM sqlite_sequence WHERE name=?)",
+            (table, int(day) * PARTITION_ID_SPAN, table),
+        )
+        _partition_tables.add(table)
+    return table
+
+
+def _split_legacy_trades(conn: sqlite3.Connection) -> int:
+    """启用分区时，把原表 trades 中的成交按 UTC 日移入分区表（每天一个事务），返回移动的行数。
+
+    唯一约束只在单表内生效：同一成交总落在同一日分区，留在原表的成交再次抓取时却会写进分区表而不冲突。
+    移动的成交并入去重过滤器的持久化指纹（移动后各表最大 id 改变，原指纹文件按规则会作废）。
+    """
+    if not _partition_by_day or conn.execute("SELECT 1 FROM trades LIMIT 1").fetchone() is None:
+        return 0
+    seed = None
+    if _trade_dedup:
+        seed = TradeDedupFilter()
+        seed.load(_trade_dedup_path(), _trade_marks(conn))
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_trades_ts ON trades(trade_timestamp)")
+    cols = ", ".join(r[1] for r in conn.execute("PRAGMA table_info(trades)") if r[1] != "id")
+    days = [r[0] for r in conn.execute(
+        "SELECT DISTINCT trade_timestamp / 86400 FROM trades WHERE trade_timestamp IS NOT NULL ORDER BY 1"
+    ).fetchall()]
+    moved = 0
+    for d in days:
+        table = ensure_partition(conn, "trades", epoch_day(d * 86400))
+        where, params = "trade_timestamp >= ? AND trade_timestamp < ?", (d * 86400, (d + 1) * 86400)
+        if seed is not None:
+            seed.seed(dict(r) for r in conn.execute(
+                f"SELECT transaction_hash, trade_timestamp, size, side, proxy_wallet FROM trades "
+                f"WHERE {where} ORDER BY id", params,
+            ))
+        moved += conn.execute(
+            f"INSERT OR IGNORE INTO {table} ({cols}) SELECT {cols} FROM trades WHERE {where}", params
+        ).rowcount
+        conn.execute(f"DELETE FROM trades WHERE {where}", params)
+        conn.commit()
+    if seed is not None and len(seed):
+        seed.save(_trade_dedup_path(), _trade_marks(conn))
+    return moved
+
+
+def drop_partition(table: str) -> int:
+    """删除一个分区表，返回删除的行数。"""
+    if partition_day(table) is None:
+        raise ValueError(f"不是分区表: {table}")
+
+    def _drop(conn: sqlite3.Connection) -> int:
+        n = conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+        conn.execute(f"DROP TABLE {table}")
+        conn.execute("DELETE FROM sqlite_sequence WHERE name=?", (table,))
+        _partition_tables.discard(table)
+        if _trade_filter is not None and table.startswith("trades_"):
+            _trade_filter.clear()   # 被删的成交可能重新写入，不能再被过滤
+        return n
+
+    return run_in_writer(_drop)
+
+
+def _on_write_rollback():
+    _reset_delta_state()
+    _candle_rows["pending"] = 0
+    _partition_tables.clear()
+    if _trade_filter is not None:
+        _trade_filter.rollback()
+
+
+def _on_write_commit():
+    _candle_rows["committed"] += _candle_rows["pending"]
+    _candle_rows["pending"] = 0
+    if _trade_filter is not None:
+        _trade_filter.commit()
+
+
+
 # ── Sports ────────────────────────────────────────────────
 
-def save_sports(rows: list[dict]) -> int:
-    conn = get_connection()
-    inserted = 0
-    for r in rows:
-        try:
-            conn.execute(
-                "INSERT OR REPLACE INTO sports (sport, tag_ids, series_id, image_url, resolution_url) "
-                "VALUES (?, ?, ?, ?, ?)",
-                (r["sport"], r["tag_ids"], r["series_id"], r.get("image_url", ""), r.get("resolution_url", "")),
-            )
-            inserted += 1
-        except sqlite3.IntegrityError:
-            pass
-    conn.commit()
-    return inserted
+_SPORTS_SQL = (
+    "INSERT OR REPLACE INTO sports (sport, tag_ids, series_id, image_url, resolution_url) "
+    "VALUES (?, ?, ?, ?, ?)"
+)
+
+
+def _sports_params(rows: Iterable[dict]) -> Iterable[tuple]:
+    return ((r["sport"], r["tag_ids"], r["series_id"], r.get("image_url", ""), r.get("resolution_url", ""))
+            for r in rows)
+
+
+def save_sports(rows: Iterable[dict]) -> int:
+    return _submit("sports", rows)
 
 
 def get_all_sports() -> list[dict]:
-    conn = get_connection()
+    conn = get_reader()
     return [dict(r) for r in conn.execute("SELECT * FROM sports").fetchall()]
 
 
 # ── Events ────────────────────────────────────────────────
 
-def save_events(rows: list[dict]) -> int:
-    conn = get_connection()
-    inserted = 0
+def _content_upsert(table: str, columns: list[str]) -> str:
+    """按主键 id 的 upsert：新行插入；已有行只有 content_hash 变化时才更新（未变的行不计入变更数）。
+
+    其他唯一约束冲突（如 events.slug）仍按 OR IGNORE 跳过。
+    """
+    updates = ", ".join(f"{c}=excluded.{c}" for c in columns if c != "id")
+    return (
+        f"INSERT OR IGNORE INTO {table} ({', '.join(columns)}) "
+        f"VALUES ({', '.join('?' * len(columns))}) "
+        f"ON CONFLICT(id) DO UPDATE SET {updates} WHERE content_hash IS NOT excluded.content_hash"
+    )
+
+
+def _content_hash(values: tuple) -> str:
+    """行内容指纹（不含 fetched_at）：内容不变则重复抓取不产生写入。
+
+    浮点 -0.0 归一为 0.0：SQLite 存 REAL 时不保留负零，否则由库中行算出的指纹与原始行不同。
+    """
+    values = tuple(v + 0.0 if isinstance(v, float) else v for v in values)
+    return hashlib.blake2b(repr(values).encode(), digest_size=8).hexdigest()
+
+
+_EVENTS_SQL = _content_upsert("events", [
+    "id", "slug", "title", "sport", "start_time", "end_time", "game_id", "game_status",
+    "score", "volume", "active", "closed", "neg_risk", "polymarket_url", "fetched_at", "content_hash",
+])
+
+
+def _event_values(r: dict) -> tuple:
+    return (
+        r["id"], r["slug"], r["title"], r.get("sport", ""),
+        r.get("start_time", ""), r.get("end_time", ""),
+        r.get("game_id", ""), r.get("game_status", ""),
+        r.get("score", ""), r.get("volume", 0),
+        int(r.get("active", False)), int(r.get("closed", False)),
+        int(r.get("neg_risk", False)), r.get("polymarket_url", ""),
+    )
+
+
+def _events_params(rows: Iterable[dict]) -> Iterable[tuple]:
+    now = _now()
     for r in rows:
-        try:
-            conn.execute(
-                "INSERT OR IGNORE INTO events "
-                "(id, slug, title, sport, start_time, end_time, game_id, game_status, "
-                "score, volume, active, closed, neg_risk, polymarket_url, fetched_at) "
-                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
-                (
-                    r["id"], r["slug"], r["title"], r.get("sport", ""),
-                    r.get("start_time", ""), r.get("end_time", ""),
-                    r.get("game_id", ""), r.get("game_status", ""),
-                    r.get("score", ""), r.get("volume", 0),
-                    int(r.get("active", False)), int(r.get("closed", False)),
-                    int(r.get("neg_risk", False)), r.get("polymarket_url", ""),
-                    _now(),
-                ),
-            )
-            inserted += 1
-        except sqlite3.IntegrityError:
-            pass
-    conn.commit()
-    return inserted
+        values = _event_values(r)
+        yield values + (now, _content_hash(values))
+
+
+def save_events(rows: Iterable[dict]) -> int:
+    return _submit("events", rows)
 
 
 def get_event_count() -> int:
-    conn = get_connection()
+    conn = get_reader()
     return conn.execute("SELECT COUNT(*) FROM events").fetchone()[0]
 
 
 def get_all_events() -> list[dict]:
-    conn = get_connection()
+    conn = get_reader()
     return [dict(r) for r in conn.execute("SELECT * FROM events ORDER BY id").fetchall()]
 
 
 def get_active_events() -> list[dict]:
-    conn = get_connection()
+    conn = get_reader()
     return [dict(r) for r in conn.execute(
         "SELECT * FROM events WHERE active=1 AND closed=0 ORDER BY id"
     ).fetchall()]
@@ -217,181 +714,810 @@ def get_active_events() -> list[dict]:
 
 # ── Markets ───────────────────────────────────────────────
 
-def save_markets(rows: list[dict]) -> int:
-    conn = get_connection()
-    inserted = 0
+_MARKETS_SQL = _content_upsert("markets", [
+    "id", "event_id", "condition_id", "slug", "question", "sports_market_type", "line",
+    "outcomes", "outcome_prices", "clob_token_ids", "team_a_id", "team_b_id",
+    "volume", "closed", "accepting_orders", "tick_size", "neg_risk", "sport", "fetched_at", "content_hash",
+])
+
+
+def _market_values(r: dict) -> tuple:
+    return (
+        r["id"], r["event_id"], r["condition_id"], r.get("slug", ""),
+        r.get("question", ""), r.get("sports_market_type", ""),
+        r.get("line"), r.get("outcomes", ""), r.get("outcome_prices", ""),
+        r.get("clob_token_ids", ""), r.get("team_a_id", ""),
+        r.get("team_b_id", ""), r.get("volume", 0),
+        int(r.get("closed", False)), int(r.get("accepting_orders", False)),
+        r.get("tick_size"), int(r.get("neg_risk", False)), r.get("sport", ""),
+    )
+
+
+def _markets_params(rows: Iterable[dict]) -> Iterable[tuple]:
+    now = _now()
     for r in rows:
-        try:
-            conn.execute(
-                "INSERT OR IGNORE INTO markets "
-                "(id, event_id, condition_id, slug, question, sports_market_type, line, "
-                "outcomes, outcome_prices, clob_token_ids, team_a_id, team_b_id, "
-                "volume, closed, accepting_orders, tick_size, neg_risk, fetched_at) "
-                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
-                (
-                    r["id"], r["event_id"], r["condition_id"], r.get("slug", ""),
-                    r.get("question", ""), r.get("sports_market_type", ""),
-                    r.get("line"), r.get("outcomes", ""), r.get("outcome_prices", ""),
-                    r.get("clob_token_ids", ""), r.get("team_a_id", ""),
-                    r.get("team_b_id", ""), r.get("volume", 0),
-                    int(r.get("closed", False)), int(r.get("accepting_orders", False)),
-                    r.get("tick_size"), int(r.get("neg_risk", False)),
-                    _now(),
-                ),
-            )
-            inserted += 1
-        except sqlite3.IntegrityError:
-            pass
-    conn.commit()
-    return inserted
+        values = _market_values(r)
+        yield values + (now, _content_hash(values))
+
+
+def save_markets(rows: Iterable[dict]) -> int:
+    return _submit("markets", rows)
 
 
 def get_market_count() -> int:
-    conn = get_connection()
+    conn = get_reader()
     return conn.execute("SELECT COUNT(*) FROM markets").fetchone()[0]
 
 
-def get_all_markets() -> list[dict]:
-    conn = get_connection()
-    return [dict(r) for r in conn.execute("SELECT * FROM markets ORDER BY event_id").fetchall()]
+def _sport_filter(column: str, sports: list[str] | None) -> tuple[str, tuple]:
+    """--sport 过滤条件（按运动名精确匹配）：返回 (" AND column IN (...)", 参数)；sports 为空时不过滤。"""
+    if not sports:
+        return "", ()
+    return f" AND {column} IN ({','.join('?' * len(sports))})", tuple(sports)
+
+
+def get_all_markets(sports: list[str] | None = None) -> list[dict]:
+    """全部市场（sports 非空时只取这些运动的），按事件顺序。"""
+    where, params = _sport_filter("sport", sports)
+    conn = get_reader()
+    return [dict(r) for r in conn.execute(
+        f"SELECT * FROM markets WHERE 1=1{where} ORDER BY event_id", params
+    ).fetchall()]
 
 
 def get_active_markets() -> list[dict]:
-    conn = get_connection()
+    conn = get_reader()
     return [dict(r) for r in conn.execute(
         "SELECT * FROM markets WHERE closed=0 AND accepting_orders=1 ORDER BY event_id"
     ).fetchall()]
 
 
+def get_open_markets(sports: list[str] | None = None) -> list[dict]:
+    """未关闭的市场（含暂停接单的），sports 非空时只取这些运动的；供 refresh 按 id 批量刷新状态。"""
+    where, params = _sport_filter("sport", sports)
+    conn = get_reader()
+    return [dict(r) for r in conn.execute(
+        f"SELECT * FROM markets WHERE closed=0{where} ORDER BY event_id", params
+    )]
+
+
+def get_open_event_ids(sports: list[str] | None = None) -> list[int]:
+    """库中尚未关闭的事件 id（sports 非空时只取这些运动），供增量 discover 重新拉取最新状态。"""
+    where, params = _sport_filter("sport", sports)
+    conn = get_reader()
+    return [r[0] for r in conn.execute(f"SELECT id FROM events WHERE closed=0{where} ORDER BY id", params)]
+
+
+# 可做变化检测的写入类别 → (表, 行 → 参与指纹的列值)
+_HASHED: dict[str, tuple[str, Callable[[dict], tuple]]] = {
+    "events": ("events", _event_values),
+    "markets": ("markets", _market_values),
+}
+
+
+def split_changed(kind: str, rows: list[dict]) -> tuple[list[dict], list[dict], int]:
+    """把一批 events / markets 行与库中的 content_hash 对比，返回 (新行, 内容有变化的行, 未变行数)。
+
+    指纹与写入时存的 content_hash 算法一致；只需提交前两类，未变的行写入也不会产生变更。
+    """
+    table, values_of = _HASHED[kind]
+    stored: dict[Any, str | None] = {}
+    conn = get_reader()
+    ids = [r["id"] for r in rows]
+    for i in range(0, len(ids), 500):
+        chunk = ids[i:i + 500]
+        for r in conn.execute(
+            f"SELECT id, content_hash FROM {table} WHERE id IN ({','.join('?' * len(chunk))})", chunk
+        ):
+            stored[r[0]] = r[1]
+    new, changed = [], []
+    for r in rows:
+        if r["id"] not in stored:
+            new.append(r)
+        elif stored[r["id"]] != _content_hash(values_of(r)):
+            changed.append(r)
+    return new, changed, len(rows) - len(new) - len(changed)
+
+
 def get_markets_by_event(event_id: int) -> list[dict]:
-    conn = get_connection()
+    conn = get_reader()
     return [dict(r) for r in conn.execute(
         "SELECT * FROM markets WHERE event_id=?", (event_id,)
     ).fetchall()]
 
 
-# ── Order Book Snapshots ──────────────────────────────────
+# ── Tokens ────────────────────────────────────────────────
 
-def save_orderbook_snapshots(rows: list[dict]) -> int:
-    conn = get_connection()
-    inserted = 0
+# 每个市场的 clob_token_ids / outcomes 在 save_markets 时解析一次，展开为一 token 一行；
+# sport 取自市场行，已有 token 随市场更新（内容未变的行不写）
+_TOKEN_COLUMNS = ["token_id", "condition_id", "market_id", "event_id", "outcome_index", "outcome", "sport"]
+_TOKENS_SQL = (
+    f"INSERT INTO tokens ({', '.join(_TOKEN_COLUMNS)}) VALUES ({', '.join('?' * len(_TOKEN_COLUMNS))}) "
+    f"ON CONFLICT(token_id) DO UPDATE SET {', '.join(f'{c}=excluded.{c}' for c in _TOKEN_COLUMNS[1:])} "
+    f"WHERE ({', '.join(_TOKEN_COLUMNS[1:])}) IS NOT ({', '.join(f'excluded.{c}' for c in _TOKEN_COLUMNS[1:])})"
+)
+
+
+def _json_list(text: Any) -> list:
+    try:
+        value = json.loads(text) if isinstance(text, str) else text
+    except json.JSONDecodeError:
+        return []
+    return value if isinstance(value, list) else []
+
+
+def _tokens_params(rows: Iterable[dict]) -> Iterable[tuple]:
     for r in rows:
-        conn.execute(
-            "INSERT INTO orderbook_snapshots "
-            "(token_id, condition_id, snapshot_time, bids_json, asks_json, "
-            "best_bid, best_ask, spread, mid_price, last_trade_price, "
-            "tick_size, total_bid_depth, total_ask_depth) "
-            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
-            (
-                r["token_id"], r["condition_id"], r["snapshot_time"],
-                r["bids_json"], r["asks_json"],
-                r["best_bid"], r["best_ask"], r["spread"], r["mid_price"],
-                r["last_trade_price"], r["tick_size"],
-                r["total_bid_depth"], r["total_ask_depth"],
-            ),
+        outcomes = _json_list(r.get("outcomes"))
+        for i, tid in enumerate(_json_list(r.get("clob_token_ids"))):
+            if tid:
+                yield (str(tid), r["condition_id"], r["id"], r["event_id"], i,
+                       outcomes[i] if i < len(outcomes) else "", r.get("sport", ""))
+
+
+def get_active_tokens(sports: list[str] | None = None) -> list[dict]:
+    """活跃市场的全部 token（token_id, condition_id, market_id, outcome_index, outcome），按事件、市场、结果顺序。
+
+    sports 非空时只取这些运动的市场（markets.sport 精确匹配）。
+    """
+    where, params = _sport_filter("m.sport", sports)
+    sql = (
+        "SELECT t.token_id, t.condition_id, t.market_id, t.outcome_index, t.outcome "
+        "FROM markets m JOIN tokens t ON t.market_id = m.id "
+        "WHERE m.closed=0 AND m.accepting_orders=1" + where
+    )
+    conn = get_reader()
+    return [dict(r) for r in conn.execute(sql + " ORDER BY m.event_id, t.market_id, t.outcome_index", params)]
+
+
+# ── Order Book Snapshots ──────────────────────────────────
+
+_SNAPSHOTS_SQL = (
+    "INSERT INTO {table} "
+    "(token_id, condition_id, snapshot_time, base_time, bids_json, asks_json, book_blob, "
+    "best_bid, best_ask, spread, mid_price, last_trade_price, "
+    "tick_size, total_bid_depth, total_ask_depth) "
+    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"
+)
+
+
+def set_level_encoding(encoding: str, compression: str = "none"):
+    """切换后续快照写入的档位存储方式（json / binary）。"""
+    global _level_encoding, _level_compression
+    _level_encoding, _level_compression = encoding, compression
+
+
+def set_delta_encoding(enabled: bool, **kwargs):
+    """开关增量存储（kwargs 传给 DeltaEncoder，如 keyframe_every）。"""
+    global _delta_encoder
+    _delta_encoder = DeltaEncoder(**kwargs) if enabled else None
+
+
+def _reset_delta_state():
+    if _delta_encoder is not None:
+        _delta_encoder.reset()
+
+
+def stored_levels(bids: list[dict], asks: list[dict]) -> tuple[str | None, str | None, bytes | None]:
+    """完整档位按当前档位编码 → (bids_json, asks_json, book_blob)。"""
+    if _level_encoding == "binary":
+        try:
+            return None, None, encode_levels(bids, asks, _level_compression)
+        except ValueError:
+            pass  # 超出定点范围的档位退回 JSON 存储
+    return json.dumps(bids), json.dumps(asks), None
+
+
+def _level_columns(r: dict) -> tuple[str | None, str | None, str | None, bytes | None]:
+    """快照行 → (base_time, bids_json, asks_json, book_blob)。行可携带原始 bids/asks 列表或 JSON 文本。"""
+    bids, asks = r.get("bids"), r.get("asks")
+    base_time = None
+    if _delta_encoder is not None:
+        if bids is None:
+            bids, asks = json.loads(r["bids_json"]), json.loads(r["asks_json"])
+        base_time, bids, asks = _delta_encoder.encode(r["token_id"], r["snapshot_time"], bids, asks)
+    if bids is None:
+        if _level_encoding != "binary":
+            return base_time, r["bids_json"], r["asks_json"], None
+        bids, asks = json.loads(r["bids_json"]), json.loads(r["asks_json"])
+    return (base_time, *stored_levels(bids, asks))
+
+
+def _snapshots_params(rows: Iterable[dict]) -> Iterable[tuple]:
+    return (
+        (
+            r["token_id"], r["condition_id"], r["snapshot_time"],
+            *_level_columns(r),
+            r["best_bid"], r["best_ask"], r["spread"], r["mid_price"],
+            r["last_trade_price"], r["tick_size"],
+            r["total_bid_depth"], r["total_ask_depth"],
         )
-        inserted += 1
-    conn.commit()
-    return inserted
+        for r in rows
+    )
+
+
+def save_orderbook_snapshots(rows: Iterable[dict]) -> int:
+    return _submit("orderbook_snapshots", rows)
+
+
+def _count(base: str, where: str = "", params: tuple = ()) -> int:
+    conn = get_reader()
+    return sum(conn.execute(f"SELECT COUNT(*) FROM {t}{where}", params).fetchone()[0]
+               for t in partition_tables(conn, base))
 
 
 def get_snapshot_count() -> int:
+    return _count("orderbook_snapshots")
+
+
+def get_snapshot(snapshot_id: int) -> dict | None:
+    """读取单个快照，bids/asks 为还原后的完整档位（增量行自动叠加关键帧）。"""
+    conn = get_reader()
+    day = _id_day({"id": snapshot_id}) if _backend == "sqlite" else None
+    tables = partition_tables(conn, "orderbook_snapshots", day, day)
+    table = "orderbook_snapshots" if day is None else f"orderbook_snapshots_{day}"
+    if table not in tables:
+        return None
+    row = conn.execute(f"SELECT * FROM {table} WHERE id=?", (snapshot_id,)).fetchone()
+    return _full_snapshot(conn, dict(row), None, table) if row else None
+
+
+def iter_snapshots(
+    token_id: str | None = None,
+    start: str | None = None,
+    end: str | None = None,
+    order_by: str = "id",
+) -> Iterator[dict]:
+    """按条件逐条读取快照（bids/asks 为完整档位），关键帧解码结果在迭代中复用。
+
+    依次扫描原表与 [start, end) 覆盖的日分区；order_by 作用于每个表内部，分区按日期先后。
+    """
+    conn = get_reader()
+    clauses, params = [], []
+    if token_id:
+        clauses.append("token_id=?")
+        params.append(token_id)
+    if start:
+        clauses.append("snapshot_time>=?")
+        params.append(start)
+    if end:
+        clauses.append("snapshot_time<?")
+        params.append(end)
+    where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+    cache: dict[tuple[str, str], tuple[list, list]] = {}
+    for table in partition_tables(conn, "orderbook_snapshots", _iso_day(start), _iso_day(end)):
+        for row in conn.execute(f"SELECT * FROM {table}{where} ORDER BY {order_by}", params):
+            if len(cache) > 10_000:
+                cache.clear()
+            yield _full_snapshot(conn, dict(row), cache, table)
+
+
+def _full_snapshot(conn: sqlite3.Connection, d: dict, cache: dict | None, table: str) -> dict:
+    levels = reconstruct_levels(conn, d, cache, table)
+    d["bids"], d["asks"] = levels if levels is not None else ([], [])
+    for col in ("bids_json", "asks_json", "book_blob", "base_time"):
+        d.pop(col, None)
+    return d
+
+
+_SNAPSHOT_LEVELS_SQL = "UPDATE {table} SET bids_json=?, asks_json=?, book_blob=? WHERE id=?"
+
+
+def _snapshot_levels_params(rows: Iterable[dict]) -> Iterable[tuple]:
+    return ((r["bids_json"], r["asks_json"], r["book_blob"], r["id"]) for r in rows)
+
+
+def migrate_orderbook_levels(encoding: str, compression: str = "none", batch_size: int = 5000) -> int:
+    """把已有快照的档位转换为指定存储方式（json ↔ binary），返回转换的行数。"""
+    _require_sqlite("migrate_orderbook_levels")
+    conn = get_reader()
+    if encoding == "binary":
+        where = "book_blob IS NULL"
+    else:
+        where = "book_blob IS NOT NULL"
+    total = 0
+    for table in partition_tables(conn, "orderbook_snapshots"):
+        total += _migrate_table_levels(conn, table, where, encoding, compression, batch_size)
+    return total
+
+
+def _migrate_table_levels(conn: sqlite3.Connection, table: str, where: str,
+                          encoding: str, compression: str, batch_size: int) -> int:
+    total = 0
+    last_id = 0
+    while True:
+        rows = conn.execute(
+            f"SELECT id, bids_json, asks_json, book_blob FROM {table} "
+            f"WHERE id > ? AND {where} ORDER BY id LIMIT ?",
+            (last_id, batch_size),
+        ).fetchall()
+        if not rows:
+            break
+        last_id = rows[-1]["id"]
+        updates = []
+        for r in rows:
+            if encoding == "binary":
+                try:
+                    bids, asks = json.loads(r["bids_json"] or "[]"), json.loads(r["asks_json"] or "[]")
+                    blob = encode_levels(bids, asks, compression)
+                except (ValueError, TypeError):
+                    continue
+                updates.append({"id": r["id"], "bids_json": None, "asks_json": None, "book_blob": blob})
+            else:
+                bids, asks = decode_levels(r["book_blob"])
+                updates.append({"id": r["id"], "bids_json": json.dumps(bids),
+                                "asks_json": json.dumps(asks), "book_blob": None})
+        total += _submit("snapshot_levels", updates)
+    return total
+
+
+def vacuum():
+    """回收删除/迁移后留下的空闲页（需在写入空闲时调用）；页大小与当前配置不同时一并改写。
+
+    WAL 模式下无法修改页大小，此时先关闭所有连接（写完写入队列），临时切回 rollback journal
+    执行 VACUUM 再切回 WAL。
+    """
+    page_size = _profile()["page_size"]
+    if get_connection().execute("PRAGMA page_size").fetchone()[0] == page_size:
+        get_connection().execute("VACUUM")
+        return
+    close_db()
     conn = get_connection()
-    return conn.execute("SELECT COUNT(*) FROM orderbook_snapshots").fetchone()[0]
+    conn.execute("PRAGMA journal_mode=DELETE")
+    conn.execute(f"PRAGMA page_size={page_size}")
+    conn.execute("VACUUM")
+    conn.execute("PRAGMA journal_mode=WAL")
 
 
 # ── Trades ────────────────────────────────────────────────
 
-def save_trades(rows: list[dict]) -> int:
-    conn = get_connection()
-    inserted = 0
-    for r in rows:
-        try:
-            conn.execute(
-                "INSERT OR IGNORE INTO trades "
-                "(event_slug, condition_id, trade_timestamp, side, outcome, "
-                "size, price, proxy_wallet, transaction_hash, fetched_at, "
-                "timestamp_ms, server_received_ms) "
-                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
-                (
-                    r.get("event_slug", ""), r["condition_id"],
-                    r["trade_timestamp"], r["side"], r.get("outcome", ""),
-                    r["size"], r["price"], r.get("proxy_wallet", ""),
-                    r.get("transaction_hash", ""), _now(),
-                    r.get("timestamp_ms"),
-                    r.get("server_received_ms"),
-                ),
-            )
-            inserted += 1
-        except sqlite3.IntegrityError:
-            pass
-    conn.commit()
-    return inserted
+_TRADES_SQL = (
+    "INSERT OR IGNORE INTO {table} "
+    "(event_slug, condition_id, trade_timestamp, side, outcome, "
+    "size, price, proxy_wallet, transaction_hash, fetched_at, "
+    "timestamp_ms, server_received_ms) "
+    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"
+)
+
+
+def _trades_params(rows: Iterable[dict]) -> Iterable[tuple]:
+    now = _now()
+    return (
+        (
+            r.get("event_slug", ""), r["condition_id"],
+            r["trade_timestamp"], r["side"], r.get("outcome", ""),
+            r["size"], r["price"], r.get("proxy_wallet", ""),
+            r.get("transaction_hash", ""), now,
+            r.get("timestamp_ms"),
+            r.get("server_received_ms"),
+        )
+        for r in rows
+    )
+
+
+def save_trades(rows: Iterable[dict]) -> int:
+    return _submit("trades", rows)
+
+
+def set_trade_dedup(enabled: bool):
+    """开关成交去重过滤器（须在写入空闲时调用，如基准测试切换前）。"""
+    global _trade_dedup, _trade_filter, _last_dedup_stats
+    _trade_dedup, _trade_filter, _last_dedup_stats = enabled, None, {}
+
+
+def _trade_dedup_path() -> str:
+    return os.path.splitext(_db_path)[0] + ".trade_dedup"
+
+
+def _trade_marks(conn: sqlite3.Connection) -> dict[str, int]:
+    return {t: conn.execute(f"SELECT COALESCE(MAX(id), 0) FROM {t}").fetchone()[0]
+            for t in partition_tables(conn, "trades")}
+
+
+def _get_trade_filter(conn: sqlite3.Connection) -> TradeDedupFilter | None:
+    """写线程内：首次写成交时创建过滤器，并加载上次关闭时保存的指纹（与当前库不一致则丢弃）。"""
+    global _trade_filter
+    if _trade_filter is None and _trade_dedup:
+        _trade_filter = TradeDedupFilter()
+        if _trade_filter.load(_trade_dedup_path(), _trade_marks(conn)):
+            print(f"[Dedup] 已加载 {len(_trade_filter):,} 条成交指纹")
+    return _trade_filter
+
+
+def _save_trade_filter():
+    global _trade_filter, _last_dedup_stats
+    if _trade_filter is None:
+        return
+    _last_dedup_stats = _trade_filter.snapshot()
+    if len(_trade_filter):
+        _trade_filter.save(_trade_dedup_path(), _trade_marks(get_connection()))
+    _trade_filter = None
+
+
+def trade_dedup_stats() -> dict[str, Any]:
+    """成交去重统计（checked / filtered / hit_rate / db_duplicates 等）；已关闭时返回关闭前的最终值。"""
+    return _trade_filter.snapshot() if _trade_filter is not None else dict(_last_dedup_stats)
 
 
 def get_trade_count() -> int:
-    conn = get_connection()
-    return conn.execute("SELECT COUNT(*) FROM trades").fetchone()[0]
+    return _count("trades")
 
 
 def get_trade_count_by_condition(condition_id: str) -> int:
-    conn = get_connection()
-    return conn.execute(
-        "SELECT COUNT(*) FROM trades WHERE condition_id=?", (condition_id,)
-    ).fetchone()[0]
+    return _count("trades", " WHERE condition_id=?", (condition_id,))
+
+
+def iter_trades(
+    condition_ids: list[str] | None = None,
+    start_ts: int | None = None,
+    end_ts: int | None = None,
+) -> Iterator[dict]:
+    """按条件逐条读取成交：依次扫描原表与 [start_ts, end_ts) 覆盖的日分区，表内按 trade_timestamp 排序。"""
+    conn = get_reader()
+    clauses, params = [], []
+    if condition_ids:
+        clauses.append(f"condition_id IN ({','.join('?' * len(condition_ids))})")
+        params.extend(condition_ids)
+    if start_ts is not None:
+        clauses.append("trade_timestamp>=?")
+        params.append(start_ts)
+    if end_ts is not None:
+        clauses.append("trade_timestamp<?")
+        params.append(end_ts)
+    where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+    first = epoch_day(start_ts) if start_ts is not None else None
+    last = epoch_day(end_ts) if end_ts is not None else None
+    for table in partition_tables(conn, "trades", first, last):
+        for row in conn.execute(f"SELECT * FROM {table}{where} ORDER BY trade_timestamp", params):
+            yield dict(row)
+
+
+# ── Candles ───────────────────────────────────────────────
+
+def _candle_upsert(table: str, keys: list[str], sums: list[str]) -> str:
+    """K 线累加语句：新桶直接插入；已有桶按时间先后合并开/收盘价，高低取极值，累加列相加。"""
+    cols = [*keys, "interval", "bucket", "open", "high", "low", "close", *sums, "first_ts", "last_ts"]
+    return (
+        f"INSERT INTO {table} ({', '.join(cols)}) VALUES ({', '.join('?' * len(cols))}) "
+        f"ON CONFLICT ({', '.join(keys)}, interval, bucket) DO UPDATE SET "
+        "open = CASE WHEN excluded.first_ts < first_ts THEN excluded.open ELSE open END, "
+        "high = MAX(high, excluded.high), low = MIN(low, excluded.low), "
+        "close = CASE WHEN excluded.last_ts >= last_ts THEN excluded.close ELSE close END, "
+        + "".join(f"{c} = {c} + excluded.{c}, " for c in sums)
+        + "first_ts = MIN(first_ts, excluded.first_ts), last_ts = MAX(last_ts, excluded.last_ts)"
+    )
+
+
+def _trade_point(r: sqlite3.Row) -> tuple:
+    return (r["condition_id"], r["outcome"] or ""), r["trade_timestamp"], r["price"], \
+        (r["size"] or 0.0, r["price"] * (r["size"] or 0.0), 1)
+
+
+def _iso_epoch(ts: str) -> float:
+    dt = datetime.fromisoformat(ts)
+    return (dt if dt.tzinfo else dt.replace(tzinfo=timezone.utc)).timestamp()
+
+
+def _mid_point(r: sqlite3.Row) -> tuple:
+    return (r["token_id"],), _iso_epoch(r["snapshot_time"]), r["mid_price"], (1,)
+
+
+def _trade_range(first_day: str, end_day: str) -> tuple[str, tuple]:
+    return " AND trade_timestamp >= ? AND trade_timestamp < ?", (_day_epoch(first_day), _day_epoch(end_day))
+
+
+def _snapshot_range(first_day: str, end_day: str) -> tuple[str, tuple]:
+    return " AND snapshot_time >= ? AND snapshot_time < ?", (_day_iso(first_day), _day_iso(end_day))
+
+
+# 原表 → (K 线表, 读取新行的 SELECT, 行 → (key, 时间, 价格, 累加值), 累加语句, 日期范围条件)
+_CANDLE_SOURCES: dict[str, tuple[str, str, Callable, str, Callable[[str, str], tuple[str, tuple]]]] = {
+    "trades": (
+        "trade_candles",
+        "SELECT condition_id, outcome, trade_timestamp, price, size FROM {table} "
+        "WHERE id > ? AND id <= ? AND price IS NOT NULL{where} ORDER BY id",
+        _trade_point,
+        _candle_upsert("trade_candles", ["condition_id", "outcome"], ["volume", "notional", "n_trades"]),
+        _trade_range,
+    ),
+    "orderbook_snapshots": (
+        "mid_candles",
+        "SELECT token_id, snapshot_time, mid_price FROM {table} "
+        "WHERE id > ? AND id <= ? AND mid_price > 0{where} ORDER BY id",   # 单边盘口的 mid_price 记为 0
+        _mid_point,
+        _candle_upsert("mid_candles", ["token_id"], ["samples"]),
+        _snapshot_range,
+    ),
+}
+
+
+def set_candle_intervals(intervals: Iterable[int]):
+    """切换后续写入维护的 K 线周期（秒）；空序列关闭 K 线维护。"""
+    global _candle_intervals
+    _candle_intervals = tuple(intervals)
+    if _store is not None:
+        _store.create_candle_views(_candle_intervals)
+
+
+def _day_epoch(day: str) -> int:
+    return int(datetime(int(day[:4]), int(day[4:6]), int(day[6:]), tzinfo=timezone.utc).timestamp())
+
+
+def _day_iso(day: str) -> str:
+    return f"{day[:4]}-{day[4:6]}-{day[6:]}"
+
+
+def _candle_bars(points: Iterable[tuple]) -> list[tuple]:
+    """(key, 时间, 价格, 累加值) → 各周期的 K 线行 (key..., interval, bucket, OHLC, 累加值..., first_ts, last_ts)。"""
+    bars: dict[tuple, list] = {}
+    for key, ts, price, sums in points:
+        for interval in _candle_intervals:
+            k = (*key, interval, int(ts) // interval * interval)
+            bar = bars.get(k)
+            if bar is None:
+                bars[k] = [price, price, price, price, *sums, ts, ts]
+                continue
+            if ts < bar[-2]:
+                bar[0], bar[-2] = price, ts
+            if ts >= bar[-1]:
+                bar[3], bar[-1] = price, ts
+            bar[1], bar[2] = max(bar[1], price), min(bar[2], price)
+            for i, v in enumerate(sums, 4):
+                bar[i] += v
+    return [(*k, *bar) for k, bar in bars.items()]
+
+
+def accumulate_candles(conn: sqlite3.Connection, base: str, table: str, after_id: int,
+                       until_id: int = 2 ** 63 - 1, where: str = "", params: tuple = ()) -> int:
+    """把 table 中 id ∈ (after_id, until_id] 的行累加进 base 对应的 K 线表（写连接上执行），返回读取的行数。"""
+    _, select, point, upsert, _ = _CANDLE_SOURCES[base]
+    rows = conn.execute(select.format(table=table, where=where), (after_id, until_id, *params)).fetchall()
+    if rows:
+        conn.executemany(upsert, _candle_bars(point(r) for r in rows))
+        _candle_rows["pending"] += len(rows)
+    return len(rows)
+
+
+def rebuild_candles(first_day: str | None = None, last_day: str | None = None,
+                    batch_size: int = 50_000) -> dict[str, int]:
+    """由原始成交/快照重建 [first_day, last_day]（YYYYMMDD，含两端）内的 K 线，返回各原表参与重建的行数。
+
+    省略的一端取原始数据的最早/最晚日期，范围外的 K 线（如已删除分区留下的）保持不变。
+    先在写线程上删除范围内的 K 线并记下各表当前最大 id，再按 id 分批累加；重建期间新写入的行
+    由写入路径照常累加，不会重复或遗漏。已降采样日期的中间价 K 线只能按保留下来的快照重建。
+    duckdb 后端的 K 线是查询时聚合的视图，无需重建。
+    """
+    _require_sqlite("rebuild_candles")
+    reader = get_reader()
+    rebuilt = {}
+    for base, (candles, _, _, _, day_range) in _CANDLE_SOURCES.items():
+        tables = partition_tables(reader, base, first_day, last_day)
+        span = _raw_day_span(reader, base, tables)
+        if span is None:
+            rebuilt[base] = 0
+            continue
+        first, last = first_day or span[0], last_day or span[1]
+        where, params = day_range(first, day_after(last))
+        bounds: dict[str, tuple[int, int]] = {}
+
+        def _reset(conn: sqlite3.Connection) -> int:
+            n = conn.execute(f"DELETE FROM {candles} WHERE bucket >= ? AND bucket < ?",
+                             (_day_epoch(first), _day_epoch(day_after(last)))).rowcount
+            for t in tables:
+                bounds[t] = tuple(conn.execute(f"SELECT COALESCE(MIN(id), 1) - 1, COALESCE(MAX(id), 0) FROM {t}")
+                                  .fetchone())
+            return n
+
+        run_in_writer(_reset)
+        total = 0
+        for table, (lo, hi) in bounds.items():
+            while lo < hi:
+                upto = min(lo + batch_size, hi)
+                total += run_in_writer(
+                    lambda c, t=table, a=lo, b=upto: accumulate_candles(c, base, t, a, b, where, params))
+                lo = upto
+        rebuilt[base] = total
+    return rebuilt
+
+
+def _raw_day_span(conn: sqlite3.Connection, base: str, tables: list[str]) -> tuple[str, str] | None:
+    """tables 中原始数据的最早、最晚 UTC 日 (YYYYMMDD)。"""
+    col = "trade_timestamp" if base == "trades" else "snapshot_time"
+    lo = hi = None
+    for t in tables:
+        a, b = conn.execute(f"SELECT MIN({col}), MAX({col}) FROM {t}").fetchone()
+        if a is None:
+            continue
+        lo, hi = (a, b) if lo is None else (min(lo, a), max(hi, b))
+    if lo is None:
+        return None
+    if base == "trades":
+        return epoch_day(lo), epoch_day(hi)
+    return _iso_day(lo), _iso_day(hi)
+
+
+def _candles(table: str, key_where: str, key_params: tuple, interval: int,
+             start_ts: int | None, end_ts: int | None) -> list[dict]:
+    clauses, params = [key_where, "interval=?"], [*key_params, interval]
+    if start_ts is not None:
+        clauses.append("bucket>=?")
+        params.append(start_ts)
+    if end_ts is not None:
+        clauses.append("bucket<?")
+        params.append(end_ts)
+    conn = get_reader()
+    return [dict(r) for r in conn.execute(
+        f"SELECT * FROM {table} WHERE {' AND '.join(clauses)} ORDER BY bucket", params)]
+
+
+def get_trade_candles(condition_id: str, interval: int = 60, outcome: str | None = None,
+                      start_ts: int | None = None, end_ts: int | None = None) -> list[dict]:
+    """condition 的成交价 K 线（bucket 为桶起点 Unix 秒，[start_ts, end_ts)）；outcome 为空时返回全部结果方向。"""
+    if outcome is None:
+        return _candles("trade_candles", "condition_id=?", (condition_id,), interval, start_ts, end_ts)
+    return _candles("trade_candles", "condition_id=? AND outcome=?", (condition_id, outcome),
+                    interval, start_ts, end_ts)
+
+
+def get_mid_candles(token_id: str, interval: int = 60,
+                    start_ts: int | None = None, end_ts: int | None = None) -> list[dict]:
+    """token 的订单簿中间价 K 线（bucket 为桶起点 Unix 秒，[start_ts, end_ts)）。"""
+    return _candles("mid_candles", "token_id=?", (token_id,), interval, start_ts, end_ts)
 
 
 # ── Game Results ──────────────────────────────────────────
 
-def save_game_result(r: dict) -> int:
-    conn = get_connection()
-    try:
-        conn.execute(
-            "INSERT OR REPLACE INTO game_results "
-            "(event_id, game_id, sport, home_team, away_team, final_score, "
-            "period, status, winning_outcome, resolved_at) "
-            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
-            (
-                r["event_id"], r.get("game_id", ""), r.get("sport", ""),
-                r.get("home_team", ""), r.get("away_team", ""),
-                r.get("final_score", ""), r.get("period", ""),
-                r.get("status", ""), r.get("winning_outcome", ""),
-                r.get("resolved_at", _now()),
-            ),
+_RESULTS_SQL = (
+    "INSERT OR REPLACE INTO game_results "
+    "(event_id, game_id, sport, home_team, away_team, final_score, "
+    "period, status, winning_outcome, resolved_at) "
+    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"
+)
+
+
+def _results_params(rows: Iterable[dict]) -> Iterable[tuple]:
+    return (
+        (
+            r["event_id"], r.get("game_id", ""), r.get("sport", ""),
+            r.get("home_team", ""), r.get("away_team", ""),
+            r.get("final_score", ""), r.get("period", ""),
+            r.get("status", ""), r.get("winning_outcome", ""),
+            r.get("resolved_at", _now()),
         )
-        conn.commit()
-        return 1
-    except sqlite3.IntegrityError:
-        return 0
+        for r in rows
+    )
+
+
+def save_game_result(r: dict) -> int:
+    return _submit("game_results", [r])
 
 
 def get_result_count() -> int:
-    conn = get_connection()
+    conn = get_reader()
     return conn.execute("SELECT COUNT(*) FROM game_results").fetchone()[0]
 
 
 # ── Progress ──────────────────────────────────────────────
 
+_PROGRESS_SQL = (
+    "INSERT OR REPLACE INTO fetch_progress (task_name, last_offset, last_key, updated_at) "
+    "VALUES (?, ?, ?, ?)"
+)
+
+
+def _progress_params(rows: Iterable[dict]) -> Iterable[tuple]:
+    now = _now()
+    return ((r["task_name"], r.get("last_offset", 0), r.get("last_key", ""), now) for r in rows)
+
+
 def save_progress(task_name: str, last_offset: int = 0, last_key: str = ""):
-    conn = get_connection()
-    conn.execute(
-        "INSERT OR REPLACE INTO fetch_progress (task_name, last_offset, last_key, updated_at) "
-        "VALUES (?, ?, ?, ?)",
-        (task_name, last_offset, last_key, _now()),
-    )
-    conn.commit()
+    _submit("progress", [{"task_name": task_name, "last_offset": last_offset, "last_key": last_key}])
 
 
 def get_progress(task_name: str) -> dict | None:
-    conn = get_connection()
+    conn = get_reader()
     row = conn.execute(
         "SELECT * FROM fetch_progress WHERE task_name=?", (task_name,)
     ).fetchone()
     return dict(row) if row else None
 
 
+# ── Writes ────────────────────────────────────────────────
+
+# 写入类别 → (SQL, 行 → 参数元组)
+_WRITES: dict[str, tuple[str, Callable[[Iterable[dict]], Iterable[tuple]]]] = {
+    "sports": (_SPORTS_SQL, _sports_params),
+    "events": (_EVENTS_SQL, _events_params),
+    "markets": (_MARKETS_SQL, _markets_params),
+    "orderbook_snapshots": (_SNAPSHOTS_SQL, _snapshots_params),
+    "snapshot_levels": (_SNAPSHOT_LEVELS_SQL, _snapshot_levels_params),
+    "trades": (_TRADES_SQL, _trades_params),
+    "game_results": (_RESULTS_SQL, _results_params),
+    "progress": (_PROGRESS_SQL, _progress_params),
+}
+
+
+# 写入类别 → 同一事务内随之写入的派生表 (SQL, 行 → 参数元组)；派生行不计入变更数
+_DERIVED_WRITES: dict[str, tuple[str, Callable[[Iterable[dict]], Iterable[tuple]]]] = {
+    "markets": (_TOKENS_SQL, _tokens_params),
+}
+
+
+# 分区写入类别 → (原表, 行 → 分区日期；None 表示写原表)
+_ROUTES: dict[str, tuple[str, Callable[[dict], str | None]]] = {
+    "orderbook_snapshots": ("orderbook_snapshots", _snapshot_day),
+    "snapshot_levels": ("orderbook_snapshots", _id_day),
+    "trades": ("trades", _trade_day),
+}
+
+
+def partition_groups(
+    conn: sqlite3.Connection, kind: str, rows: Iterable[dict],
+) -> Iterator[tuple[str | None, str, Iterable[dict]]]:
+    """把一批写入按目标表切成连续的段，产出 (表名, SQL, 该段的行)；需要时先建分区表。
+
+    不分区的写入类别表名为 None。段是惰性迭代器，调用方须在取下一段前消费完当前段。
+    """
+    sql = _WRITES[kind][0]
+    route = _ROUTES.get(kind)
+    if route is None:
+        yield None, sql, rows
+        return
+    base, day_of = route
+    for day, group in groupby(rows, key=day_of):
+        table = base if day is None else ensure_partition(conn, base, day)
+        yield table, sql.format(table=table), group
+
+
+def write_rows(conn: sqlite3.Connection, kind: str, rows: Iterable[dict]) -> int:
+    """在 conn 上执行一类批量写入（不提交），返回 total_changes 差值（K 线累加不计入，另见 writer_stats 的 candle_rows）。"""
+    if kind == "call":
+        return sum(fn(conn) for fn in rows)
+    params = _WRITES[kind][1]
+    derived = _DERIVED_WRITES.get(kind)
+    if derived is not None:
+        rows = list(rows)
+    candles = kind in _CANDLE_SOURCES and bool(_candle_intervals)
+    dedup = _get_trade_filter(conn) if kind == "trades" else None
+    if dedup is not None:
+        admitted = dedup.stats["admitted"]
+        rows = dedup.admit(rows)
+    changes = 0
+    for table, sql, group in partition_groups(conn, kind, rows):
+        if candles:
+            last_id = conn.execute(f"SELECT COALESCE(MAX(id), 0) FROM {table}").fetchone()[0]
+        before = conn.total_changes   # 不计建分区时写入 sqlite_sequence 的行
+        conn.executemany(sql, params(group))
+        changed = conn.total_changes - before
+        changes += changed
+        if candles and changed:
+            accumulate_candles(conn, kind, table, last_id)   # INSERT OR IGNORE 跳过的重复行 id 不前进，不会重复累加
+    if dedup is not None:
+        dedup.stats["db_duplicates"] += dedup.stats["admitted"] - admitted - changes   # 过滤器漏判、由唯一约束拒绝的行
+    if derived is not None:
+        conn.executemany(derived[0], derived[1](rows))
+    return changes
+
+
 def close_db():
-    global _conn
+    """写完写入队列中的剩余请求，然后关闭所有连接。"""
+    global _conn, _writer, _last_writer_stats, _store
+    wrote = False
+    with _writer_lock:
+        if _writer is not None:
+            _writer.stop()
+            _last_writer_stats = _writer.stats()
+            _writer = None
+            wrote = True
+    _save_trade_filter()
+    _partition_tables.clear()
+    _close_readers()
+    if _store is not None:
+        _store.close()
+        _store = None
+        return
+    if wrote and _profile()["checkpoint"] == "truncate":
+        get_connection().execute("PRAGMA wal_checkpoint(TRUNCATE)")
     if _conn:
         _conn.close()
         _conn = None
@@ -0,0 +1,253 @@
+"""SQLite 写入线程 — 所有生产者经由有界队列提交写入，由唯一的写连接分组提交
+
+  - 生产者（WS flush 线程、链上监听事件循环、REST 采集）调用 submit / submit_async 入队，
+    得到 Future，结果为该请求实际变更的行数
+  - 写线程独占写连接：攒够 group_rows 行，或距组内首个请求超过 group_ms，即合并为一个事务提交；
+    组内有同步等待者（urgent）时，队列一空立即提交，不额外等待
+  - 队列满时生产者阻塞（背压），阻塞次数与时长计入统计
+  - stop() 先写完队列里已有的全部请求，再关闭写连接
+  - 写连接打不开时，已入队和之后提交的请求都以该异常失败（不会让等待者永远阻塞）
+"""
+from __future__ import annotations
+
+import asyncio
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from typing import Any, Callable, Iterable
+
+from config import DB_WRITER_QUEUE_SIZE, DB_WRITER_GROUP_ROWS, DB_WRITER_GROUP_MS
+
+_STOP = object()
+
+
+@dataclass
+class _WriteRequest:
+    kind: str
+    rows: list[dict]
+    n_rows: int
+    urgent: bool
+    enqueued_at: float = field(default_factory=time.monotonic)
+    future: Future = field(default_factory=Future)
+
+
+class DbWriter:
+    """单写线程 + 有界队列 + 分组提交。
+
+    connect() 在写线程内创建写连接；write(conn, kind, rows) 执行一类写入并返回变更行数
+    （不提交，事务由 DbWriter 管理）；on_commit() / on_rollback() 在事务提交 / 回滚后调用，
+    供写入方确认或丢弃随本事务产生的内存状态。maintenance_kinds 中的写入（维护操作）
+    返回的行数计入 maintenance_changes，不计入 rows / changes。
+    """
+
+    def __init__(
+        self,
+        connect: Callable[[], sqlite3.Connection],
+        write: Callable[[sqlite3.Connection, str, Iterable[dict]], int],
+        on_rollback: Callable[[], None] | None = None,
+        on_commit: Callable[[], None] | None = None,
+        queue_size: int = DB_WRITER_QUEUE_SIZE,
+        group_rows: int = DB_WRITER_GROUP_ROWS,
+        group_ms: float = DB_WRITER_GROUP_MS,
+        maintenance_kinds: Iterable[str] = (),
+    ):
+        self._connect = connect
+        self._write = write
+        self._on_rollback = on_rollback
+        self._on_commit = on_commit
+        self._maintenance_kinds = frozenset(maintenance_kinds)
+        self.group_rows = group_rows
+        self.group_seconds = group_ms / 1000
+        self._queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self._thread: threading.Thread | None = None
+        self._closed = False
+        self._failed: BaseException | None = None   # 写连接打开失败的异常
+        self._lock = threading.Lock()
+        self._stats = {
+            "requests": 0, "rows": 0, "changes": 0, "maintenance_changes": 0,
+            "commits": 0, "errors": 0,
+            "max_group_rows": 0, "max_queue_depth": 0,
+            "backpressure_waits": 0, "backpressure_seconds": 0.0,
+            "queue_wait_seconds": 0.0, "commit_seconds": 0.0,
+        }
+
+    # ── 生产者接口 ────────────────────────────────────────
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="db-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, kind: str, rows: Iterable[dict], urgent: bool = False) -> Future:
+        """入队一批写入；队列满时阻塞。urgent=True 表示调用方会立即等待结果。"""
+        req = self._request(kind, rows, urgent)
+        try:
+            self._queue.put_nowait(req)
+        except queue.Full:
+            t0 = time.monotonic()
+            self._queue.put(req)
+            self._backpressure(time.monotonic() - t0)
+        self._observe_depth()
+        return req.future
+
+    async def submit_async(self, kind: str, rows: Iterable[dict]) -> int:
+        """事件循环内使用：队列满时在线程池里等待空位，不阻塞事件循环。"""
+        return await (await self.enqueue_async(kind, rows))
+
+    async def enqueue_async(self, kind: str, rows: Iterable[dict]) -> asyncio.Future:
+        """同 submit_async，但入队后立即返回提交完成时给出变更行数的 future，调用方可继续后续工作再等待。"""
+        req = self._request(kind, rows, urgent=False)
+        try:
+            self._queue.put_nowait(req)
+        except queue.Full:
+            t0 = time.monotonic()
+            await asyncio.get_running_loop().run_in_executor(None, self._queue.put, req)
+            self._backpressure(time.monotonic() - t0)
+        self._observe_depth()
+        return asyncio.wrap_future(req.future)
+
+    def stop(self, timeout: float | None = None):
+        """停止接收新请求，写完队列中剩余请求后关闭写连接。"""
+        if self._closed:
+            return
+        self._closed = True
+        if self._thread is None:
+            return
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+        # 与 stop 并发入队、未被写线程取走的请求
+        while True:
+            try:
+                req = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if req is not _STOP and not req.future.done():
+                req.future.set_exception(RuntimeError("DbWriter 已关闭"))
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            out = dict(self._stats)
+        out["queue_depth"] = self._queue.qsize()
+        out["backpressure_seconds"] = round(out["backpressure_seconds"], 3)
+        out["queue_wait_seconds"] = round(out["queue_wait_seconds"], 3)
+        out["commit_seconds"] = round(out["commit_seconds"], 3)
+        return out
+
+    def _request(self, kind: str, rows: Iterable[dict], urgent: bool) -> _WriteRequest:
+        if self._closed:
+            raise RuntimeError("DbWriter 已关闭")
+        if self._failed is not None:
+            raise RuntimeError(f"DbWriter 写连接打开失败: {self._failed}") from self._failed
+        # 先物化：整组回滚后要逐个重试，迭代器只能消费一次
+        rows = list(rows)
+        with self._lock:
+            self._stats["requests"] += 1
+        return _WriteRequest(kind, rows, len(rows), urgent)
+
+    def _backpressure(self, waited: float):
+        with self._lock:
+            self._stats["backpressure_waits"] += 1
+            self._stats["backpressure_seconds"] += waited
+
+    def _observe_depth(self):
+        depth = self._queue.qsize()
+        with self._lock:
+            if depth > self._stats["max_queue_depth"]:
+                self._stats["max_queue_depth"] = depth
+
+    # ── 写线程 ────────────────────────────────────────────
+
+    def _run(self):
+        try:
+            conn = self._connect()
+        except Exception as exc:
+            print(f"[DB-Writer] 打开写连接失败: {exc}")
+            self._failed = exc
+            # 继续取队列直到 stop()，让已入队与并发入队的请求都以该异常结束
+            while True:
+                req = self._queue.get()
+                if req is _STOP:
+                    return
+                req.future.set_exception(exc)
+        try:
+            stopping = False
+            while not stopping:
+                req = self._queue.get()
+                if req is _STOP:
+                    break
+                group = [req]
+                stopping = self._collect(group)
+                self._commit(conn, group)
+            # 排空 _STOP 之后仍在队列中的请求
+            while True:
+                try:
+                    req = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if req is not _STOP:
+                    self._commit(conn, [req])
+        finally:
+            conn.close()
+
+    def _collect(self, group: list[_WriteRequest]) -> bool:
+        """继续从队列取请求直到达到行数/时间上限，返回是否遇到停止信号。"""
+        rows = group[0].n_rows
+        urgent = group[0].urgent
+        deadline = time.monotonic() + self.group_seconds
+        while rows < self.group_rows:
+            try:
+                req = self._queue.get_nowait()
+            except queue.Empty:
+                remaining = deadline - time.monotonic()
+                if urgent or remaining <= 0:
+                    break
+                try:
+                    req = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+            if req is _STOP:
+                return True
+            group.append(req)
+            rows += req.n_rows
+            urgent = urgent or req.urgent
+        return False
+
+    def _commit(self, conn: sqlite3.Connection, group: list[_WriteRequest]):
+        t0 = time.monotonic()
+        changes = []
+        try:
+            with conn:
+                for req in group:
+                    changes.append(self._write(conn, req.kind, req.rows))
+        except Exception as exc:
+            if self._on_rollback is not None:
+                self._on_rollback()
+            if len(group) > 1:
+                # 整组已回滚：逐个重试，只让出错的请求失败
+                for req in group:
+                    self._commit(conn, [req])
+                return
+            with self._lock:
+                self._stats["errors"] += 1
+            print(f"[DB-Writer] 写入 {group[0].kind} 失败: {exc}")
+            group[0].future.set_exception(exc)
+            return
+        if self._on_commit is not None:
+            self._on_commit()
+
+        elapsed = time.monotonic() - t0
+        n_rows = sum(req.n_rows for req in group)
+        data = [req.kind not in self._maintenance_kinds for req in group]
+        with self._lock:
+            st = self._stats
+            st["commits"] += 1
+            st["rows"] += sum(req.n_rows for req, d in zip(group, data) if d)
+            st["changes"] += sum(n for n, d in zip(changes, data) if d)
+            st["maintenance_changes"] += sum(n for n, d in zip(changes, data) if not d)
+            st["commit_seconds"] += elapsed
+            st["queue_wait_seconds"] += sum(t0 - req.enqueued_at for req in group)
+            st["max_group_rows"] = max(st["max_group_rows"], n_rows)
+        for req, n in zip(group, changes):
+            req.future.set_result(n)
@@ -1,13 +1,35 @@
-"""事件采集 — 分页获取所有体育赛事事件，解析市场并存入数据库"""
+"""事件采集 — 分页获取所有体育赛事事件，解析市场并存入数据库
+
+多个 tag（如 --sport nba,nfl,epl）由 DISCOVERY_TAG_WORKERS 个协程并发抓取，每个 tag 内按 offset 顺序翻页；
+每个 tag 在 fetch_progress 中有独立的断点（events_tag<id>[_active|_open]），中断后各自从断点继续，
+走完的 tag 断点归零，last_key 记下该 tag 已见过的最大事件 id（高水位）。升级前整次 discover 共用的断点
+（events_<运动|all>，offset 只用于第一个 tag）在续传时转为第一个 tag 的断点。并发请求仍受 api_client 的
+每 host 令牌桶与连接数限制。
+
+每个 tag 的翻页是流水线：请求级最多 EVENTS_PREFETCH_PAGES 个后续页已在下载；入库级按 offset 顺序解析
+当前页并把变化的行交给写线程后立即处理下一页，不等提交；断点每 EVENTS_PROGRESS_EVERY 页（及结束、失败、
+触达 limit 时）写一次，写之前先等已交出的写入全部提交，断点不会越过未落盘的数据。
+结束时打印各阶段耗时（请求为各页耗时之和，可因并发超过总耗时；等待提交计入断点）。
+
+每页解析后先与库中的 content_hash 对比，只提交新行与内容有变化的行，并分别计数新增 / 变化 / 未变。
+增量模式（incremental=True）不再从头翻页：已走完一遍的 tag 按 id 倒序只抓高水位以上的新事件，
+随后按 id 批量重新拉取库中所有未关闭的事件，刷新 closed / game_status / score / 赔率等会变化的字段。
+"""
 from __future__ import annotations
 
+import asyncio
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable
+
 from tqdm import tqdm
 
-from config import EVENTS_PAGE_SIZE
-from src.api_client import gamma_get
+from config import EVENTS_PAGE_SIZE, DISCOVERY_TAG_WORKERS, EVENTS_PREFETCH_PAGES, EVENTS_PROGRESS_EVERY
+from src.api_client import gamma_get_async, close_async_session
 from src.database import (
-    init_db, save_events, save_markets, save_progress, get_progress,
-    get_event_count, get_market_count,
+    init_db, get_progress, save_progress, get_event_count, get_market_count, get_writer,
+    get_open_event_ids, split_changed,
 )
 from src.discovery.sports_meta import get_sport_tag_map
 from src.discovery.markets_parser import parse_event, parse_markets, detect_sport_from_event
@@ -19,6 +41,8 @@ def fetch_sports_events(
     include_closed: bool = True,
     resume: bool = True,
     limit: int | None = None,
+    workers: int = DISCOVERY_TAG_WORKERS,
+    incremental: bool = False,
 ) -> tuple[int, int]:
     """
     批量获取体育赛事事件及其市场数据。
@@ -27,48 +51,54 @@ def fetch_sports_events(
         sport_names: 要采集的运动列表（None = 全部）
         active_only: 是否只采集活跃事件
         include_closed: 是否包含已关闭事件
-        resume: 是否从断点恢复
-        limit: 最多采集事件数（调试用）
+        resume: 是否从断点恢复（每个 tag 各自的断点）
+        limit: 最多采集事件数（调试用，所有 tag 合计，按新增 + 变化计）
+        workers: 同时抓取的 tag 数
+        incremental: 增量模式：只抓高水位以上的新事件，并刷新库中未关闭的事件
 
     返回:
-        (新增事件数, 新增市场数)
+        (新增或变化的事件数, 新增或变化的市场数)
     """
     init_db()
     tag_map = get_sport_tag_map()
 
     tag_ids_to_fetch = _resolve_tags(sport_names, tag_map)
-
-    task_name = f"events_{'_'.join(sport_names) if sport_names else 'all'}"
-    start_offset = 0
+    crawl = _Crawl(tag_map, active_only, include_closed, limit, use_cache=not incremental)
     if resume:
-        progress = get_progress(task_name)
-        if progress:
-            start_offset = progress["last_offset"]
-            print(f"[Events] 从断点恢复: offset={start_offset}")
-
-    total_events = 0
-    total_markets = 0
+        _adopt_legacy_progress(sport_names, tag_ids_to_fetch[0], crawl)
 
+    starts: dict[int, tuple[int, int]] = {}   # 全量翻页的 tag → (起始 offset, 已见过的最大 id)
+    high_water: dict[int, int] = {}           # 增量的 tag → 高水位
     for tag_id in tag_ids_to_fetch:
-        e, m = _fetch_events_by_tag(
-            tag_id=tag_id,
-            tag_map=tag_map,
-            active_only=active_only,
-            include_closed=include_closed,
-            task_name=task_name,
-            start_offset=start_offset if tag_id == tag_ids_to_fetch[0] else 0,
-            limit=limit,
-        )
-        total_events += e
-        total_markets += m
-
-        if limit and total_events >= limit:
-            break
-
-    print(f"\n[Events] 采集完成: 新增 {total_events} 个事件, {total_markets} 个市场")
+        starts[tag_id] = (0, 0)
+        progress = get_progress(crawl.task_name(tag_id))
+        last_id = int(progress["last_key"]) if progress and (progress["last_key"] or "").isdigit() else 0
+        if incremental and progress and not progress["last_offset"] and last_id:
+            high_water[tag_id] = last_id
+            print(f"[Events] tag_id={tag_id} 增量: 只抓 id > {last_id}")
+        elif resume and progress and progress["last_offset"]:
+            starts[tag_id] = (progress["last_offset"], last_id)
+            print(f"[Events] tag_id={tag_id} 从断点恢复: offset={progress['last_offset']}")
+    open_ids = get_open_event_ids(sport_names) if incremental else []
+
+    workers = max(1, min(workers, len(tag_ids_to_fetch)))
+    print(f"[Events] {len(tag_ids_to_fetch)} 个 tag, 并发 {workers}")
+    crawl.pbar = tqdm(desc="Events", unit="页")
+    asyncio.run(_fetch_tags(tag_ids_to_fetch, starts, high_water, open_ids, crawl, workers))
+    crawl.pbar.close()
+
+    ev, mk = crawl.stats["events"], crawl.stats["markets"]
+    print(f"\n[Events] 采集完成: 事件 新增 {ev['new']} / 变化 {ev['changed']} / 未变 {ev['unchanged']}, "
+          f"市场 新增 {mk['new']} / 变化 {mk['changed']} / 未变 {mk['unchanged']}")
+    if crawl.failed:
+        print(f"[Events] 请求失败、已保存断点的 tag: {crawl.failed}")
+    if crawl.refresh_failed:
+        print(f"[Events] 未关闭事件刷新失败 {crawl.refresh_failed} 个，下次增量时重试")
+    t = crawl.timings
+    print(f"[Events] 阶段耗时: 请求 {t['fetch']:.1f}s / 等待页面 {t['wait']:.1f}s / 解析 {t['parse']:.1f}s / "
+          f"入库 {t['persist']:.1f}s / 断点 {t['progress']:.1f}s")
     print(f"[Events] 数据库总计: {get_event_count()} 事件, {get_market_count()} 市场")
-    save_progress(task_name, last_offset=0)
-    return total_events, total_markets
+    return ev["new"] + ev["changed"], mk["new"] + mk["changed"]
 
 
 def _resolve_tags(sport_names: list[str] | None, tag_map: dict) -> list[int]:
@@ -87,25 +117,255 @@ def _resolve_tags(sport_names: list[str] | None, tag_map: dict) -> list[int]:
             tags.append(specific[0] if specific else sport_tags[0])
         else:
             print(f"[Events] 未知运动: {name}，跳过")
-    return tags if tags else [1]
+    return list(dict.fromkeys(tags)) if tags else [1]
+
+
+def _adopt_legacy_progress(sport_names: list[str] | None, first_tag: int, crawl: _Crawl):
+    """把升级前的断点 events_<运动|all> 转给第一个 tag（旧版只对第一个 tag 使用该 offset），之后旧断点归零。"""
+    legacy = f"events_{'_'.join(sport_names) if sport_names else 'all'}"
+    progress = get_progress(legacy)
+    if not progress or not progress["last_offset"]:
+        return
+    task_name = crawl.task_name(first_tag)
+    if get_progress(task_name) is None:
+        save_progress(task_name, last_offset=progress["last_offset"])
+        print(f"[Events] 沿用旧版断点 {legacy}: tag_id={first_tag} offset={progress['last_offset']}")
+    save_progress(legacy, last_offset=0)
+
+
+def _zero() -> dict[str, int]:
+    return {"new": 0, "changed": 0, "unchanged": 0}
+
+
+@dataclass
+class _Crawl:
+    """一次 discover 的共享状态：过滤条件、合计与进度条（所有协程在同一事件循环内，不加锁）。"""
+    tag_map: dict
+    active_only: bool
+    include_closed: bool
+    limit: int | None
+    use_cache: bool = True
+    stats: dict[str, dict[str, int]] = field(default_factory=lambda: {"events": _zero(), "markets": _zero()})
+    seen: set[int] = field(default_factory=set)
+    pbar: tqdm | None = None
+    failed: list[int] = field(default_factory=list)
+    refresh_failed: int = 0
+    writes: list[asyncio.Future] = field(default_factory=list)
+    timings: dict[str, float] = field(
+        default_factory=lambda: dict.fromkeys(("fetch", "wait", "parse", "persist", "progress"), 0.0))
+
+    def task_name(self, tag_id: int) -> str:
+        """tag 的断点名；过滤条件不同则结果集与 offset 不同，断点分开保存。"""
+        scope = "_active" if self.active_only else ("_open" if not self.include_closed else "")
+        return f"events_tag{tag_id}{scope}"
+
+    def stored(self, kind: str) -> int:
+        return self.stats[kind]["new"] + self.stats[kind]["changed"]
+
+    def limit_reached(self) -> bool:
+        return bool(self.limit) and self.stored("events") >= self.limit
+
+    def filters(self) -> dict:
+        if self.active_only:
+            return {"active": "true", "closed": "false"}
+        return {} if self.include_closed else {"closed": "false"}
+
+    async def flush(self):
+        """等待已交给写线程的页面写入全部提交（写入失败时在此抛出）。"""
+        writes, self.writes = self.writes, []
+        await asyncio.gather(*writes)
+
+    async def get_events(self, params: dict, use_cache: bool | None = None) -> Any:
+        t0 = time.perf_counter()
+        try:
+            return await gamma_get_async(
+                "/events", params=params, use_cache=self.use_cache if use_cache is None else use_cache)
+        finally:
+            self.timings["fetch"] += time.perf_counter() - t0
+
+
+def _is_last_page(data: Any) -> bool:
+    return data is None or len(data) < EVENTS_PAGE_SIZE
+
+
+def _is_final(task: asyncio.Task) -> bool:
+    """已返回的预取页是失败页或末页。"""
+    return task.done() and not task.cancelled() and task.exception() is None and _is_last_page(task.result())
+
+
+class _PagePrefetch:
+    """按 offset 顺序交付页面，同时保持后续至多 depth 页的请求在途。
+
+    首页单独请求（多数 tag 只有一页），之后每交付一个整页，在途窗口加一直至 depth。在途页中一旦
+    有失败页或不满一页的页返回（哪怕排在当前页之后），就不再发起更后面的请求；交付到这一页时
+    取消其余在途请求。
+    """
+
+    def __init__(self, fetch: Callable[[int], Awaitable[Any]], start: int, depth: int):
+        self._fetch = fetch
+        self._next = start
+        self._depth = max(1, depth)
+        self._tasks: deque[asyncio.Task] = deque()
+        self._done = False
+        self._delivered = 0
+
+    async def next(self) -> Any:
+        window = min(self._depth, self._delivered + 1)
+        while not self._done and len(self._tasks) < window and not any(map(_is_final, self._tasks)):
+            self._tasks.append(asyncio.ensure_future(self._fetch(self._next)))
+            self._next += EVENTS_PAGE_SIZE
+        data = await self._tasks.popleft()
+        if _is_last_page(data):
+            self.close()
+        self._delivered += 1
+        return data
+
+    def close(self):
+        """取消尚未交付的预取请求（已越过末页或提前结束）。"""
+        self._done = True
+        while self._tasks:
+            self._tasks.popleft().cancel()
+
+
+async def _fetch_tags(
+    tag_ids: list[int], starts: dict[int, tuple[int, int]], high_water: dict[int, int],
+    open_ids: list[int], crawl: _Crawl, workers: int,
+):
+    """workers 个协程依次领取 tag，各自翻页到底；增量模式随后再批量刷新未关闭的事件。"""
+    pending = list(tag_ids)
+
+    async def _worker():
+        while pending and not crawl.limit_reached():
+            tag_id = pending.pop(0)
+            if tag_id in high_water:
+                await _fetch_new_events(tag_id, high_water[tag_id], crawl)
+            else:
+                await _fetch_events_by_tag(tag_id, *starts[tag_id], crawl)
 
+    try:
+        await asyncio.gather(*(_worker() for _ in range(workers)))
+        if open_ids and not crawl.limit_reached():
+            await _refresh_open_events([i for i in open_ids if i not in crawl.seen], crawl, workers)
+        await crawl.flush()
+    finally:
+        await close_async_session()
 
-def _fetch_events_by_tag(
-    tag_id: int,
-    tag_map: dict,
-    active_only: bool,
-    include_closed: bool,
-    task_name: str,
-    start_offset: int,
-    limit: int | None,
-) -> tuple[int, int]:
-    """用指定 tag_id 分页获取事件。"""
+
+async def _save_progress(task_name: str, offset: int, last_id: int, crawl: _Crawl):
+    t0 = time.perf_counter()
+    await crawl.flush()
+    row = {"task_name": task_name, "last_offset": offset, "last_key": str(last_id) if last_id else ""}
+    await get_writer().submit_async("progress", [row])
+    crawl.timings["progress"] += time.perf_counter() - t0
+
+
+async def _store_page(data: list[dict], tag_id: int | None, crawl: _Crawl):
+    """解析一页事件，只提交新行与内容有变化的行（tag_id 为 None 表示按 id 刷新已入库的事件）。
+
+    本次采集中已处理过的事件（多个 tag 共有的事件）直接跳过：其前一次写入可能尚未提交，
+    再与库比对会被重复计为新增/变化。
+    """
+    t0 = time.perf_counter()
+    batch_events = []
+    batch_markets = []
+
+    for raw in data:
+        sport = detect_sport_from_event(raw, crawl.tag_map)
+        if not sport and tag_id == 1:
+            continue
+
+        parsed = parse_event(raw, sport)
+        if not parsed or parsed["id"] in crawl.seen:
+            continue
+
+        batch_events.append(parsed)
+        batch_markets.extend(parse_markets(raw, parsed["id"], sport))
+        crawl.seen.add(parsed["id"])
+
+    t1 = time.perf_counter()
+    crawl.timings["parse"] += t1 - t0
+    writer = get_writer()
+    for kind, rows in (("events", batch_events), ("markets", batch_markets)):
+        if not rows:
+            continue
+        new, changed, unchanged = split_changed(kind, rows)
+        if new or changed:
+            crawl.writes.append(await writer.enqueue_async(kind, new + changed))
+        stats = crawl.stats[kind]
+        stats["new"] += len(new)
+        stats["changed"] += len(changed)
+        stats["unchanged"] += unchanged
+    crawl.timings["persist"] += time.perf_counter() - t1
+
+
+def _max_id(data: list[dict]) -> int:
+    return max((int(raw["id"]) for raw in data if str(raw.get("id", "")).isdigit()), default=0)
+
+
+def _update_pbar(crawl: _Crawl, **extra):
+    crawl.pbar.update(1)
+    crawl.pbar.set_postfix({"events": crawl.stored("events"), "markets": crawl.stored("markets"), **extra})
+
+
+async def _fetch_events_by_tag(tag_id: int, start_offset: int, last_id: int, crawl: _Crawl):
+    """用指定 tag_id 按 id 升序分页获取事件（预取后续页）；定期把该 tag 的断点推进到已入库的下一页，并记下最大 id。"""
+    task_name = crawl.task_name(tag_id)
     offset = start_offset
-    new_events = 0
-    new_markets = 0
-    consecutive_empty = 0
 
-    pbar = tqdm(desc=f"tag_id={tag_id}", unit="页")
+    def _fetch(page_offset: int) -> Awaitable[Any]:
+        return crawl.get_events({
+            "tag_id": tag_id,
+            "limit": EVENTS_PAGE_SIZE,
+            "offset": page_offset,
+            "order": "id",
+            "ascending": "true",
+            **crawl.filters(),
+        })
+
+    pages = _PagePrefetch(_fetch, start_offset, EVENTS_PREFETCH_PAGES)
+    unsaved = 0
+    try:
+        while True:
+            t0 = time.perf_counter()
+            data = await pages.next()
+            crawl.timings["wait"] += time.perf_counter() - t0
+
+            if data is None:
+                print(f"\n  [Events] tag_id={tag_id} 请求失败 offset={offset}，保存进度")
+                crawl.failed.append(tag_id)
+                await _save_progress(task_name, offset, last_id, crawl)
+                return
+
+            if not data:
+                break
+
+            await _store_page(data, tag_id, crawl)
+            last_id = max(last_id, _max_id(data))
+            _update_pbar(crawl, tag=tag_id, offset=offset)
+            offset += EVENTS_PAGE_SIZE
+            unsaved += 1
+
+            if len(data) < EVENTS_PAGE_SIZE:
+                break
+
+            if crawl.limit_reached():
+                await _save_progress(task_name, offset, last_id, crawl)
+                return
+
+            if unsaved >= EVENTS_PROGRESS_EVERY:
+                await _save_progress(task_name, offset, last_id, crawl)
+                unsaved = 0
+    finally:
+        pages.close()
+
+    await _save_progress(task_name, 0, last_id, crawl)   # 该 tag 已走完，下次从头开始（或从高水位增量）
+
+
+async def _fetch_new_events(tag_id: int, high_water: int, crawl: _Crawl):
+    """增量：按 id 倒序翻页，直到遇到不超过高水位的事件；全部抓完才推进高水位，失败或触达 limit 时下次重抓。"""
+    task_name = crawl.task_name(tag_id)
+    top = high_water
+    offset = 0
 
     while True:
         params: dict = {
@@ -113,64 +373,48 @@ def _fetch_events_by_tag(
             "limit": EVENTS_PAGE_SIZE,
             "offset": offset,
             "order": "id",
-            "ascending": "true",
+            "ascending": "false",
+            **crawl.filters(),
         }
-        if active_only:
-            params["active"] = "true"
-            params["closed"] = "false"
-        elif not include_closed:
-            params["closed"] = "false"
-
-        data = gamma_get("/events", params=params)
+        data = await crawl.get_events(params, use_cache=False)
 
         if data is None:
-            print(f"\n  [Events] 请求失败 offset={offset}，保存进度")
-            save_progress(task_name, last_offset=offset)
-            break
+            print(f"\n  [Events] tag_id={tag_id} 增量请求失败 offset={offset}，高水位保持 {high_water}")
+            crawl.failed.append(tag_id)
+            return
 
-        if not data:
-            break
+        newer = [raw for raw in data if str(raw.get("id", "")).isdigit() and int(raw["id"]) > high_water]
+        if newer:
+            await _store_page(newer, tag_id, crawl)
+            top = max(top, _max_id(newer))
+        _update_pbar(crawl, tag=tag_id, new_above=high_water)
 
-        batch_events = []
-        batch_markets = []
-
-        for raw in data:
-            sport = detect_sport_from_event(raw, tag_map)
-            if not sport and tag_id == 1:
-                continue
-
-            parsed = parse_event(raw, sport)
-            if not parsed:
-                continue
+        if len(newer) < len(data) or len(data) < EVENTS_PAGE_SIZE:
+            break
 
-            batch_events.append(parsed)
-            markets = parse_markets(raw, parsed["id"])
-            batch_markets.extend(markets)
-
-        if batch_events:
-            inserted_e = save_events(batch_events)
-            inserted_m = save_markets(batch_markets)
-            new_events += inserted_e
-            new_markets += inserted_m
-            if inserted_e > 0:
-                consecutive_empty = 0
-            else:
-                consecutive_empty += 1
-        else:
-            consecutive_empty += 1
+        if crawl.limit_reached():
+            return
 
-        pbar.update(1)
-        pbar.set_postfix({"events": new_events, "markets": new_markets, "offset": offset})
+        offset += EVENTS_PAGE_SIZE
 
-        save_progress(task_name, last_offset=offset + EVENTS_PAGE_SIZE)
+    await _save_progress(task_name, 0, top, crawl)
 
-        if len(data) < EVENTS_PAGE_SIZE:
-            break
 
-        if limit and new_events >= limit:
-            break
+async def _refresh_open_events(event_ids: list[int], crawl: _Crawl, workers: int):
+    """按 id 批量（每请求 EVENTS_PAGE_SIZE 个）重新拉取库中未关闭的事件，只写入内容有变化的行。"""
+    if not event_ids:
+        return
+    print(f"\n[Events] 刷新库中 {len(event_ids)} 个未关闭事件")
+    batches = [event_ids[i:i + EVENTS_PAGE_SIZE] for i in range(0, len(event_ids), EVENTS_PAGE_SIZE)]
 
-        offset += EVENTS_PAGE_SIZE
+    async def _worker():
+        while batches and not crawl.limit_reached():
+            batch = batches.pop(0)
+            data = await crawl.get_events({"id": batch, "limit": len(batch)}, use_cache=False)
+            if data is None:
+                crawl.refresh_failed += len(batch)
+                continue
+            await _store_page(data, None, crawl)
+            _update_pbar(crawl, refresh=len(batches))
 
-    pbar.close()
-    return new_events, new_markets
+    await asyncio.gather(*(_worker() for _ in range(max(1, min(workers, len(batches))))))
@@ -7,33 +7,98 @@ from typing import Any
 from config import POLYMARKET_EVENT_URL
 
 
-def detect_sport_from_event(event: dict, sport_tag_map: dict[str, list[int]]) -> str:
-    """根据事件的 tags 推断运动类型。"""
-    event_tags = set()
-    for tag in event.get("tags", []):
-        tag_id = tag.get("id")
-        if tag_id:
-            event_tags.add(int(tag_id))
-
-    generic_tags = {1, 100639}
-    best_match = ""
-    best_score = 0
-
-    for sport, sport_tags in sport_tag_map.items():
-        specific = [t for t in sport_tags if t not in generic_tags]
-        overlap = len(event_tags & set(specific))
-        if overlap > best_score:
-            best_score = overlap
-            best_match = sport
-
-    if not best_match:
-        series_slug = event.get("seriesSlug", "") or ""
-        slug = event.get("slug", "") or ""
-        for sport in sport_tag_map:
-            if sport in series_slug.lower() or sport in slug.lower():
+_GENERIC_TAGS = frozenset({1, 100639})
+
+
+class SportClassifier:
+    """由 sport → tag_id 映射一次性构建的运动分类器，结果与逐运动比对 tag 的原始算法完全一致。
+
+    - tag 倒排索引：具体 tag（去掉通用标签）→ 含该 tag 的运动序号；一个事件只查自身的几个 tag，
+      按命中数取最多者，并列时取映射中靠前的运动。
+    - slug 兜底：没有任何 tag 命中时，用运动名构建的 Aho-Corasick 自动机一次扫描 seriesSlug 与 slug，
+      取出现过的运动中映射顺序最靠前的一个（等价于按映射顺序逐个做子串判断）。
+    """
+
+    def __init__(self, sport_tag_map: dict[str, list[int]]):
+        self.sports = list(sport_tag_map)
+        self._by_tag: dict[int, list[int]] = {}
+        for i, tags in enumerate(sport_tag_map.values()):
+            for t in set(tags) - _GENERIC_TAGS:
+                self._by_tag.setdefault(t, []).append(i)
+        self._build_matcher()
+
+    def _build_matcher(self):
+        """运动名 → 确定性自动机：_goto[state][ch] 为下一状态，_best[state] 为该状态结束的最靠前运动序号。"""
+        none = len(self.sports)
+        goto: list[dict[str, int]] = [{}]
+        best = [none]
+        for i, name in enumerate(self.sports):
+            state = 0
+            for ch in name:
+                if ch not in goto[state]:
+                    goto.append({})
+                    best.append(none)
+                    goto[state][ch] = len(goto) - 1
+                state = goto[state][ch]
+            best[state] = min(best[state], i)
+        # 按 BFS 顺序补全失败转移，把失败链上的匹配并入 best，并把 goto 展开成完整转移表
+        fail = [0] * len(goto)
+        queue = list(goto[0].values())
+        for state in queue:
+            for ch, nxt in goto[state].items():
+                f = fail[state]
+                while f and ch not in goto[f]:
+                    f = fail[f]
+                fail[nxt] = goto[f][ch] if ch in goto[f] and goto[f][ch] != nxt else 0
+                best[nxt] = min(best[nxt], best[fail[nxt]])
+                queue.append(nxt)
+        for state in queue:
+            goto[state] = {**goto[fail[state]], **goto[state]}
+        self._goto, self._best, self._none = goto, best, none
+        self._empty_name = best[0]   # 空运动名在任何字符串中都"出现"
+
+    def _first_in(self, text: str) -> int:
+        goto, best = self._goto, self._best
+        found = self._empty_name
+        state = 0
+        for ch in text:
+            state = goto[state].get(ch, 0)
+            if best[state] < found:
+                found = best[state]
+        return found
+
+    def classify(self, event: dict) -> str:
+        """根据事件的 tags 推断运动类型；无 tag 命中时退回 seriesSlug / slug 子串匹配，都不中返回空串。"""
+        event_tags = {int(tag["id"]) for tag in event.get("tags", []) if tag.get("id")}
+        counts: dict[int, int] = {}
+        for t in event_tags:
+            for i in self._by_tag.get(t, ()):
+                counts[i] = counts.get(i, 0) + 1
+        if counts:
+            top = max(counts.values())
+            sport = self.sports[min(i for i, c in counts.items() if c == top)]
+            if sport:
                 return sport
 
-    return best_match
+        found = min(self._first_in((event.get("seriesSlug", "") or "").lower()),
+                    self._first_in((event.get("slug", "") or "").lower()))
+        return self.sports[found] if found < self._none else ""
+
+
+_classifier: tuple[dict, SportClassifier] | None = None
+
+
+def sport_classifier(sport_tag_map: dict[str, list[int]]) -> SportClassifier:
+    """同一个映射对象只构建一次分类器（按对象身份缓存；映射构建后不应再修改）。"""
+    global _classifier
+    if _classifier is None or _classifier[0] is not sport_tag_map:
+        _classifier = (sport_tag_map, SportClassifier(sport_tag_map))
+    return _classifier[1]
+
+
+def detect_sport_from_event(event: dict, sport_tag_map: dict[str, list[int]]) -> str:
+    """根据事件的 tags 推断运动类型。"""
+    return sport_classifier(sport_tag_map).classify(event)
 
 
 def parse_event(raw: dict, sport: str = "") -> dict | None:
@@ -61,8 +126,8 @@ def parse_event(raw: dict, sport: str = "") -> dict | None:
     }
 
 
-def parse_markets(raw_event: dict, event_id: int) -> list[dict]:
-    """从一个 event 的原始数据中提取所有 market。"""
+def parse_markets(raw_event: dict, event_id: int, sport: str = "") -> list[dict]:
+    """从一个 event 的原始数据中提取所有 market（sport 为所属事件识别出的运动，冗余存到每个 market）。"""
     raw_markets = raw_event.get("markets", [])
     results = []
 
@@ -80,10 +145,6 @@ def parse_markets(raw_event: dict, event_id: int) -> list[dict]:
         if isinstance(outcomes, list):
             outcomes = json.dumps(outcomes)
 
-        outcome_prices = m.get("outcomePrices", "")
-        if isinstance(outcome_prices, list):
-            outcome_prices = json.dumps(outcome_prices)
-
         neg_risk = False
         events_in_market = m.get("events", [])
         if events_in_market:
@@ -91,6 +152,7 @@ def parse_markets(raw_event: dict, event_id: int) -> list[dict]:
         if not neg_risk:
             neg_risk = bool(raw_event.get("negRisk", False))
 
+        status = parse_market_status(m)
         results.append({
             "id": str(market_id),
             "event_id": event_id,
@@ -100,20 +162,34 @@ def parse_markets(raw_event: dict, event_id: int) -> list[dict]:
             "sports_market_type": m.get("sportsMarketType", ""),
             "line": _safe_float(m.get("line")),
             "outcomes": outcomes,
-            "outcome_prices": outcome_prices,
+            "outcome_prices": status["outcome_prices"],
             "clob_token_ids": clob_ids,
             "team_a_id": m.get("teamAID", "") or "",
             "team_b_id": m.get("teamBID", "") or "",
-            "volume": float(m.get("volumeNum", 0) or m.get("volume", 0) or 0),
-            "closed": bool(m.get("closed", False)),
-            "accepting_orders": bool(m.get("acceptingOrders", False)),
+            "volume": status["volume"],
+            "closed": status["closed"],
+            "accepting_orders": status["accepting_orders"],
             "tick_size": _safe_float(m.get("orderPriceMinTickSize")),
             "neg_risk": neg_risk,
+            "sport": sport,
         })
 
     return results
 
 
+def parse_market_status(m: dict) -> dict:
+    """market 中会随交易变化的状态字段（refresh 只更新这些列）。"""
+    outcome_prices = m.get("outcomePrices", "")
+    if isinstance(outcome_prices, list):
+        outcome_prices = json.dumps(outcome_prices)
+    return {
+        "outcome_prices": outcome_prices,
+        "volume": float(m.get("volumeNum", 0) or m.get("volume", 0) or 0),
+        "closed": bool(m.get("closed", False)),
+        "accepting_orders": bool(m.get("acceptingOrders", False)),
+    }
+
+
 def _safe_float(val: Any) -> float | None:
     if val is None:
         return None
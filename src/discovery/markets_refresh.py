@@ -0,0 +1,85 @@
+"""活跃市场刷新 — 只重新拉取库中未关闭的市场，更新 closed / accepting_orders / outcome_prices / volume
+
+不翻 /events：从库中取出未关闭的市场，按 id 每 MARKETS_REFRESH_BATCH 个一批查询 Gamma /markets，
+MARKETS_REFRESH_WORKERS 个批次并发。返回的状态字段合并到库中原行后走 save_markets 同一套 content_hash
+upsert，只有状态真的变化的市场才写入；接口未返回的市场保持不变。
+"""
+from __future__ import annotations
+
+import asyncio
+import time
+
+from tqdm import tqdm
+
+from config import MARKETS_REFRESH_BATCH, MARKETS_REFRESH_WORKERS
+from src.api_client import gamma_get_async, close_async_session
+from src.database import init_db, get_open_markets, get_writer, split_changed
+from src.discovery.markets_parser import parse_market_status
+
+
+def refresh_open_markets(
+    sport_names: list[str] | None = None,
+    batch_size: int = MARKETS_REFRESH_BATCH,
+    workers: int = MARKETS_REFRESH_WORKERS,
+) -> dict[str, int]:
+    """
+    重新拉取库中所有未关闭市场的最新状态并批量更新。
+
+    参数:
+        sport_names: 只刷新这些运动的市场（None = 全部）
+        batch_size: 每个请求查询的市场数
+        workers: 并发批次数
+
+    返回:
+        {"markets", "changed", "closed", "unchanged", "missing", "failed"} 计数
+    """
+    init_db()
+    markets = get_open_markets(sport_names)
+    stats = dict.fromkeys(("markets", "changed", "closed", "unchanged", "missing", "failed"), 0)
+    stats["markets"] = len(markets)
+    if not markets:
+        print("[Refresh] 库中没有未关闭的市场，请先运行 discover 命令")
+        return stats
+
+    batches = [markets[i:i + batch_size] for i in range(0, len(markets), batch_size)]
+    print(f"[Refresh] {len(markets)} 个未关闭市场，{len(batches)} 批，并发 {workers}")
+    t0 = time.perf_counter()
+    pbar = tqdm(total=len(markets), desc="Refresh", unit="市场")
+    asyncio.run(_refresh_batches(batches, stats, pbar, max(1, min(workers, len(batches)))))
+    pbar.close()
+
+    print(f"[Refresh] 完成 {time.perf_counter() - t0:.1f}s: 状态变化 {stats['changed']} "
+          f"(其中已关闭 {stats['closed']}), 未变 {stats['unchanged']}, 接口未返回 {stats['missing']}"
+          + (f", 请求失败 {stats['failed']}" if stats["failed"] else ""))
+    return stats
+
+
+async def _refresh_batches(batches: list[list[dict]], stats: dict[str, int], pbar: tqdm, workers: int):
+    async def _worker():
+        while batches:
+            batch = batches.pop(0)
+            await _refresh_batch(batch, stats)
+            pbar.update(len(batch))
+
+    try:
+        await asyncio.gather(*(_worker() for _ in range(workers)))
+    finally:
+        await close_async_session()
+
+
+async def _refresh_batch(batch: list[dict], stats: dict[str, int]):
+    ids = [m["id"] for m in batch]
+    data = await gamma_get_async("/markets", params={"id": ids, "limit": len(ids)}, use_cache=False)
+    if data is None:
+        stats["failed"] += len(batch)
+        return
+
+    fresh = {str(raw.get("id")): parse_market_status(raw) for raw in data}
+    merged = [{**m, **fresh[m["id"]]} for m in batch if m["id"] in fresh]
+    stats["missing"] += len(batch) - len(merged)
+    _, changed, unchanged = split_changed("markets", merged)
+    # 以写线程实际更新的行数为准：比对读的是已提交的快照，与之并发的写入可能已先一步更新了同一行
+    written = await get_writer().submit_async("markets", changed) if changed else 0
+    stats["unchanged"] += unchanged + len(changed) - written
+    stats["changed"] += written
+    stats["closed"] += min(written, sum(1 for m in changed if m["closed"]))
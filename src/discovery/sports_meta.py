@@ -1,9 +1,22 @@
-"""体育元数据 — 获取所有运动类型及其 tag 映射"""
+"""体育元数据 — 获取所有运动类型及其 tag 映射
+
+sport → tag_id 映射按三级解析：进程内缓存 → 热启动文件（config.SPORTS_CACHE_PATH）→ 请求 /sports；
+前两级在 SPORTS_TAG_MAP_TTL 内有效（以数据获取时间计），fetch_sports_metadata 成功后同时刷新两者。
+/sports 请求失败时退回数据库 sports 表。返回的映射在进程内共享，调用方不要修改。
+"""
 from __future__ import annotations
 
+import json
+import os
+import time
+
+from config import SPORTS_CACHE_PATH, SPORTS_TAG_MAP_TTL
 from src.api_client import gamma_get
 from src.database import init_db, save_sports, get_all_sports
 
+_tag_map: dict[str, list[int]] | None = None
+_tag_map_at = 0.0   # 映射数据的获取时间（epoch 秒）
+
 
 def fetch_sports_metadata() -> list[dict]:
     """从 /sports 端点获取所有运动类型元数据并存入数据库。"""
@@ -27,17 +40,12 @@ def fetch_sports_metadata() -> list[dict]:
         })
 
     saved = save_sports(rows)
+    _remember(_build_tag_map(rows), time.time(), persist=True)
     print(f"[Sports] 完成: 共 {len(rows)} 种运动，存入 {saved} 条")
     return rows
 
 
-def get_sport_tag_map() -> dict[str, list[int]]:
-    """返回 sport -> tag_id 列表 的映射。"""
-    sports = get_all_sports()
-    if not sports:
-        fetch_sports_metadata()
-        sports = get_all_sports()
-
+def _build_tag_map(sports: list[dict]) -> dict[str, list[int]]:
     result = {}
     for s in sports:
         tag_str = s.get("tag_ids", "")
@@ -50,6 +58,56 @@ def get_sport_tag_map() -> dict[str, list[int]]:
     return result
 
 
+def _remember(tag_map: dict[str, list[int]], fetched_at: float, persist: bool = False) -> dict[str, list[int]]:
+    global _tag_map, _tag_map_at
+    _tag_map, _tag_map_at = tag_map, fetched_at
+    if persist:
+        os.makedirs(os.path.dirname(SPORTS_CACHE_PATH), exist_ok=True)
+        tmp = SPORTS_CACHE_PATH + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"fetched_at": fetched_at, "sports": tag_map}, f, ensure_ascii=False)
+        os.replace(tmp, SPORTS_CACHE_PATH)
+    return tag_map
+
+
+def _load_warm(max_age: float) -> bool:
+    """读取未过期的热启动文件到进程内缓存；文件不存在、损坏或过期返回 False。"""
+    try:
+        with open(SPORTS_CACHE_PATH, encoding="utf-8") as f:
+            cached = json.load(f)
+        fetched_at = float(cached["fetched_at"])
+        sports = {str(k): [int(t) for t in v] for k, v in cached["sports"].items()}
+    except (OSError, ValueError, KeyError, TypeError, AttributeError):
+        return False
+    if time.time() - fetched_at >= max_age:
+        return False
+    _remember(sports, fetched_at)
+    return True
+
+
+def invalidate_sport_tag_map():
+    """丢弃进程内缓存与热启动文件，下次 get_sport_tag_map 重新请求 /sports。"""
+    global _tag_map
+    _tag_map = None
+    try:
+        os.remove(SPORTS_CACHE_PATH)
+    except FileNotFoundError:
+        pass
+
+
+def get_sport_tag_map(max_age: float = SPORTS_TAG_MAP_TTL) -> dict[str, list[int]]:
+    """返回 sport -> tag_id 列表 的映射（进程内共享，勿修改）。"""
+    if _tag_map is not None and time.time() - _tag_map_at < max_age:
+        return _tag_map
+    if _load_warm(max_age):
+        return _tag_map
+    if fetch_sports_metadata():
+        return _tag_map
+    # /sports 不可用：用库中上次保存的元数据（不写热启动文件，下个进程仍会重试请求）
+    init_db()
+    return _remember(_build_tag_map(get_all_sports()), time.time())
+
+
 def get_sport_primary_tags(sport_names: list[str] | None = None) -> list[int]:
     """
     获取指定运动（或全部）的主要 tag_id 列表（去除通用标签 1 和 100639）。
@@ -0,0 +1,341 @@
+"""DuckDB 存储后端 — 与 SQLite 表结构一致的列存单文件库，供大规模历史采集后的扫描与聚合
+
+database.py 的公共函数只经由两个接口访问存储：get_reader() 返回的只读连接（execute(sql, params)，
+结果行可按列名/位置取值、dict(row) 得到列字典，与 sqlite3.Row 用法一致），以及 DbWriter 的
+connect / write 两个回调。本模块为 DuckDB 提供这两者，save_* / get_* / iter_* 因此无需改动：
+
+  - 表与列同 SQLite（参数占位符 ? 与 sqlite_master 在 DuckDB 中均可用）；快照/成交不分日分区，
+    按写入（时间）顺序追加，由列存的 min/max 区块统计跳过无关数据
+  - 写入：每批参数元组先写成 JSONL 暂存文件，再以 INSERT ... SELECT FROM read_json 整批导入
+    （DuckDB 的逐行 executemany 每秒只有数百行）；INSERT OR IGNORE / OR REPLACE 语义不变
+  - 快照档位一律存完整 JSON（重复档位由列压缩吸收），不做增量与二进制编码
+  - trade_candles / mid_candles 是视图，查询时由原始成交/快照直接聚合，不需要增量维护或重建
+"""
+from __future__ import annotations
+
+import json
+import os
+import threading
+from typing import Any, Callable, Iterable, Iterator
+
+try:
+    import duckdb
+except ImportError:
+    duckdb = None
+
+
+def available() -> bool:
+    return duckdb is not None
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sports (
+    sport VARCHAR PRIMARY KEY, tag_ids VARCHAR, series_id VARCHAR, image_url VARCHAR, resolution_url VARCHAR
+);
+CREATE TABLE IF NOT EXISTS events (
+    id BIGINT PRIMARY KEY, slug VARCHAR UNIQUE, title VARCHAR, sport VARCHAR, start_time VARCHAR,
+    end_time VARCHAR, game_id VARCHAR, game_status VARCHAR, score VARCHAR, volume DOUBLE, active INTEGER,
+    closed INTEGER, neg_risk INTEGER, polymarket_url VARCHAR, fetched_at VARCHAR, content_hash VARCHAR
+);
+CREATE TABLE IF NOT EXISTS markets (
+    id VARCHAR PRIMARY KEY, event_id BIGINT, condition_id VARCHAR, slug VARCHAR, question VARCHAR,
+    sports_market_type VARCHAR, line DOUBLE, outcomes VARCHAR, outcome_prices VARCHAR, clob_token_ids VARCHAR,
+    team_a_id VARCHAR, team_b_id VARCHAR, volume DOUBLE, closed INTEGER, accepting_orders INTEGER,
+    tick_size DOUBLE, neg_risk INTEGER, fetched_at VARCHAR, content_hash VARCHAR, sport VARCHAR
+);
+CREATE TABLE IF NOT EXISTS tokens (
+    token_id VARCHAR PRIMARY KEY, condition_id VARCHAR, market_id VARCHAR, event_id BIGINT,
+    outcome_index INTEGER, outcome VARCHAR, sport VARCHAR
+);
+CREATE SEQUENCE IF NOT EXISTS orderbook_snapshots_id START 1;
+CREATE TABLE IF NOT EXISTS orderbook_snapshots (
+    id BIGINT DEFAULT nextval('orderbook_snapshots_id'), token_id VARCHAR, condition_id VARCHAR,
+    snapshot_time VARCHAR, bids_json VARCHAR, asks_json VARCHAR, best_bid DOUBLE, best_ask DOUBLE,
+    spread DOUBLE, mid_price DOUBLE, last_trade_price DOUBLE, tick_size VARCHAR, total_bid_depth DOUBLE,
+    total_ask_depth DOUBLE, book_blob BLOB, base_time VARCHAR
+);
+CREATE SEQUENCE IF NOT EXISTS trades_id START 1;
+CREATE TABLE IF NOT EXISTS trades (
+    id BIGINT DEFAULT nextval('trades_id'), event_slug VARCHAR, condition_id VARCHAR, trade_timestamp BIGINT,
+    side VARCHAR, outcome VARCHAR, size DOUBLE, price DOUBLE, proxy_wallet VARCHAR, transaction_hash VARCHAR,
+    fetched_at VARCHAR, timestamp_ms BIGINT, server_received_ms BIGINT,
+    UNIQUE (transaction_hash, trade_timestamp, size, side, proxy_wallet)
+);
+CREATE TABLE IF NOT EXISTS game_results (
+    event_id BIGINT PRIMARY KEY, game_id VARCHAR, sport VARCHAR, home_team VARCHAR, away_team VARCHAR,
+    final_score VARCHAR, period VARCHAR, status VARCHAR, winning_outcome VARCHAR, resolved_at VARCHAR
+);
+CREATE TABLE IF NOT EXISTS fetch_progress (
+    task_name VARCHAR PRIMARY KEY, last_offset BIGINT DEFAULT 0, last_key VARCHAR, updated_at VARCHAR
+);
+"""
+
+# K 线视图：列与 SQLite 的 trade_candles / mid_candles 表一致；同一时刻的多条按 id 先后取开/收盘价
+_CANDLE_VIEWS = {
+    "trade_candles": """
+        CREATE OR REPLACE VIEW trade_candles AS
+        SELECT condition_id, COALESCE(outcome, '') AS outcome, iv.interval,
+               trade_timestamp // iv.interval * iv.interval AS bucket,
+               arg_min(price, (trade_timestamp, id)) AS open, MAX(price) AS high, MIN(price) AS low,
+               arg_max(price, (trade_timestamp, id)) AS close,
+               SUM(COALESCE(size, 0)) AS volume, SUM(price * COALESCE(size, 0)) AS notional,
+               COUNT(*) AS n_trades,
+               CAST(MIN(trade_timestamp) AS DOUBLE) AS first_ts, CAST(MAX(trade_timestamp) AS DOUBLE) AS last_ts
+        FROM trades, (SELECT UNNEST({intervals}::BIGINT[]) AS interval) AS iv
+        WHERE price IS NOT NULL
+        GROUP BY condition_id, COALESCE(outcome, ''), iv.interval, trade_timestamp // iv.interval
+    """,
+    "mid_candles": """
+        CREATE OR REPLACE VIEW mid_candles AS
+        WITH s AS (
+            SELECT id, token_id, mid_price, epoch(CAST(snapshot_time AS TIMESTAMPTZ)) AS ts
+            FROM orderbook_snapshots WHERE mid_price > 0
+        )
+        SELECT token_id, iv.interval, CAST(floor(ts) AS BIGINT) // iv.interval * iv.interval AS bucket,
+               arg_min(mid_price, (ts, id)) AS open, MAX(mid_price) AS high, MIN(mid_price) AS low,
+               arg_max(mid_price, (ts, id)) AS close, COUNT(*) AS samples,
+               MIN(ts) AS first_ts, MAX(ts) AS last_ts
+        FROM s, (SELECT UNNEST({intervals}::BIGINT[]) AS interval) AS iv
+        GROUP BY token_id, iv.interval, CAST(floor(ts) AS BIGINT) // iv.interval
+    """,
+}
+
+# 写入类别 → (目标表, 暂存列 (列名, 类型)，顺序与参数元组一致, 插入方式)
+_WRITES: dict[str, tuple[str, list[tuple[str, str]], str]] = {
+    "sports": ("sports", [
+        ("sport", "VARCHAR"), ("tag_ids", "VARCHAR"), ("series_id", "VARCHAR"), ("image_url", "VARCHAR"),
+        ("resolution_url", "VARCHAR"),
+    ], "OR REPLACE"),
+    "events": ("events", [
+        ("id", "BIGINT"), ("slug", "VARCHAR"), ("title", "VARCHAR"), ("sport", "VARCHAR"),
+        ("start_time", "VARCHAR"), ("end_time", "VARCHAR"), ("game_id", "VARCHAR"), ("game_status", "VARCHAR"),
+        ("score", "VARCHAR"), ("volume", "DOUBLE"), ("active", "INTEGER"), ("closed", "INTEGER"),
+        ("neg_risk", "INTEGER"), ("polymarket_url", "VARCHAR"), ("fetched_at", "VARCHAR"),
+        ("content_hash", "VARCHAR"),
+    ], ""),
+    "markets": ("markets", [
+        ("id", "VARCHAR"), ("event_id", "BIGINT"), ("condition_id", "VARCHAR"), ("slug", "VARCHAR"),
+        ("question", "VARCHAR"), ("sports_market_type", "VARCHAR"), ("line", "DOUBLE"), ("outcomes", "VARCHAR"),
+        ("outcome_prices", "VARCHAR"), ("clob_token_ids", "VARCHAR"), ("team_a_id", "VARCHAR"),
+        ("team_b_id", "VARCHAR"), ("volume", "DOUBLE"), ("closed", "INTEGER"), ("accepting_orders", "INTEGER"),
+        ("tick_size", "DOUBLE"), ("neg_risk", "INTEGER"), ("sport", "VARCHAR"), ("fetched_at", "VARCHAR"),
+        ("content_hash", "VARCHAR"),
+    ], ""),
+    "tokens": ("tokens", [
+        ("token_id", "VARCHAR"), ("condition_id", "VARCHAR"), ("market_id", "VARCHAR"), ("event_id", "BIGINT"),
+        ("outcome_index", "INTEGER"), ("outcome", "VARCHAR"), ("sport", "VARCHAR"),
+    ], ""),
+    "orderbook_snapshots": ("orderbook_snapshots", [
+        ("token_id", "VARCHAR"), ("condition_id", "VARCHAR"), ("snapshot_time", "VARCHAR"),
+        ("bids_json", "VARCHAR"), ("asks_json", "VARCHAR"), ("best_bid", "DOUBLE"), ("best_ask", "DOUBLE"),
+        ("spread", "DOUBLE"), ("mid_price", "DOUBLE"), ("last_trade_price", "DOUBLE"), ("tick_size", "VARCHAR"),
+        ("total_bid_depth", "DOUBLE"), ("total_ask_depth", "DOUBLE"),
+    ], ""),
+    "trades": ("trades", [
+        ("event_slug", "VARCHAR"), ("condition_id", "VARCHAR"), ("trade_timestamp", "BIGINT"), ("side", "VARCHAR"),
+        ("outcome", "VARCHAR"), ("size", "DOUBLE"), ("price", "DOUBLE"), ("proxy_wallet", "VARCHAR"),
+        ("transaction_hash", "VARCHAR"), ("fetched_at", "VARCHAR"), ("timestamp_ms", "BIGINT"),
+        ("server_received_ms", "BIGINT"),
+    ], "OR IGNORE"),
+    "game_results": ("game_results", [
+        ("event_id", "BIGINT"), ("game_id", "VARCHAR"), ("sport", "VARCHAR"), ("home_team", "VARCHAR"),
+        ("away_team", "VARCHAR"), ("final_score", "VARCHAR"), ("period", "VARCHAR"), ("status", "VARCHAR"),
+        ("winning_outcome", "VARCHAR"), ("resolved_at", "VARCHAR"),
+    ], "OR REPLACE"),
+    "progress": ("fetch_progress", [
+        ("task_name", "VARCHAR"), ("last_offset", "BIGINT"), ("last_key", "VARCHAR"), ("updated_at", "VARCHAR"),
+    ], "OR REPLACE"),
+}
+
+# 写入类别 → 同一事务内随之写入的派生类别（派生行不计入变更数）
+_DERIVED = {"markets": "tokens"}
+
+# 按主键（首列）upsert 的类别 → 比较的列：这些列有变化才更新。events / markets 比较 content_hash
+# （同 SQLite 的 _content_upsert），tokens 比较全部列（同 SQLite 的 _TOKENS_SQL）
+_UPSERTS: dict[str, list[str]] = {
+    "events": ["content_hash"],
+    "markets": ["content_hash"],
+    "tokens": [c for c, _ in _WRITES["tokens"][1][1:]],
+}
+
+# 旧库补列（markets.sport 由所属事件补齐，tokens.sport 由所属市场补齐）
+_MIGRATIONS = [
+    "ALTER TABLE events ADD COLUMN IF NOT EXISTS content_hash VARCHAR",
+    "ALTER TABLE markets ADD COLUMN IF NOT EXISTS content_hash VARCHAR",
+    "ALTER TABLE markets ADD COLUMN IF NOT EXISTS sport VARCHAR",
+    "UPDATE markets SET sport = (SELECT sport FROM events WHERE events.id = markets.event_id) WHERE sport IS NULL",
+    "UPDATE tokens SET sport = (SELECT sport FROM markets WHERE markets.id = tokens.market_id) WHERE sport IS NULL",
+]
+
+
+def snapshot_params(rows: Iterable[dict]) -> Iterable[tuple]:
+    """快照行 → 暂存参数元组：档位一律存完整 JSON（行可携带 bids/asks 列表或 bids_json/asks_json 文本）。"""
+    for r in rows:
+        bids, asks = r.get("bids"), r.get("asks")
+        yield (
+            r["token_id"], r["condition_id"], r["snapshot_time"],
+            json.dumps(bids) if bids is not None else r["bids_json"],
+            json.dumps(asks) if asks is not None else r["asks_json"],
+            r["best_bid"], r["best_ask"], r["spread"], r["mid_price"],
+            r["last_trade_price"], r["tick_size"],
+            r["total_bid_depth"], r["total_ask_depth"],
+        )
+
+
+class _Row:
+    """查询结果行：row[i] / row["列名"] 取值，dict(row) 得到列字典。"""
+
+    __slots__ = ("_values", "_index")
+
+    def __init__(self, values: tuple, index: dict[str, int]):
+        self._values, self._index = values, index
+
+    def __getitem__(self, key: int | str) -> Any:
+        return self._values[key if isinstance(key, int) else self._index[key]]
+
+    def __iter__(self) -> Iterator[Any]:
+        return iter(self._values)
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+    def keys(self) -> list[str]:
+        return list(self._index)
+
+
+class _Result:
+    def __init__(self, cursor):
+        self._cursor = cursor
+        self.description = cursor.description
+        self._index = {d[0]: i for i, d in enumerate(self.description or ())}
+
+    def fetchone(self) -> _Row | None:
+        row = self._cursor.fetchone()
+        return _Row(row, self._index) if row is not None else None
+
+    def fetchall(self) -> list[_Row]:
+        return [_Row(r, self._index) for r in self._cursor.fetchall()]
+
+    def __iter__(self) -> Iterator[_Row]:
+        while True:
+            chunk = self._cursor.fetchmany(1000)
+            if not chunk:
+                return
+            for r in chunk:
+                yield _Row(r, self._index)
+
+
+class Reader:
+    """只读查询入口：每次 execute 使用独立游标，多个结果可同时迭代，可跨线程共用。"""
+
+    def __init__(self, conn, lock: threading.Lock):
+        self._conn, self._lock = conn, lock
+
+    def execute(self, sql: str, params: Iterable[Any] = ()) -> _Result:
+        with self._lock:
+            cursor = self._conn.cursor()
+        cursor.execute(sql, list(params))
+        return _Result(cursor)
+
+
+class _WriteConnection:
+    """写线程的连接：`with conn:` 开启事务，正常退出提交、异常时回滚（同 sqlite3.Connection）。"""
+
+    def __init__(self, cursor):
+        self.cursor = cursor
+
+    def __enter__(self):
+        self.cursor.execute("BEGIN TRANSACTION")
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.cursor.execute("ROLLBACK" if exc_type else "COMMIT")
+        return False
+
+    def execute(self, sql: str, params: Iterable[Any] = ()):
+        return self.cursor.execute(sql, list(params))
+
+    def close(self):
+        self.cursor.close()
+
+
+class DuckDBStore:
+    """一个 DuckDB 库文件：建表、只读查询入口，以及供 DbWriter 使用的写连接与写入函数。
+
+    params 为写入类别 → (行 → 参数元组) 的函数，元组列顺序与 _WRITES 的暂存列一致。
+    """
+
+    def __init__(self, path: str, params: dict[str, Callable[[Iterable[dict]], Iterable[tuple]]]):
+        if duckdb is None:
+            raise ValueError("未安装 duckdb，无法使用 DuckDB 存储后端（pip install duckdb）")
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self._params = params
+        self._conn = duckdb.connect(path)
+        self._stage_path = path + ".stage.jsonl"
+        self._lock = threading.Lock()   # 主连接上的建表/开游标/关闭
+        self._reader = Reader(self._conn, self._lock)
+
+    def init_db(self, candle_intervals: Iterable[int]):
+        with self._lock:
+            self._conn.execute(_SCHEMA)
+            for sql in _MIGRATIONS:
+                self._conn.execute(sql)
+        self.create_candle_views(candle_intervals)
+
+    def create_candle_views(self, intervals: Iterable[int]):
+        spec = "[" + ", ".join(str(int(i)) for i in intervals) + "]"
+        with self._lock:
+            for sql in _CANDLE_VIEWS.values():
+                self._conn.execute(sql.format(intervals=spec))
+
+    def reader(self) -> Reader:
+        return self._reader
+
+    def connect(self) -> _WriteConnection:
+        with self._lock:
+            return _WriteConnection(self._conn.cursor())
+
+    def write_rows(self, conn: _WriteConnection, kind: str, rows: Iterable[dict]) -> int:
+        """在写连接上导入一类批量写入（不提交），返回实际插入/替换的行数。"""
+        derived = _DERIVED.get(kind)
+        if derived is not None:
+            rows = list(rows)
+        changes = self._insert(conn, kind, self._params[kind](rows))
+        if derived is not None:
+            self._insert(conn, derived, self._params[derived](rows))
+        return changes
+
+    def _insert(self, conn: _WriteConnection, kind: str, params: Iterable[tuple]) -> int:
+        table, columns, verb = _WRITES[kind]
+        names = [c for c, _ in columns]
+        compare = _UPSERTS.get(kind)
+        if verb == "OR REPLACE" or compare:
+            # 同一条语句内主键重复时 DuckDB 只保留第一条（upsert 则报错），这里先按主键（首列）保留最后一条
+            params = {p[0]: p for p in params}.values()
+        n = 0
+        with open(self._stage_path, "w", encoding="utf-8") as f:
+            for p in params:
+                f.write(json.dumps(dict(zip(names, p)), ensure_ascii=False))
+                f.write("\n")
+                n += 1
+        if not n:
+            return 0
+        spec = ", ".join(f"'{c}': '{t}'" for c, t in columns)
+        source = self._stage_path.replace("'", "''")
+        sql = (
+            f"INSERT {verb} INTO {table} ({', '.join(names)}) "
+            f"SELECT {', '.join(names)} "
+            f"FROM read_json('{source}', format='newline_delimited', columns={{{spec}}})"
+        )
+        if compare:
+            updates = ", ".join(f"{c}=excluded.{c}" for c in names[1:])
+            changed = " OR ".join(f"{table}.{c} IS DISTINCT FROM excluded.{c}" for c in compare)
+            sql += f" ON CONFLICT ({names[0]}) DO UPDATE SET {updates} WHERE {changed}"
+        return conn.execute(sql).fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+        if os.path.exists(self._stage_path):
+            os.remove(self._stage_path)
@@ -7,14 +7,14 @@ import os
 from datetime import datetime, timezone
 
 from config import DATA_DIR
-from src.database import get_connection, init_db
+from src.database import get_reader, init_db, iter_snapshots, iter_trades, partition_tables
 
 
 def export_events_csv(output_path: str | None = None) -> str:
     init_db()
     path = output_path or os.path.join(DATA_DIR, "events.csv")
     os.makedirs(os.path.dirname(path), exist_ok=True)
-    conn = get_connection()
+    conn = get_reader()
     rows = conn.execute("SELECT * FROM events ORDER BY id").fetchall()
     if not rows:
         print("[Export] 无事件数据")
@@ -28,7 +28,7 @@ def export_markets_csv(output_path: str | None = None) -> str:
     init_db()
     path = output_path or os.path.join(DATA_DIR, "markets.csv")
     os.makedirs(os.path.dirname(path), exist_ok=True)
-    conn = get_connection()
+    conn = get_reader()
     rows = conn.execute("SELECT * FROM markets ORDER BY event_id").fetchall()
     if not rows:
         print("[Export] 无市场数据")
@@ -42,13 +42,15 @@ def export_orderbooks_csv(output_path: str | None = None) -> str:
     init_db()
     path = output_path or os.path.join(DATA_DIR, "orderbooks.csv")
     os.makedirs(os.path.dirname(path), exist_ok=True)
-    conn = get_connection()
-    rows = conn.execute(
-        "SELECT id, token_id, condition_id, snapshot_time, "
-        "best_bid, best_ask, spread, mid_price, last_trade_price, "
-        "tick_size, total_bid_depth, total_ask_depth "
-        "FROM orderbook_snapshots ORDER BY snapshot_time"
-    ).fetchall()
+    conn = get_reader()
+    rows = [
+        r for table in partition_tables(conn, "orderbook_snapshots")
+        for r in conn.execute(
+            "SELECT id, token_id, condition_id, snapshot_time, "
+            "best_bid, best_ask, spread, mid_price, last_trade_price, "
+            f"tick_size, total_bid_depth, total_ask_depth FROM {table} ORDER BY snapshot_time"
+        )
+    ]
     if not rows:
         print("[Export] 无订单簿数据")
         return path
@@ -62,23 +64,10 @@ def export_orderbooks_full_json(output_path: str | None = None) -> str:
     init_db()
     path = output_path or os.path.join(DATA_DIR, "orderbooks_full.json")
     os.makedirs(os.path.dirname(path), exist_ok=True)
-    conn = get_connection()
-    rows = conn.execute(
-        "SELECT * FROM orderbook_snapshots ORDER BY snapshot_time"
-    ).fetchall()
-    if not rows:
+    data = list(iter_snapshots(order_by="snapshot_time"))
+    if not data:
         print("[Export] 无订单簿数据")
         return path
-    data = []
-    for r in rows:
-        d = dict(r)
-        try:
-            d["bids"] = json.loads(d.pop("bids_json", "[]"))
-            d["asks"] = json.loads(d.pop("asks_json", "[]"))
-        except (json.JSONDecodeError, TypeError):
-            d["bids"] = []
-            d["asks"] = []
-        data.append(d)
     with open(path, "w", encoding="utf-8") as f:
         json.dump(data, f, ensure_ascii=False, indent=2)
     print(f"[Export] 订单簿(完整) → {path} ({len(data)} 条)")
@@ -89,14 +78,12 @@ def export_trades_csv(output_path: str | None = None) -> str:
     init_db()
     path = output_path or os.path.join(DATA_DIR, "trades.csv")
     os.makedirs(os.path.dirname(path), exist_ok=True)
-    conn = get_connection()
-    rows = conn.execute("SELECT * FROM trades ORDER BY trade_timestamp").fetchall()
+    rows = list(iter_trades())
     if not rows:
         print("[Export] 无交易数据")
         return path
     dicts = []
-    for r in rows:
-        d = dict(r)
+    for d in rows:
         d.pop("server_received_ms", None)
         ts_ms = d.get("timestamp_ms")
         if ts_ms is not None:
@@ -116,7 +103,7 @@ def export_results_csv(output_path: str | None = None) -> str:
     init_db()
     path = output_path or os.path.join(DATA_DIR, "results.csv")
     os.makedirs(os.path.dirname(path), exist_ok=True)
-    conn = get_connection()
+    conn = get_reader()
     rows = conn.execute("SELECT * FROM game_results ORDER BY event_id").fetchall()
     if not rows:
         print("[Export] 无比赛结果数据")
@@ -126,12 +113,33 @@ def export_results_csv(output_path: str | None = None) -> str:
     return path
 
 
+def export_candles_csv(output_dir: str | None = None) -> list[str]:
+    """导出成交价 / 中间价 K 线（trade_candles.csv / mid_candles.csv）。"""
+    init_db()
+    out_dir = output_dir or DATA_DIR
+    os.makedirs(out_dir, exist_ok=True)
+    conn = get_reader()
+    paths = []
+    for table, order in (("trade_candles", "condition_id, outcome, interval, bucket"),
+                         ("mid_candles", "token_id, interval, bucket")):
+        path = os.path.join(out_dir, f"{table}.csv")
+        rows = [dict(r) for r in conn.execute(f"SELECT * FROM {table} ORDER BY {order}")]
+        if not rows:
+            print(f"[Export] 无 {table} 数据")
+            continue
+        _write_csv(path, rows)
+        print(f"[Export] K 线 → {path} ({len(rows)} 条)")
+        paths.append(path)
+    return paths
+
+
 def export_all(fmt: str = "csv"):
     """导出所有数据表。"""
     export_events_csv()
     export_markets_csv()
     export_trades_csv()
     export_results_csv()
+    export_candles_csv()
     if fmt == "json":
         export_orderbooks_full_json()
     else:
@@ -0,0 +1,216 @@
+"""HTTP 响应磁盘缓存 — 按 URL+参数缓存 Gamma 元数据，支持 ETag/Last-Modified 条件重验证
+
+  - 按端点类别设置 TTL（HTTP_CACHE_TTLS，按路径前缀匹配）；
+    全部为已关闭事件的 /events 页视为历史数据，使用 HTTP_CACHE_CLOSED_TTL
+  - 过期条目保留验证器，下次请求带 If-None-Match / If-Modified-Since，304 时直接复用
+  - 总大小超过 HTTP_CACHE_MAX_BYTES 时按最近访问时间做 LRU 淘汰
+  - 存储为独立 SQLite 文件（body 经 zlib 压缩），与业务库互不影响
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from dataclasses import dataclass
+from typing import Any
+
+from config import (
+    GAMMA_API_BASE,
+    HTTP_CACHE_ENABLED,
+    HTTP_CACHE_PATH,
+    HTTP_CACHE_MAX_BYTES,
+    HTTP_CACHE_TTLS,
+    HTTP_CACHE_CLOSED_TTL,
+)
+from src.replay import canonical_query
+
+
+@dataclass
+class CacheEntry:
+    key: str
+    body: str
+    etag: str
+    last_modified: str
+    expires_at: float
+
+    @property
+    def fresh(self) -> bool:
+        return time.time() < self.expires_at
+
+    def data(self) -> Any:
+        return json.loads(self.body, strict=False)
+
+    def validators(self) -> dict[str, str]:
+        """条件请求头。"""
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
+class HttpCache:
+    """线程安全的磁盘响应缓存（SQLite + LRU）。"""
+
+    def __init__(self, path: str = HTTP_CACHE_PATH, max_bytes: int = HTTP_CACHE_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.stats = {"hits": 0, "misses": 0, "revalidated": 0, "stores": 0, "evictions": 0}
+        self._conn: sqlite3.Connection | None = None
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+
+    def _get_conn(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS http_cache (
+                    key           TEXT PRIMARY KEY,
+                    url           TEXT,
+                    body          BLOB,
+                    etag          TEXT,
+                    last_modified TEXT,
+                    stored_at     REAL,
+                    expires_at    REAL,
+                    last_access   REAL,
+                    size          INTEGER
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_http_cache_access ON http_cache(last_access)")
+            self._total_bytes = conn.execute(
+                "SELECT COALESCE(SUM(size), 0) FROM http_cache"
+            ).fetchone()[0]
+            self._conn = conn
+        return self._conn
+
+    def lookup(self, key: str) -> CacheEntry | None:
+        """查找条目（含过期条目，供条件重验证）。新鲜命中计入 hits，其余计入 misses。"""
+        with self._lock:
+            conn = self._get_conn()
+            row = conn.execute(
+                "SELECT body, etag, last_modified, expires_at FROM http_cache WHERE key=?", (key,)
+            ).fetchone()
+            if row is None:
+                self.stats["misses"] += 1
+                return None
+            entry = CacheEntry(key, zlib.decompress(row[0]).decode("utf-8"),
+                               row[1] or "", row[2] or "", row[3])
+            if entry.fresh:
+                self.stats["hits"] += 1
+                conn.execute("UPDATE http_cache SET last_access=? WHERE key=?", (time.time(), key))
+            else:
+                self.stats["misses"] += 1
+            return entry
+
+    def store(self, key: str, url: str, body: str, headers: Any, ttl: float):
+        blob = zlib.compress(body.encode("utf-8"))
+        now = time.time()
+        with self._lock:
+            conn = self._get_conn()
+            old = conn.execute("SELECT size FROM http_cache WHERE key=?", (key,)).fetchone()
+            conn.execute(
+                "INSERT OR REPLACE INTO http_cache "
+                "(key, url, body, etag, last_modified, stored_at, expires_at, last_access, size) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, url, blob, headers.get("ETag", ""), headers.get("Last-Modified", ""),
+                 now, now + ttl, now, len(blob)),
+            )
+            self._total_bytes += len(blob) - (old[0] if old else 0)
+            self.stats["stores"] += 1
+            if self._total_bytes > self.max_bytes:
+                self._evict(conn)
+
+    def revalidated(self, entry: CacheEntry, ttl: float):
+        """收到 304：延长条目有效期。"""
+        now = time.time()
+        entry.expires_at = now + ttl
+        with self._lock:
+            self._get_conn().execute(
+                "UPDATE http_cache SET expires_at=?, last_access=? WHERE key=?",
+                (entry.expires_at, now, entry.key),
+            )
+            self.stats["revalidated"] += 1
+
+    def _evict(self, conn: sqlite3.Connection):
+        """LRU 淘汰，直到总大小回落到上限的 90%。"""
+        target = self.max_bytes * 0.9
+        rows = conn.execute("SELECT key, size FROM http_cache ORDER BY last_access").fetchall()
+        doomed = []
+        for key, size in rows:
+            if self._total_bytes <= target:
+                break
+            doomed.append((key,))
+            self._total_bytes -= size
+        conn.executemany("DELETE FROM http_cache WHERE key=?", doomed)
+        self.stats["evictions"] += len(doomed)
+
+    def clear(self):
+        with self._lock:
+            self._get_conn().execute("DELETE FROM http_cache")
+            self._total_bytes = 0
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+def cache_key(url: str, params: dict[str, Any] | None) -> str:
+    query = canonical_query(params)
+    return hashlib.sha1(f"GET {url}?{query}".encode("utf-8")).hexdigest()
+
+
+def ttl_for(url: str, data: Any = None) -> float | None:
+    """端点类别对应的 TTL（秒）；None 表示该 URL 不缓存。"""
+    if not url.startswith(GAMMA_API_BASE):
+        return None
+    path = url[len(GAMMA_API_BASE):]
+    best = None
+    for prefix, ttl in HTTP_CACHE_TTLS.items():
+        if path.startswith(prefix) and (best is None or len(prefix) > len(best)):
+            best = prefix
+    if best is None:
+        return None
+    if best == "/events" and isinstance(data, list) and data \
+            and all(isinstance(e, dict) and e.get("closed") for e in data):
+        return HTTP_CACHE_CLOSED_TTL
+    return HTTP_CACHE_TTLS[best]
+
+
+_cache: HttpCache | None = None
+_enabled = HTTP_CACHE_ENABLED
+
+
+def get_cache() -> HttpCache | None:
+    """返回全局缓存实例；被禁用时返回 None。"""
+    global _cache
+    if not _enabled:
+        return None
+    if _cache is None:
+        _cache = HttpCache()
+    return _cache
+
+
+def set_enabled(enabled: bool):
+    global _enabled
+    _enabled = enabled
+
+
+def cache_stats() -> dict[str, int]:
+    return dict(_cache.stats) if _cache is not None else {}
+
+
+def close_cache():
+    global _cache
+    if _cache is not None:
+        _cache.close()
+        _cache = None
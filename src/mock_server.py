@@ -0,0 +1,477 @@
+"""本地模拟 Polymarket API — 离线回放录制存档，或按规模合成 events/markets/books/trades
+
+用法:
+    python -m src.mock_server                                # 合成数据（默认规模）
+    python -m src.mock_server --sports 20 --events-per-sport 5000 --latency-ms 80
+    python -m src.mock_server --replay data/recording.jsonl.gz
+
+    # 另一个终端，让采集工具指向模拟服务器
+    POLYMARKET_MOCK_URL=http://127.0.0.1:8780 python main.py --no-cache discover
+
+路由:
+    /gamma/sports, /gamma/events, /gamma/markets   Gamma API
+    /clob/book, /clob/books                        CLOB API
+    /data/trades                                   Data API
+    /ws/market                                     CLOB market channel WebSocket
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import hashlib
+import json
+import random
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any
+
+from aiohttp import web, WSMsgType
+
+from config import MOCK_SERVER_PORT, TRADES_MAX_OFFSET
+from src.replay import load_archive, canonical_query, body_hash, request_key
+
+_SPORT_NAMES = ["nba", "nfl", "mlb", "nhl", "epl", "wnba", "ncaab", "ufc", "atp", "lal",
+                "bun", "sea", "mls", "cfb", "wta", "ipl", "kbo", "f1", "csgo", "lol"]
+_MARKET_TYPES = ["moneyline", "spreads", "totals"]
+_TOKEN_SLOTS = 10 ** 18   # token_id 低位编码 (事件序号, 市场序号, outcome)，要求每个事件 ≤ 32 个市场
+_NOT_FOUND = object()
+
+
+def _h(*parts: Any) -> str:
+    return hashlib.sha256(":".join(str(p) for p in parts).encode()).hexdigest()
+
+
+class SyntheticMarketData:
+    """确定性合成数据：同样的参数与 seed 每次生成完全相同的 events/markets/trades。
+
+    事件序号 k ∈ [0, N)，属于第 k % n_sports 种运动；k 越小越早，
+    前 closed_ratio × N 个事件已关闭。所有数据按需计算，不预先展开。
+    """
+
+    def __init__(
+        self,
+        n_sports: int = 10,
+        events_per_sport: int = 200,
+        markets_per_event: int = 3,
+        trades_per_market: int = 200,
+        closed_ratio: float = 0.8,
+        book_depth: int = 15,
+        seed: int = 7,
+    ):
+        self.n_sports = n_sports
+        self.n_events = n_sports * events_per_sport
+        self.markets_per_event = markets_per_event
+        self.trades_per_market = trades_per_market
+        self.n_closed = int(self.n_events * closed_ratio)
+        self.book_depth = book_depth
+        self.seed = seed
+        self.sport_names = [_SPORT_NAMES[i] if i < len(_SPORT_NAMES) else f"sport{i}"
+                            for i in range(n_sports)]
+        self.base_time = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+    # ── 编码 ─────────────────────────────────────────────
+
+    def sport_tag(self, s: int) -> int:
+        return 1000 + s
+
+    def event_id(self, k: int) -> int:
+        return 100000 + k
+
+    def market_id(self, k: int, m: int) -> str:
+        return str(500000 + k * self.markets_per_event + m)
+
+    def condition_id(self, k: int, m: int) -> str:
+        return "0x" + _h(self.seed, "cond", k, m)[:48] + f"{k:08x}{m:08x}"
+
+    def token_id(self, k: int, m: int, o: int) -> str:
+        prefix = int(_h(self.seed, "tok", k, m, o)[:48], 16) % 10 ** 58 + 10 ** 58
+        return str(prefix * _TOKEN_SLOTS + (k * 64 + m * 2 + o))
+
+    def decode_condition(self, cond: str) -> tuple[int, int] | None:
+        if len(cond) != 66 or not cond.startswith("0x"):
+            return None
+        try:
+            k, m = int(cond[50:58], 16), int(cond[58:66], 16)
+        except ValueError:
+            return None
+        return (k, m) if k < self.n_events and self.condition_id(k, m) == cond else None
+
+    def decode_token(self, token: str) -> tuple[int, int, int] | None:
+        try:
+            slot = int(token) % _TOKEN_SLOTS
+        except ValueError:
+            return None
+        k, rest = divmod(slot, 64)
+        m, o = divmod(rest, 2)
+        if k < self.n_events and m < self.markets_per_event and self.token_id(k, m, o) == token:
+            return k, m, o
+        return None
+
+    # ── Gamma ────────────────────────────────────────────
+
+    def sports(self) -> list[dict]:
+        return [{
+            "sport": name,
+            "tags": f"1,{self.sport_tag(s)},100639",
+            "series": str(20000 + s),
+            "image": "",
+            "resolution": "",
+        } for s, name in enumerate(self.sport_names)]
+
+    def event_indices(self, tag_id: int | None, closed: bool | None) -> range:
+        """满足 tag/closed 过滤的事件序号（按 id 升序，均为等差数列）。"""
+        if tag_id in (None, 1, 100639):
+            lo, hi = (0, self.n_events) if closed is None else \
+                ((0, self.n_closed) if closed else (self.n_closed, self.n_events))
+            return range(lo, hi)
+        s = tag_id - 1000
+        if not 0 <= s < self.n_sports:
+            return range(0)
+        n = self.n_sports
+        first_open = s + max(0, -(-(self.n_closed - s) // n)) * n
+        if closed is None:
+            return range(s, self.n_events, n)
+        return range(s, first_open, n) if closed else range(first_open, self.n_events, n)
+
+    def event(self, k: int) -> dict:
+        rng = random.Random(f"{self.seed}:ev:{k}")
+        s = k % self.n_sports
+        sport = self.sport_names[s]
+        home, away = f"team{rng.randint(1, 30)}", f"team{rng.randint(31, 60)}"
+        start = self.base_time + timedelta(hours=2 * (k - self.n_closed))
+        closed = k < self.n_closed
+        slug = f"{sport}-{away}-{home}-{start:%Y-%m-%d}-{k}"
+        return {
+            "id": str(self.event_id(k)),
+            "slug": slug,
+            "title": f"{away.title()} vs. {home.title()}",
+            "startDate": start.isoformat(),
+            "endDate": (start + timedelta(hours=3)).isoformat(),
+            "gameId": str(900000 + k),
+            "gameStatus": "Final" if closed else "Scheduled",
+            "score": f"{rng.randint(80, 130)}-{rng.randint(80, 130)}" if closed else "",
+            "volume": round(rng.uniform(1e3, 5e6), 2),
+            "active": True,
+            "closed": closed,
+            "negRisk": False,
+            "seriesSlug": sport,
+            "tags": [{"id": "1", "label": "Sports"},
+                     {"id": str(self.sport_tag(s)), "label": sport.upper()},
+                     {"id": "100639", "label": "Games"}],
+            "markets": [self.market(k, m, slug, home, away, closed)
+                        for m in range(self.markets_per_event)],
+        }
+
+    def market(self, k: int, m: int, slug: str, home: str, away: str, closed: bool) -> dict:
+        rng = random.Random(f"{self.seed}:mk:{k}:{m}")
+        mtype = _MARKET_TYPES[m % len(_MARKET_TYPES)]
+        if closed:
+            prices = ["1", "0"] if rng.random() < 0.5 else ["0", "1"]
+        else:
+            p = round(rng.uniform(0.05, 0.95), 3)
+            prices = [str(p), str(round(1 - p, 3))]
+        return {
+            "id": self.market_id(k, m),
+            "conditionId": self.condition_id(k, m),
+            "slug": f"{slug}-{mtype}-{m}",
+            "question": f"{away} vs. {home}: {mtype}",
+            "sportsMarketType": mtype,
+            "line": None if mtype == "moneyline" else round(rng.uniform(-10, 230), 1),
+            "outcomes": json.dumps([away, home]),
+            "outcomePrices": json.dumps(prices),
+            "clobTokenIds": json.dumps([self.token_id(k, m, 0), self.token_id(k, m, 1)]),
+            "teamAID": str(rng.randint(1, 500)),
+            "teamBID": str(rng.randint(1, 500)),
+            "volumeNum": round(rng.uniform(100, 1e6), 2),
+            "closed": closed,
+            "acceptingOrders": not closed,
+            "orderPriceMinTickSize": 0.01,
+        }
+
+    def events_page(self, pairs: list[tuple[str, str]]) -> list[dict]:
+        query = dict(pairs)
+        ids = [v for k, v in pairs if k == "id"]
+        if ids:   # 按 id 批量查询，忽略其余过滤
+            ks = sorted({int(v) - 100000 for v in ids if v.isdigit()})
+            return [self.event(k) for k in ks if 0 <= k < self.n_events]
+        tag = int(query["tag_id"]) if query.get("tag_id", "").isdigit() else None
+        closed = {"true": True, "false": False}.get(query.get("closed", "").lower())
+        offset = int(query.get("offset", 0) or 0)
+        limit = min(int(query.get("limit", 100) or 100), 500)
+        indices = self.event_indices(tag, closed)
+        if query.get("ascending", "").lower() == "false":
+            indices = indices[::-1]
+        return [self.event(k) for k in indices[offset:offset + limit]]
+
+    def markets_page(self, pairs: list[tuple[str, str]]) -> list[dict]:
+        ids = [v for k, v in pairs if k == "id"]
+        conds = [v for k, v in pairs if k == "condition_ids"]
+        found = []
+        for mid in ids:
+            if mid.isdigit():
+                k, m = divmod(int(mid) - 500000, self.markets_per_event)
+                if 0 <= k < self.n_events:
+                    found.append(self.event(k)["markets"][m])
+        for cond in conds:
+            decoded = self.decode_condition(cond)
+            if decoded:
+                found.append(self.event(decoded[0])["markets"][decoded[1]])
+        return found
+
+    # ── CLOB ─────────────────────────────────────────────
+
+    def book(self, token: str, period: float = 5.0) -> dict:
+        """token 的订单簿；每 period 秒变化一次，便于模拟连续快照。"""
+        decoded = self.decode_token(token)
+        cond = self.condition_id(*decoded[:2]) if decoded else ""
+        rng = random.Random(f"{self.seed}:book:{token}:{int(time.time() / period)}")
+        mid = 0.05 + (int(_h(token)[:6], 16) % 900) / 1000
+        tick = 0.01
+        bids, asks = [], []
+        for i in range(self.book_depth):
+            bp = round(mid - tick * (i + 1), 2)
+            ap = round(mid + tick * (i + 1), 2)
+            if bp > 0:
+                bids.append({"price": f"{bp:.2f}", "size": f"{rng.uniform(10, 5000):.2f}"})
+            if ap < 1:
+                asks.append({"price": f"{ap:.2f}", "size": f"{rng.uniform(10, 5000):.2f}"})
+        return {
+            "market": cond,
+            "asset_id": token,
+            "timestamp": str(int(time.time() * 1000)),
+            "hash": _h(token, time.time())[:40],
+            "bids": bids,
+            "asks": asks,
+            "tick_size": "0.01",
+            "last_trade_price": f"{mid:.3f}",
+        }
+
+    # ── Data API ─────────────────────────────────────────
+
+    def trades_page(self, query: dict[str, str]) -> list[dict] | None:
+        """返回 None 表示 offset 越界（真实 API 返回 400）。"""
+        decoded = self.decode_condition(query.get("market", ""))
+        offset = int(query.get("offset", 0) or 0)
+        limit = int(query.get("limit", 100) or 100)
+        if offset > TRADES_MAX_OFFSET:
+            return None
+        if not decoded:
+            return []
+        k, m = decoded
+        side_filter = query.get("side", "").upper()
+        rng = random.Random(f"{self.seed}:ntr:{k}:{m}")
+        n = rng.randint(0, 2 * self.trades_per_market)
+        ev = self.event(k)
+        start = int(datetime.fromisoformat(ev["startDate"]).timestamp())
+        outcomes = json.loads(ev["markets"][m]["outcomes"])
+        out = []
+        for i in range(n - 1, -1, -1):   # 新 → 旧，与真实 API 一致
+            tr = random.Random(f"{self.seed}:tr:{k}:{m}:{i}")
+            side = "BUY" if tr.random() < 0.55 else "SELL"
+            if side_filter and side != side_filter:
+                continue
+            out.append({
+                "proxyWallet": "0x" + _h("w", tr.randint(1, 5000))[:40],
+                "side": side,
+                "conditionId": self.condition_id(k, m),
+                "size": round(tr.uniform(1, 2000), 2),
+                "price": round(tr.uniform(0.01, 0.99), 3),
+                "timestamp": start - 86400 + i * 30,
+                "outcome": outcomes[tr.randint(0, 1)],
+                "eventSlug": ev["slug"],
+                "transactionHash": "0x" + _h(self.seed, "tx", k, m, i),
+            })
+        return out[offset:offset + limit]
+
+
+class MockPolymarketServer:
+    """aiohttp 模拟服务器：回放存档或合成数据，支持注入延迟、429 与 5xx。"""
+
+    def __init__(
+        self,
+        synth: SyntheticMarketData | None = None,
+        archive: str | None = None,
+        latency_ms: float = 0.0,
+        jitter_ms: float = 0.0,
+        throttle_rate: float = 0.0,
+        error_rate: float = 0.0,
+        ws_interval: float = 0.5,
+    ):
+        self.synth = synth or SyntheticMarketData()
+        self.replay = load_archive(archive) if archive else None
+        self.latency = latency_ms / 1000
+        self.jitter = jitter_ms / 1000
+        self.throttle_rate = throttle_rate
+        self.error_rate = error_rate
+        self.ws_interval = ws_interval
+        self.stats = {"requests": 0, "replay_hits": 0, "replay_misses": 0,
+                      "throttled": 0, "errors": 0, "ws_messages": 0}
+
+    def build_app(self) -> web.Application:
+        app = web.Application(middlewares=[self._inject_faults])
+        app.router.add_get("/ws/market", self._ws_market)
+        app.router.add_route("*", "/{api}/{path:.*}", self._dispatch)
+        return app
+
+    @web.middleware
+    async def _inject_faults(self, request: web.Request, handler):
+        if request.path.startswith("/ws/"):
+            return await handler(request)
+        self.stats["requests"] += 1
+        delay = self.latency + random.uniform(0, self.jitter)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        roll = random.random()
+        if roll < self.throttle_rate:
+            self.stats["throttled"] += 1
+            return web.Response(status=429, headers={"Retry-After": "1"})
+        if roll < self.throttle_rate + self.error_rate:
+            self.stats["errors"] += 1
+            return web.Response(status=503)
+        return await handler(request)
+
+    async def _dispatch(self, request: web.Request) -> web.Response:
+        api, path = request.match_info["api"], "/" + request.match_info["path"]
+        body = await request.json() if request.method == "POST" and request.can_read_body else None
+
+        if self.replay is not None:
+            key = request_key(request.method, api, path,
+                              canonical_query(list(request.query.items())), body_hash(body))
+            hit = self.replay.get(key)
+            if hit is None:
+                self.stats["replay_misses"] += 1
+                return web.Response(text="[]", content_type="application/json",
+                                    headers={"X-Mock-Miss": "1"})
+            self.stats["replay_hits"] += 1
+            status, text = hit
+            return web.Response(status=status, text=text, content_type="application/json")
+
+        data = self._synthesize(request.method, api, path, request.query, body)
+        if data is None:
+            return web.json_response({"error": "bad request"}, status=400)
+        if data is _NOT_FOUND:
+            return web.json_response({"error": "not found"}, status=404)
+        return web.json_response(data)
+
+    def _synthesize(self, method: str, api: str, path: str, query, body: Any) -> Any:
+        s = self.synth
+        q = {k: v for k, v in query.items()}
+        if api == "gamma" and path == "/sports":
+            return s.sports()
+        if api == "gamma" and path == "/events":
+            return s.events_page(list(query.items()))
+        if api == "gamma" and path == "/markets":
+            return s.markets_page(list(query.items()))
+        if api == "clob" and path == "/book":
+            token = q.get("token_id", "")
+            return s.book(token) if s.decode_token(token) else _NOT_FOUND
+        if api == "clob" and path == "/books" and method == "POST":
+            return [s.book(item.get("token_id", "")) for item in (body or [])
+                    if s.decode_token(item.get("token_id", ""))]
+        if api == "data" and path == "/trades":
+            return s.trades_page(q)
+        return _NOT_FOUND
+
+    async def _ws_market(self, request: web.Request) -> web.WebSocketResponse:
+        """CLOB market channel 替身：订阅后先推送完整 book，之后定期推送 book / price_change。"""
+        ws = web.WebSocketResponse(heartbeat=30)
+        await ws.prepare(request)
+        assets: list[str] = []
+
+        async def send(msg: dict):
+            await ws.send_str(json.dumps(msg))
+            self.stats["ws_messages"] += 1
+
+        async def pump():
+            while not ws.closed:
+                await asyncio.sleep(self.ws_interval)
+                if not assets:
+                    continue
+                token = random.choice(assets)
+                book = self.synth.book(token, period=self.ws_interval)
+                if random.random() < 0.3:
+                    await send({"event_type": "book", **book})
+                else:
+                    level = random.choice(book["bids"] or book["asks"] or [{"price": "0.5", "size": "0"}])
+                    await send({
+                        "event_type": "price_change",
+                        "market": book["market"],
+                        "timestamp": book["timestamp"],
+                        "price_changes": [{"asset_id": token, "side": "BUY", **level}],
+                    })
+
+        pump_task = asyncio.create_task(pump())
+        try:
+            async for msg in ws:
+                if msg.type != WSMsgType.TEXT:
+                    continue
+                try:
+                    data = json.loads(msg.data)
+                except json.JSONDecodeError:
+                    continue
+                ids = [str(t) for t in data.get("assets_ids", [])]
+                if data.get("operation") == "unsubscribe":
+                    assets[:] = [a for a in assets if a not in set(ids)]
+                    continue
+                for token in ids:
+                    if token not in assets:
+                        assets.append(token)
+                        await send({"event_type": "book", **self.synth.book(token)})
+        finally:
+            pump_task.cancel()
+        return ws
+
+
+def main():
+    parser = argparse.ArgumentParser(description="本地模拟 Polymarket API（回放 / 合成）")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=MOCK_SERVER_PORT)
+    parser.add_argument("--replay", type=str, default=None, help="回放 --record 录制的存档")
+    parser.add_argument("--sports", type=int, default=10, help="合成运动数")
+    parser.add_argument("--events-per-sport", type=int, default=200)
+    parser.add_argument("--markets-per-event", type=int, default=3)
+    parser.add_argument("--trades-per-market", type=int, default=200, help="每个市场的平均成交数")
+    parser.add_argument("--closed-ratio", type=float, default=0.8, help="已关闭事件比例")
+    parser.add_argument("--book-depth", type=int, default=15)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="每个请求的固定延迟")
+    parser.add_argument("--jitter-ms", type=float, default=0.0, help="随机附加延迟上限")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="返回 429 的概率")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="返回 503 的概率")
+    parser.add_argument("--ws-interval", type=float, default=0.5, help="WebSocket 推送间隔（秒）")
+    args = parser.parse_args()
+    if not 1 <= args.markets_per_event <= 32:
+        parser.error("--markets-per-event 需在 1..32 之间")
+
+    synth = SyntheticMarketData(
+        n_sports=args.sports,
+        events_per_sport=args.events_per_sport,
+        markets_per_event=args.markets_per_event,
+        trades_per_market=args.trades_per_market,
+        closed_ratio=args.closed_ratio,
+        book_depth=args.book_depth,
+        seed=args.seed,
+    )
+    server = MockPolymarketServer(
+        synth=synth,
+        archive=args.replay,
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        throttle_rate=args.throttle_rate,
+        error_rate=args.error_rate,
+        ws_interval=args.ws_interval,
+    )
+    if server.replay is not None:
+        print(f"[Mock] 回放存档 {args.replay}: {len(server.replay)} 条响应")
+    else:
+        print(f"[Mock] 合成数据: {synth.n_sports} 种运动, {synth.n_events} 个事件, "
+              f"{synth.n_events * synth.markets_per_event} 个市场")
+    print(f"[Mock] export POLYMARKET_MOCK_URL=http://{args.host}:{args.port}")
+    try:
+        web.run_app(server.build_app(), host=args.host, port=args.port, print=None)
+    finally:
+        print(f"[Mock] 统计: {server.stats}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+"""订单簿档位二进制编码 — 定点价格 tick + 定点 size 打包成 BLOB，替代 bids_json/asks_json
+
+布局（小端）:
+  header  <BBBBHH   version, flags, price_decimals, size_decimals, n_bids, n_asks
+  body    价格整数 × (n_bids + n_asks)，随后 size 整数 × (n_bids + n_asks)，bids 在前
+  flags   bit0-1 body 压缩方式 (0 无 / 1 zlib / 2 zstd)
+          bit2   价格用 uint32（默认 uint16）
+          bit3   size 用 uint64（默认 uint32）
+
+价格/size 按该快照内最大小数位数转为整数（price × 10^price_decimals），解码得到数值相等的
+规范化字符串（去掉多余的尾随 0，如 "0.50" → "0.5"）。header 不压缩，不解压即可读出档位数。
+"""
+from __future__ import annotations
+
+import json
+import struct
+import sys
+import zlib
+from array import array
+from typing import Any
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+VERSION = 1
+_HEADER = struct.Struct("<BBBBHH")
+_COMPRESSION = {"none": 0, "zlib": 1, "zstd": 2}
+_WIDE_PRICE = 0x04
+_WIDE_SIZE = 0x08
+MAX_DECIMALS = 8
+_SWAP = sys.byteorder == "big"
+
+
+def zstd_available() -> bool:
+    return zstandard is not None
+
+
+def _decimals(s: str) -> int:
+    dot = s.find(".")
+    if dot < 0:
+        if "e" in s or "E" in s:
+            raise ValueError(f"不支持的数值格式: {s}")
+        return 0
+    d = len(s.rstrip("0")) - dot - 1
+    if d > MAX_DECIMALS or "e" in s or "E" in s:
+        raise ValueError(f"小数位数超出定点编码范围: {s}")
+    return d
+
+
+def _fixed(values: list[str], decimals: int) -> list[int]:
+    scale = 10 ** decimals
+    return [int(round(float(v) * scale)) for v in values]
+
+
+def _fmt(n: int, decimals: int) -> str:
+    if decimals == 0:
+        return str(n)
+    s = str(n).rjust(decimals + 1, "0")
+    return (s[:-decimals] + "." + s[-decimals:]).rstrip("0").rstrip(".")
+
+
+def encode_levels(bids: list[dict], asks: list[dict], compression: str = "none") -> bytes:
+    """把 [{"price": "0.55", "size": "1500"}, ...] 编码为 BLOB。
+
+    价格或 size 为负、或小数位超过 MAX_DECIMALS 时抛 ValueError（调用方可退回 JSON）。
+    """
+    levels = bids + asks
+    prices = [str(lv["price"]) for lv in levels]
+    sizes = [str(lv["size"]) for lv in levels]
+    pd = max(map(_decimals, prices), default=0)
+    sd = max(map(_decimals, sizes), default=0)
+    p_int = _fixed(prices, pd)
+    s_int = _fixed(sizes, sd)
+    if (p_int and min(p_int) < 0) or (s_int and min(s_int) < 0):
+        raise ValueError("价格/size 不能为负")
+
+    flags = _COMPRESSION[compression]
+    p_arr = array("H")
+    if p_int and max(p_int) > 0xFFFF:
+        flags |= _WIDE_PRICE
+        p_arr = array("I")
+    s_arr = array("I")
+    if s_int and max(s_int) > 0xFFFFFFFF:
+        flags |= _WIDE_SIZE
+        s_arr = array("Q")
+    p_arr.extend(p_int)
+    s_arr.extend(s_int)
+    if _SWAP:
+        p_arr.byteswap()
+        s_arr.byteswap()
+
+    body = p_arr.tobytes() + s_arr.tobytes()
+    if compression == "zlib":
+        body = zlib.compress(body, 6)
+    elif compression == "zstd":
+        if zstandard is None:
+            raise ValueError("未安装 zstandard，无法使用 zstd 压缩")
+        body = zstandard.ZstdCompressor(level=3).compress(body)
+    return _HEADER.pack(VERSION, flags, pd, sd, len(bids), len(asks)) + body
+
+
+def _unpack(blob: bytes) -> tuple[array, array, int, int, int]:
+    version, flags, pd, sd, n_bids, n_asks = _HEADER.unpack_from(blob)
+    if version != VERSION:
+        raise ValueError(f"未知的订单簿编码版本: {version}")
+    body = blob[_HEADER.size:]
+    method = flags & 0x03
+    if method == 1:
+        body = zlib.decompress(body)
+    elif method == 2:
+        if zstandard is None:
+            raise ValueError("未安装 zstandard，无法解码 zstd 压缩的订单簿")
+        body = zstandard.ZstdDecompressor().decompress(body)
+
+    n = n_bids + n_asks
+    p_arr = array("I" if flags & _WIDE_PRICE else "H")
+    s_arr = array("Q" if flags & _WIDE_SIZE else "I")
+    split = n * p_arr.itemsize
+    p_arr.frombytes(body[:split])
+    s_arr.frombytes(body[split:split + n * s_arr.itemsize])
+    if _SWAP:
+        p_arr.byteswap()
+        s_arr.byteswap()
+    return p_arr, s_arr, pd, sd, n_bids
+
+
+def decode_levels(blob: bytes) -> tuple[list[dict], list[dict]]:
+    """BLOB → (bids, asks)，结构与 CLOB API 一致（价格/size 为字符串）。"""
+    p_arr, s_arr, pd, sd, n_bids = _unpack(blob)
+    levels = [{"price": _fmt(p, pd), "size": _fmt(s, sd)} for p, s in zip(p_arr, s_arr)]
+    return levels[:n_bids], levels[n_bids:]
+
+
+def decode_levels_float(blob: bytes) -> tuple[list[tuple[float, float]], list[tuple[float, float]]]:
+    """BLOB → (bids, asks) 的 (price, size) 浮点元组，供分析直接使用。"""
+    p_arr, s_arr, pd, sd, n_bids = _unpack(blob)
+    ps, ss = 10.0 ** -pd, 10.0 ** -sd
+    levels = [(p * ps, s * ss) for p, s in zip(p_arr, s_arr)]
+    return levels[:n_bids], levels[n_bids:]
+
+
+def level_counts(blob: bytes) -> tuple[int, int]:
+    """只读 header 的 (n_bids, n_asks)。"""
+    return _HEADER.unpack_from(blob)[4:6]
+
+
+def snapshot_levels(row: dict[str, Any]) -> tuple[list[dict], list[dict]]:
+    """从 orderbook_snapshots 行取出 (bids, asks)，兼容 book_blob 与 JSON 两种存储。"""
+    blob = row.get("book_blob")
+    if blob is not None:
+        return decode_levels(blob)
+    try:
+        return json.loads(row.get("bids_json") or "[]"), json.loads(row.get("asks_json") or "[]")
+    except (json.JSONDecodeError, TypeError):
+        return [], []
@@ -0,0 +1,129 @@
+"""订单簿增量存储 — 每个 token 定期写完整关键帧，其间只写相对关键帧变化的档位
+
+  - 增量行的 base_time 指向同一 token 的关键帧 snapshot_time（关键帧与旧数据 base_time 为 NULL）
+  - 增量档位沿用 bids/asks 的结构；size 为 "0" 表示该价位已撤销
+  - 增量相对关键帧而非上一条快照，任意快照最多两行即可还原，多进程写同一库也不会串链
+  - 超过 N 条 / M 秒、跨 UTC 日（进入新的日分区）、增量档位数超过完整档位的一定比例、
+    或还原结果与原始快照不一致时，写新关键帧 —— 增量与其关键帧总在同一个分区表内
+"""
+from __future__ import annotations
+
+import sqlite3
+from datetime import datetime
+from typing import Any
+
+from config import ORDERBOOK_KEYFRAME_EVERY, ORDERBOOK_KEYFRAME_SECONDS, ORDERBOOK_DELTA_MAX_RATIO
+from src.orderbook.codec import snapshot_levels
+
+REMOVED = "0"
+
+
+def _price_map(levels: list[dict]) -> dict[float, dict]:
+    return {float(lv["price"]): lv for lv in levels}
+
+
+def _descending(levels: list[dict]) -> bool:
+    return len(levels) >= 2 and float(levels[0]["price"]) > float(levels[-1]["price"])
+
+
+def diff_levels(base: list[dict], new: list[dict]) -> list[dict]:
+    """new 相对 base 的变化档位：新增/改量的档位原样保留，撤销的档位 size 记为 "0"。"""
+    base_map = _price_map(base)
+    new_map = _price_map(new)
+    out = [lv for p, lv in new_map.items()
+           if p not in base_map or float(base_map[p]["size"]) != float(lv["size"])]
+    out.extend({"price": lv["price"], "size": REMOVED} for p, lv in base_map.items() if p not in new_map)
+    return out
+
+
+def apply_levels(base: list[dict], diff: list[dict]) -> list[dict]:
+    """把变化档位应用到关键帧档位上，按关键帧的价格方向排序。"""
+    merged = _price_map(base)
+    for lv in diff:
+        p = float(lv["price"])
+        if float(lv["size"]) == 0:
+            merged.pop(p, None)
+        else:
+            merged[p] = lv
+    return [merged[p] for p in sorted(merged, reverse=_descending(base))]
+
+
+def _same(a: list[dict], b: list[dict]) -> bool:
+    return len(a) == len(b) and all(
+        float(x["price"]) == float(y["price"]) and float(x["size"]) == float(y["size"])
+        for x, y in zip(a, b)
+    )
+
+
+class DeltaEncoder:
+    """按 token 维护最近关键帧，决定每条快照写关键帧还是增量。仅在写线程中使用。"""
+
+    def __init__(
+        self,
+        keyframe_every: int = ORDERBOOK_KEYFRAME_EVERY,
+        keyframe_seconds: float = ORDERBOOK_KEYFRAME_SECONDS,
+        max_ratio: float = ORDERBOOK_DELTA_MAX_RATIO,
+    ):
+        self.keyframe_every = keyframe_every
+        self.keyframe_seconds = keyframe_seconds
+        self.max_ratio = max_ratio
+        # token_id → [关键帧 snapshot_time, 关键帧时间, bids, asks, 之后的增量条数]
+        self._keyframes: dict[str, list] = {}
+        self.stats = {"keyframes": 0, "deltas": 0}
+
+    def reset(self):
+        """写入回滚后调用：丢弃全部状态，各 token 下一条快照重新写关键帧。"""
+        self._keyframes.clear()
+
+    def encode(
+        self, token_id: str, snapshot_time: str, bids: list[dict], asks: list[dict],
+    ) -> tuple[str | None, list[dict], list[dict]]:
+        """返回 (base_time, 要存储的 bids, asks)；base_time 为 None 表示关键帧。"""
+        ts = datetime.fromisoformat(snapshot_time)
+        kf = self._keyframes.get(token_id)
+        if kf is not None and kf[4] + 1 < self.keyframe_every \
+                and kf[0][:10] == snapshot_time[:10] \
+                and (ts - kf[1]).total_seconds() < self.keyframe_seconds:
+            d_bids = diff_levels(kf[2], bids)
+            d_asks = diff_levels(kf[3], asks)
+            if len(d_bids) + len(d_asks) <= self.max_ratio * (len(bids) + len(asks)) \
+                    and _same(apply_levels(kf[2], d_bids), bids) \
+                    and _same(apply_levels(kf[3], d_asks), asks):
+                kf[4] += 1
+                self.stats["deltas"] += 1
+                return kf[0], d_bids, d_asks
+
+        self._keyframes[token_id] = [snapshot_time, ts, bids, asks, 0]
+        self.stats["keyframes"] += 1
+        return None, bids, asks
+
+
+def reconstruct_levels(
+    conn: sqlite3.Connection,
+    row: dict[str, Any],
+    keyframe_cache: dict[tuple[str, str], tuple[list, list]] | None = None,
+    table: str = "orderbook_snapshots",
+) -> tuple[list[dict], list[dict]] | None:
+    """还原快照行的完整 (bids, asks)；关键帧缺失时返回 None。
+
+    keyframe_cache 供批量读取时复用已解码的关键帧；table 为该行所在的表（分区表）。
+    """
+    bids, asks = snapshot_levels(row)
+    base_time = row.get("base_time")
+    if base_time is None:
+        return bids, asks
+
+    key = (row["token_id"], base_time)
+    base = keyframe_cache.get(key) if keyframe_cache is not None else None
+    if base is None:
+        kf = conn.execute(
+            f"SELECT bids_json, asks_json, book_blob FROM {table} "
+            "WHERE token_id=? AND snapshot_time=? AND base_time IS NULL LIMIT 1",
+            (row["token_id"], base_time),
+        ).fetchone()
+        if kf is None:
+            return None
+        base = snapshot_levels(dict(kf))
+        if keyframe_cache is not None:
+            keyframe_cache[key] = base
+    return apply_levels(base[0], bids), apply_levels(base[1], asks)
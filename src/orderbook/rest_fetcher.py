@@ -1,15 +1,16 @@
 """订单簿 REST 采集 — 通过 CLOB API 获取 order book 快照"""
 from __future__ import annotations
 
+import asyncio
 import json
 from datetime import datetime, timezone
 
 from tqdm import tqdm
 
-from config import BOOKS_BATCH_SIZE
-from src.api_client import clob_get, clob_post
+from config import BOOKS_BATCH_SIZE, HTTP_MAX_INFLIGHT_PER_HOST
+from src.api_client import clob_get, clob_post, clob_post_async, close_async_session
 from src.database import (
-    init_db, get_active_markets, save_orderbook_snapshots, get_snapshot_count,
+    init_db, get_active_tokens, get_snapshot_count, get_writer,
 )
 
 
@@ -31,89 +32,110 @@ def fetch_orderbooks_batch(token_ids: list[str]) -> list[dict]:
     if not data or not isinstance(data, list):
         return []
 
-    results = []
-    for book in data:
-        parsed = _parse_book(book)
-        if parsed:
-            results.append(parsed)
-    return results
+    return _parse_books(data)
 
 
-def fetch_all_active_orderbooks(sport_filter: str | None = None) -> int:
-    """获取所有活跃市场的 order book 快照并存入数据库。"""
-    init_db()
-    markets = get_active_markets()
-    if not markets:
-        print("[OrderBook] 没有活跃市场，请先运行 discover 命令")
-        return 0
+async def fetch_orderbooks_batch_async(token_ids: list[str], raw_levels: bool = False) -> list[dict]:
+    """fetch_orderbooks_batch 的异步版本，供多批并发使用（raw_levels 见 _parse_book）。"""
+    if not token_ids:
+        return []
 
-    if sport_filter:
-        sport_filter_lower = sport_filter.lower()
-        markets = [m for m in markets if _market_sport_match(m, sport_filter_lower)]
-
-    # 收集所有 token_id → condition_id 映射
-    token_to_condition: dict[str, str] = {}
-    for m in markets:
-        clob_ids = m.get("clob_token_ids", "")
-        condition_id = m.get("condition_id", "")
-        try:
-            ids = json.loads(clob_ids)
-            for tid in ids:
-                if tid:
-                    token_to_condition[tid] = condition_id
-        except (json.JSONDecodeError, TypeError):
-            pass
-
-    all_tokens = list(token_to_condition.keys())
+    body = [{"token_id": tid} for tid in token_ids]
+    data = await clob_post_async("/books", body)
+    if not data or not isinstance(data, list):
+        return []
+    return _parse_books(data, raw_levels)
+
+
+def fetch_all_active_orderbooks(sport_names: list[str] | None = None) -> int:
+    """获取所有活跃市场（sport_names 非空时只取这些运动）的 order book 快照并存入数据库。"""
+    init_db()
+    # token_id → condition_id（活跃市场，按 markets.sport 在库内过滤）
+    token_to_condition = {t["token_id"]: t["condition_id"] for t in get_active_tokens(sport_names)}
+    all_tokens = list(token_to_condition)
     if not all_tokens:
-        print("[OrderBook] 没有有效的 token ID")
+        print("[OrderBook] 没有活跃市场的 token，请先运行 discover 命令")
         return 0
 
     print(f"[OrderBook] 共 {len(all_tokens)} 个 token 需要查询 order book")
 
-    total_saved = 0
     batches = [all_tokens[i:i + BOOKS_BATCH_SIZE]
                for i in range(0, len(all_tokens), BOOKS_BATCH_SIZE)]
 
     pbar = tqdm(total=len(all_tokens), desc="获取 Order Book", unit="token")
-
-    for batch in batches:
-        books = fetch_orderbooks_batch(batch)
-        snapshot_time = datetime.now(timezone.utc).isoformat()
-
-        rows = []
-        for book in books:
-            token_id = book.get("asset_id", "")
-            rows.append({
-                "token_id": token_id,
-                "condition_id": token_to_condition.get(token_id, book.get("market", "")),
-                "snapshot_time": snapshot_time,
-                "bids_json": book.get("bids_json", "[]"),
-                "asks_json": book.get("asks_json", "[]"),
-                "best_bid": book.get("best_bid", 0),
-                "best_ask": book.get("best_ask", 0),
-                "spread": book.get("spread", 0),
-                "mid_price": book.get("mid_price", 0),
-                "last_trade_price": book.get("last_trade_price", 0),
-                "tick_size": book.get("tick_size", ""),
-                "total_bid_depth": book.get("total_bid_depth", 0),
-                "total_ask_depth": book.get("total_ask_depth", 0),
-            })
-
-        if rows:
-            saved = save_orderbook_snapshots(rows)
-            total_saved += saved
-
-        pbar.update(len(batch))
-        pbar.set_postfix({"saved": total_saved})
-
+    total_saved = asyncio.run(_fetch_batches_concurrently(batches, token_to_condition, pbar))
     pbar.close()
     print(f"[OrderBook] 完成: 保存 {total_saved} 个快照, 数据库总计 {get_snapshot_count()}")
     return total_saved
 
 
-def _parse_book(raw: dict) -> dict | None:
-    """将 CLOB API 返回的 order book 数据解析为标准格式。"""
+async def _fetch_batches_concurrently(
+    batches: list[list[str]],
+    token_to_condition: dict[str, str],
+    pbar: tqdm,
+) -> int:
+    """HTTP_MAX_INFLIGHT_PER_HOST 个协程依次领取批次并入库。
+
+    每个请求发出前才向 CLOB 令牌桶取令牌，429 降速后对尚未发出的批次立即生效
+    （不会在开始时为所有批次按初始速率预约好令牌）。
+    """
+    pending = iter(batches)
+    total_saved = 0
+
+    async def _worker():
+        nonlocal total_saved
+        for batch in pending:
+            books = await fetch_orderbooks_batch_async(batch, raw_levels=True)
+            snapshot_time = datetime.now(timezone.utc).isoformat()
+            rows = [_book_to_row(book, token_to_condition, snapshot_time) for book in books]
+            if rows:
+                saved = await get_writer().submit_async("orderbook_snapshots", rows)
+                total_saved += saved
+
+            pbar.update(len(batch))
+            pbar.set_postfix({"saved": total_saved})
+
+    try:
+        await asyncio.gather(*(_worker() for _ in range(min(HTTP_MAX_INFLIGHT_PER_HOST, len(batches)))))
+    finally:
+        await close_async_session()
+    return total_saved
+
+
+def _book_to_row(book: dict, token_to_condition: dict[str, str], snapshot_time: str) -> dict:
+    token_id = book.get("asset_id", "")
+    return {
+        "token_id": token_id,
+        "condition_id": token_to_condition.get(token_id, book.get("market", "")),
+        "snapshot_time": snapshot_time,
+        "bids": book.get("bids", []),
+        "asks": book.get("asks", []),
+        "best_bid": book.get("best_bid", 0),
+        "best_ask": book.get("best_ask", 0),
+        "spread": book.get("spread", 0),
+        "mid_price": book.get("mid_price", 0),
+        "last_trade_price": book.get("last_trade_price", 0),
+        "tick_size": book.get("tick_size", ""),
+        "total_bid_depth": book.get("total_bid_depth", 0),
+        "total_ask_depth": book.get("total_ask_depth", 0),
+    }
+
+
+def _parse_books(data: list, raw_levels: bool = False) -> list[dict]:
+    results = []
+    for book in data:
+        parsed = _parse_book(book, raw_levels)
+        if parsed:
+            results.append(parsed)
+    return results
+
+
+def _parse_book(raw: dict, raw_levels: bool = False) -> dict | None:
+    """将 CLOB API 返回的 order book 数据解析为标准格式。
+
+    档位默认为 bids_json / asks_json 文本；raw_levels=True 时改为 bids / asks 列表
+    （入库路径使用，按档位编码写入前无需再解析一次 JSON）。
+    """
     asset_id = raw.get("asset_id", "")
     if not asset_id:
         return None
@@ -135,11 +157,13 @@ def _parse_book(raw: dict) -> dict | None:
     except (ValueError, TypeError):
         ltp = 0
 
+    levels = {"bids": bids, "asks": asks} if raw_levels else {
+        "bids_json": json.dumps(bids), "asks_json": json.dumps(asks),
+    }
     return {
         "asset_id": asset_id,
         "market": raw.get("market", ""),
-        "bids_json": json.dumps(bids),
-        "asks_json": json.dumps(asks),
+        **levels,
         "best_bid": best_bid,
         "best_ask": best_ask,
         "spread": round(spread, 6),
@@ -149,10 +173,3 @@ def _parse_book(raw: dict) -> dict | None:
         "total_bid_depth": round(total_bid, 2),
         "total_ask_depth": round(total_ask, 2),
     }
-
-
-def _market_sport_match(market: dict, sport_filter: str) -> bool:
-    """粗略判断 market 是否属于指定运动（通过 event 关联）。"""
-    slug = (market.get("slug") or "").lower()
-    question = (market.get("question") or "").lower()
-    return sport_filter in slug or sport_filter in question
@@ -10,7 +10,7 @@ from typing import Callable
 import websocket
 
 from config import WS_MARKET_URL
-from src.database import init_db, save_orderbook_snapshots
+from src.database import init_db, get_writer
 
 
 class OrderBookStreamer:
@@ -57,14 +57,18 @@ class OrderBookStreamer:
             on_close=self._on_close,
         )
 
-        while not self._stop:
-            try:
-                self._ws.run_forever(ping_interval=30, ping_timeout=10)
-            except Exception as exc:
-                print(f"[WS] 连接异常: {exc}")
-            if not self._stop:
-                print("[WS] 3 秒后重连...")
-                time.sleep(3)
+        try:
+            while not self._stop:
+                try:
+                    self._ws.run_forever(ping_interval=30, ping_timeout=10)
+                except Exception as exc:
+                    print(f"[WS] 连接异常: {exc}")
+                if not self._stop:
+                    print("[WS] 3 秒后重连...")
+                    time.sleep(3)
+        finally:
+            if self.save_to_db:
+                self._flush_pending()
 
     def stop(self):
         self._stop = True
@@ -125,8 +129,8 @@ class OrderBookStreamer:
                 "token_id": data.get("asset_id", ""),
                 "condition_id": data.get("market", ""),
                 "snapshot_time": datetime.now(timezone.utc).isoformat(),
-                "bids_json": json.dumps(bids),
-                "asks_json": json.dumps(asks),
+                "bids": bids,
+                "asks": asks,
                 "best_bid": best_bid,
                 "best_ask": best_ask,
                 "spread": round(spread, 6),
@@ -145,16 +149,24 @@ class OrderBookStreamer:
     def _on_close(self, ws, close_status_code, close_msg):
         print(f"[WS] 连接关闭: {close_status_code} {close_msg}")
 
+    def _flush_pending(self):
+        """把已缓冲的快照交给写入线程，提交后打印条数（不阻塞本线程）。"""
+        with self._lock:
+            batch = self._pending_snapshots.copy()
+            self._pending_snapshots.clear()
+        if batch:
+            get_writer().submit("orderbook_snapshots", batch).add_done_callback(self._on_flushed)
+
+    @staticmethod
+    def _on_flushed(fut):
+        if fut.exception() is None:
+            print(f"  [WS-DB] 写入 {fut.result()} 条快照")
+
     def _start_flush_thread(self):
         def _flush():
             while not self._stop:
                 time.sleep(self.save_interval)
-                with self._lock:
-                    batch = self._pending_snapshots.copy()
-                    self._pending_snapshots.clear()
-                if batch:
-                    saved = save_orderbook_snapshots(batch)
-                    print(f"  [WS-DB] 写入 {saved} 条快照")
+                self._flush_pending()
 
         t = threading.Thread(target=_flush, daemon=True)
         t.start()
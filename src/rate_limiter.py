@@ -0,0 +1,113 @@
+"""按 host 的自适应令牌桶限流 — Gamma / CLOB / Data API 各自独立限速
+
+每个 API base URL 持有一个 TokenBucket：
+  - reserve() 预约一个令牌，返回需要等待的秒数；调用方自行 time.sleep / asyncio.sleep，
+    桶内只在 threading.Lock 下做计算，因此线程与 asyncio 协程都可安全共用。
+  - AIMD 自适应：收到 429 时速率乘性下降（并遵守 Retry-After 暂停），
+    连续成功 RATE_LIMIT_SUCCESS_WINDOW 次后速率加性回升，直到上限。
+"""
+from __future__ import annotations
+
+import threading
+import time
+from urllib.parse import urlsplit
+
+from config import (
+    REQUEST_DELAY,
+    RATE_LIMITS,
+    RATE_LIMIT_MIN,
+    RATE_LIMIT_MAX_FACTOR,
+    RATE_LIMIT_INCREASE,
+    RATE_LIMIT_DECREASE,
+    RATE_LIMIT_SUCCESS_WINDOW,
+)
+
+
+class TokenBucket:
+    """线程安全的令牌桶，支持 AIMD 速率调整。"""
+
+    def __init__(
+        self,
+        rate: float,
+        burst: int,
+        min_rate: float = RATE_LIMIT_MIN,
+        max_rate: float | None = None,
+    ):
+        self.rate = rate
+        self.burst = burst
+        self.min_rate = min_rate
+        self.max_rate = max_rate if max_rate is not None else rate * RATE_LIMIT_MAX_FACTOR
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+        self._successes = 0
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """取走一个令牌（允许透支），返回调用方需要等待的秒数。"""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self._tokens -= 1
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+            return max(wait, self._blocked_until - now)
+
+    def on_success(self):
+        """加性增：连续成功一个窗口后提升速率。"""
+        with self._lock:
+            self._successes += 1
+            if self._successes >= RATE_LIMIT_SUCCESS_WINDOW:
+                self._successes = 0
+                self._set_rate(self.rate + RATE_LIMIT_INCREASE)
+
+    def on_throttle(self, retry_after: float | None = None):
+        """乘性减：收到 429 后降速，并按 Retry-After 暂停整个 host。"""
+        with self._lock:
+            now = time.monotonic()
+            self._successes = 0
+            self._set_rate(self.rate * RATE_LIMIT_DECREASE, now)
+            self._tokens = min(self._tokens, 0.0)
+            if retry_after:
+                self._blocked_until = max(self._blocked_until, now + retry_after)
+
+    def _refill(self, now: float):
+        elapsed = now - self._updated
+        if elapsed > 0:
+            self._tokens = min(float(self.burst), self._tokens + elapsed * self.rate)
+            self._updated = now
+
+    def _set_rate(self, rate: float, now: float | None = None):
+        # 先按旧速率结算已累积的令牌，再切换速率
+        self._refill(now if now is not None else time.monotonic())
+        self.rate = min(self.max_rate, max(self.min_rate, rate))
+
+
+_buckets: dict[str, TokenBucket] = {}
+_buckets_lock = threading.Lock()
+
+
+def _bucket_key(url: str) -> str:
+    for base in RATE_LIMITS:
+        if url.startswith(base):
+            return base
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}"
+
+
+def get_bucket(url: str) -> TokenBucket:
+    """返回 url 所属 host 的令牌桶（按需创建）。"""
+    key = _bucket_key(url)
+    bucket = _buckets.get(key)
+    if bucket is None:
+        with _buckets_lock:
+            bucket = _buckets.get(key)
+            if bucket is None:
+                rate, burst = RATE_LIMITS.get(key, (1 / REQUEST_DELAY, 1))
+                bucket = TokenBucket(rate, burst)
+                _buckets[key] = bucket
+    return bucket
+
+
+def current_rates() -> dict[str, float]:
+    """各 host 当前的自适应速率（请求/秒）。"""
+    return {key: round(b.rate, 3) for key, b in _buckets.items()}
@@ -24,7 +24,7 @@ from config import (
     CHAIN_WS_PORT,
     CHAIN_BACKFILL_BLOCKS,
 )
-from src.database import init_db, get_connection, save_trades
+from src.database import init_db, get_reader, get_writer
 
 
 class ChainTradeStreamer:
@@ -33,12 +33,12 @@ class ChainTradeStreamer:
     def __init__(
         self,
         rpc_url: str,
-        sport_filter: str | None = None,
+        sport_names: list[str] | None = None,
         ws_port: int = CHAIN_WS_PORT,
         backfill_blocks: int = CHAIN_BACKFILL_BLOCKS,
     ):
         self.rpc_url = rpc_url
-        self.sport_filter = sport_filter
+        self.sport_names = sport_names
         self.ws_port = ws_port
         self.backfill_blocks = backfill_blocks
 
@@ -68,8 +68,8 @@ class ChainTradeStreamer:
               f"({len(unique_conditions)} 个市场)")
         print(f"[ChainStream] RPC: {self.rpc_url[:60]}...")
         print(f"[ChainStream] 本地推送: ws://localhost:{self.ws_port}")
-        if self.sport_filter:
-            print(f"[ChainStream] 运动过滤: {self.sport_filter}")
+        if self.sport_names:
+            print(f"[ChainStream] 运动过滤: {', '.join(self.sport_names)}")
         print()
 
         self._running = True
@@ -94,35 +94,25 @@ class ChainTradeStreamer:
     # ── Token lookup from DB ──────────────────────────────
 
     def _build_token_lookup(self):
-        """从 markets + events 表构建 token_id → 市场信息 映射。"""
-        conn = get_connection()
+        """从 tokens + markets + events 表构建 token_id → 市场信息 映射。"""
+        conn = get_reader()
         sql = """
-            SELECT m.condition_id, m.clob_token_ids, m.outcomes, m.neg_risk,
-                   e.slug AS event_slug, e.sport
-            FROM markets m
-            JOIN events e ON m.event_id = e.id
+            SELECT t.token_id, t.condition_id, t.outcome, e.slug AS event_slug
+            FROM tokens t
+            JOIN markets m ON m.id = t.market_id
+            JOIN events e ON t.event_id = e.id
         """
         params: list = []
-        if self.sport_filter:
-            sql += " WHERE LOWER(e.sport) LIKE ? OR LOWER(e.slug) LIKE ?"
-            like = f"%{self.sport_filter.lower()}%"
-            params = [like, like]
+        if self.sport_names:
+            sql += f" WHERE m.sport IN ({','.join('?' * len(self.sport_names))})"
+            params = list(self.sport_names)
 
-        for row in conn.execute(sql, params).fetchall():
-            r = dict(row)
-            try:
-                tids = json.loads(r.get("clob_token_ids") or "[]")
-                outs = json.loads(r.get("outcomes") or "[]")
-            except (json.JSONDecodeError, TypeError):
-                continue
-            for i, tid in enumerate(tids):
-                if not tid:
-                    continue
-                self._token_lookup[str(tid)] = {
-                    "condition_id": r["condition_id"],
-                    "event_slug": r["event_slug"],
-                    "outcome": outs[i] if i < len(outs) else "",
-                }
+        for r in conn.execute(sql, params):
+            self._token_lookup[r["token_id"]] = {
+                "condition_id": r["condition_id"],
+                "event_slug": r["event_slug"],
+                "outcome": r["outcome"],
+            }
 
     # ── RPC connection loop (reconnect with backoff) ──────
 
@@ -245,7 +235,7 @@ class ChainTradeStreamer:
                     trades.append(t)
 
             if trades:
-                total_saved += save_trades(trades)
+                total_saved += await get_writer().submit_async("trades", trades)
 
         print(f"[ChainStream] 回补完成: 新增 {total_saved} 笔体育交易")
 
@@ -271,7 +261,7 @@ class ChainTradeStreamer:
         if not trades:
             return
 
-        saved = save_trades(trades)
+        saved = await get_writer().submit_async("trades", trades)
         self._stats["trades"] += len(trades)
         self._stats["saved"] += saved
 
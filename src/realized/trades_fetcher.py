@@ -9,6 +9,7 @@ from src.database import (
     init_db, get_all_markets, save_trades, save_progress, get_progress,
     get_trade_count, get_trade_count_by_condition,
 )
+from src.trade_dedup import trade_key
 
 
 def fetch_trades_for_market(condition_id: str, event_slug: str = "") -> list[dict]:
@@ -33,24 +34,18 @@ def fetch_trades_for_market(condition_id: str, event_slug: str = "") -> list[dic
 
 
 def fetch_all_trades(
-    sport_filter: str | None = None,
+    sport_names: list[str] | None = None,
     resume: bool = True,
     skip_fetched: bool = True,
 ) -> int:
-    """获取所有市场的成交记录。"""
+    """获取所有市场（sport_names 非空时只取这些运动）的成交记录。"""
     init_db()
-    markets = get_all_markets()
+    markets = get_all_markets(sport_names)
     if not markets:
         print("[Trades] 没有市场数据，请先运行 discover 命令")
         return 0
 
-    if sport_filter:
-        sport_lower = sport_filter.lower()
-        markets = [m for m in markets
-                   if sport_lower in (m.get("slug") or "").lower()
-                   or sport_lower in (m.get("question") or "").lower()]
-
-    task_name = f"trades_{sport_filter or 'all'}"
+    task_name = f"trades_{','.join(sport_names) if sport_names else 'all'}"
     start_slug = ""
     if resume:
         progress = get_progress(task_name)
@@ -156,13 +151,7 @@ def _merge_deduplicate(trades: list[dict]) -> list[dict]:
     seen = set()
     unique = []
     for t in trades:
-        key = (
-            t.get("transaction_hash", ""),
-            t.get("trade_timestamp", 0),
-            round(t.get("size", 0), 8),
-            t.get("side", ""),
-            t.get("proxy_wallet", ""),
-        )
+        key = trade_key(t)
         if key not in seen:
             seen.add(key)
             unique.append(t)
@@ -0,0 +1,106 @@
+"""请求录制 / 回放存档 — 把真实 API 响应录成 gzip JSONL，供本地模拟服务器回放
+
+每行一条记录:
+  {"m": "GET", "api": "gamma", "path": "/events", "q": "limit=100&offset=0&...",
+   "b": <POST body 哈希或 null>, "s": 200, "d": <响应文本>}
+
+录制与回放使用同一套 request_key()，保证查询参数顺序、布尔值写法一致。
+"""
+from __future__ import annotations
+
+import gzip
+import hashlib
+import json
+import os
+import threading
+from typing import Any, Iterator
+from urllib.parse import urlencode, urlsplit
+
+from config import GAMMA_API_BASE, CLOB_API_BASE, DATA_API_BASE
+
+API_BASES = {"gamma": GAMMA_API_BASE, "clob": CLOB_API_BASE, "data": DATA_API_BASE}
+
+
+def split_api_url(url: str) -> tuple[str, str]:
+    """把完整 URL 拆成 (api 名, 路径)，如 ("gamma", "/events")。"""
+    for name, base in API_BASES.items():
+        if url.startswith(base):
+            return name, urlsplit(url).path[len(urlsplit(base).path):] or "/"
+    parts = urlsplit(url)
+    return parts.netloc, parts.path or "/"
+
+
+def canonical_query(params: Any) -> str:
+    """参数 dict 或 (key, value) 序列 → 排序后的查询串；列表值展开为重复 key。"""
+    items = params.items() if isinstance(params, dict) else (params or [])
+    pairs = []
+    for k, v in items:
+        if v is None:
+            continue
+        if isinstance(v, (list, tuple)):
+            pairs.extend((k, str(x)) for x in v)
+        else:
+            pairs.append((k, str(v)))
+    return urlencode(sorted(pairs))
+
+
+def body_hash(json_body: Any) -> str | None:
+    if json_body is None:
+        return None
+    raw = json.dumps(json_body, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()[:16]
+
+
+def request_key(method: str, api: str, path: str, query: str, bhash: str | None) -> str:
+    return f"{method} {api}{path}?{query}#{bhash or ''}"
+
+
+class Recorder:
+    """线程安全地把响应追加写入 gzip JSONL 存档。"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.count = 0
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._fh = gzip.open(path, "at", encoding="utf-8")
+        self._lock = threading.Lock()
+
+    def record(
+        self,
+        method: str,
+        url: str,
+        params: dict[str, Any] | None,
+        json_body: Any,
+        status: int,
+        text: str,
+    ):
+        api, path = split_api_url(url)
+        line = json.dumps({
+            "m": method, "api": api, "path": path,
+            "q": canonical_query(params), "b": body_hash(json_body),
+            "s": status, "d": text,
+        }, ensure_ascii=False, separators=(",", ":"))
+        with self._lock:
+            self._fh.write(line + "\n")
+            self.count += 1
+
+    def close(self):
+        with self._lock:
+            self._fh.close()
+
+
+def iter_archive(path: str) -> Iterator[dict]:
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+
+
+def load_archive(path: str) -> dict[str, tuple[int, str]]:
+    """读取存档为 {request_key: (status, body)}；同一请求多次录制时以最后一次为准。"""
+    responses = {}
+    for rec in iter_archive(path):
+        key = request_key(rec["m"], rec["api"], rec["path"], rec["q"], rec.get("b"))
+        responses[key] = (rec["s"], rec["d"])
+    return responses
@@ -0,0 +1,219 @@
+"""存储保留任务 — 旧数据拆入日分区、旧快照分区降采样、过期分区归档后删除
+
+  - 原表 orderbook_snapshots / trades 中启用分区前写入的数据，按 UTC 日移入对应分区表；
+    关键帧落在另一天的增量快照先就地还原为完整快照，使每个分区都能独立还原
+  - 早于 downsample_days 天的快照分区：每个 token 每 interval 秒只保留最早一条；
+    保留下来的增量快照所引用的关键帧一并保留，降采样后的数据仍可完整还原
+  - 早于 snapshot_days / trade_days 天的分区：archive 为真时先复制到 ARCHIVE_DIR/<表名>.db
+    （与分区同结构的独立 SQLite 文件，可直接查询），核对行数后再删除分区表
+  - 所有修改都经由写线程执行，与采集写入串行，可在采集进程运行时执行
+"""
+from __future__ import annotations
+
+import os
+import sqlite3
+from datetime import datetime, timedelta, timezone
+
+from config import (
+    ARCHIVE_DIR, RETENTION_ARCHIVE, RETENTION_DOWNSAMPLE_DAYS, RETENTION_DOWNSAMPLE_SECONDS,
+    RETENTION_SNAPSHOT_DAYS, RETENTION_TRADE_DAYS, STORAGE_PARTITION_BY_DAY,
+)
+from src.database import (
+    day_after, drop_partition, ensure_partition, get_reader, partition_day,
+    partition_tables, run_in_writer, stored_levels,
+)
+from src.orderbook.delta import reconstruct_levels
+
+
+# ── 原表拆分 ──────────────────────────────────────────────
+
+def _columns(conn: sqlite3.Connection, table: str) -> str:
+    return ", ".join(r["name"] for r in conn.execute(f"PRAGMA table_info({table})") if r["name"] != "id")
+
+
+def _materialize_cross_day(conn: sqlite3.Connection) -> int:
+    """原表中关键帧不在同一天的增量快照 → 完整快照（base_time 置空）。"""
+    rows = conn.execute(
+        "SELECT * FROM orderbook_snapshots WHERE base_time IS NOT NULL "
+        "AND substr(base_time, 1, 10) != substr(snapshot_time, 1, 10)"
+    ).fetchall()
+    updates = []
+    for r in rows:
+        levels = reconstruct_levels(conn, dict(r))
+        if levels is not None:
+            updates.append((*stored_levels(*levels), r["id"]))
+    conn.executemany(
+        "UPDATE orderbook_snapshots SET base_time=NULL, bids_json=?, asks_json=?, book_blob=? WHERE id=?",
+        updates,
+    )
+    return len(updates)
+
+
+def _move_day(base: str, day: str, where: str, params: tuple) -> int:
+    def _move(conn: sqlite3.Connection) -> int:
+        table = ensure_partition(conn, base, day)
+        cols = _columns(conn, base)
+        n = conn.execute(
+            f"INSERT OR IGNORE INTO {table} ({cols}) SELECT {cols} FROM {base} WHERE {where}", params
+        ).rowcount
+        conn.execute(f"DELETE FROM {base} WHERE {where}", params)
+        return n
+
+    return run_in_writer(_move)
+
+
+def split_legacy() -> dict[str, int]:
+    """把原表中的快照/成交按 UTC 日移入分区表（每天一个事务），返回各表移动的行数。"""
+    conn = get_reader()
+    moved = {"orderbook_snapshots": 0, "trades": 0}
+
+    if conn.execute("SELECT 1 FROM orderbook_snapshots LIMIT 1").fetchone():
+        fixed = run_in_writer(_materialize_cross_day)
+        if fixed:
+            print(f"[Retention] 跨日增量快照还原为完整快照: {fixed} 条")
+        days = [r[0] for r in conn.execute(
+            "SELECT DISTINCT substr(snapshot_time, 1, 10) FROM orderbook_snapshots"
+        )]
+        for iso in days:
+            day = (iso or "").replace("-", "")
+            if len(day) != 8 or not day.isdigit():
+                continue
+            nxt = day_after(day)
+            moved["orderbook_snapshots"] += _move_day(
+                "orderbook_snapshots", day, "snapshot_time >= ? AND snapshot_time < ?",
+                (iso, f"{nxt[:4]}-{nxt[4:6]}-{nxt[6:]}"),
+            )
+
+    if conn.execute("SELECT 1 FROM trades LIMIT 1").fetchone():
+        run_in_writer(lambda c: c.execute(
+            "CREATE INDEX IF NOT EXISTS idx_trades_ts ON trades(trade_timestamp)").rowcount)
+        for (d,) in conn.execute("SELECT DISTINCT trade_timestamp / 86400 FROM trades").fetchall():
+            if d is None:
+                continue
+            day = datetime.fromtimestamp(d * 86400, tz=timezone.utc).strftime("%Y%m%d")
+            moved["trades"] += _move_day(
+                "trades", day, "trade_timestamp >= ? AND trade_timestamp < ?",
+                (d * 86400, (d + 1) * 86400),
+            )
+    return moved
+
+
+# ── 降采样 ────────────────────────────────────────────────
+
+def downsample_partition(table: str, interval: int = RETENTION_DOWNSAMPLE_SECONDS) -> int:
+    """快照分区内每个 token 每 interval 秒只保留最早一条（及其引用的关键帧），返回删除的行数。"""
+
+    def _downsample(conn: sqlite3.Connection) -> int:
+        conn.execute("DROP TABLE IF EXISTS temp.retention_keep")
+        conn.execute("CREATE TEMP TABLE retention_keep (id INTEGER PRIMARY KEY)")
+        conn.execute(
+            f"INSERT INTO temp.retention_keep SELECT MIN(id) FROM {table} "
+            f"GROUP BY token_id, CAST(strftime('%s', snapshot_time) AS INTEGER) / ?",
+            (interval,),
+        )
+        conn.execute(
+            f"INSERT OR IGNORE INTO temp.retention_keep "
+            f"SELECT k.id FROM temp.retention_keep AS kept "
+            f"JOIN {table} AS d ON d.id = kept.id "
+            f"JOIN {table} AS k ON k.token_id = d.token_id AND k.snapshot_time = d.base_time "
+            f"AND k.base_time IS NULL "
+            f"WHERE d.base_time IS NOT NULL"
+        )
+        n = conn.execute(
+            f"DELETE FROM {table} WHERE id NOT IN (SELECT id FROM temp.retention_keep)"
+        ).rowcount
+        conn.execute("DROP TABLE temp.retention_keep")
+        return n
+
+    return run_in_writer(_downsample)
+
+
+# ── 归档与删除 ────────────────────────────────────────────
+
+def archive_partition(table: str, archive_dir: str = ARCHIVE_DIR) -> str:
+    """把分区表（含索引）复制到 archive_dir/<表名>.db，核对行数一致后返回文件路径。"""
+    os.makedirs(archive_dir, exist_ok=True)
+    path = os.path.join(archive_dir, f"{table}.db")
+    src = get_reader()
+    schema = [r[0] for r in src.execute(
+        "SELECT sql FROM sqlite_master WHERE tbl_name=? AND sql IS NOT NULL ORDER BY type='index'",
+        (table,),
+    )]
+    expected = src.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+
+    dst = sqlite3.connect(path)
+    try:
+        dst.execute(f"DROP TABLE IF EXISTS {table}")
+        dst.execute(schema[0])
+        cur = src.execute(f"SELECT * FROM {table}")
+        marks = ", ".join("?" * len(cur.description))
+        with dst:
+            dst.executemany(f"INSERT INTO {table} VALUES ({marks})", cur)
+        for stmt in schema[1:]:
+            dst.execute(stmt)
+        copied = dst.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+    finally:
+        dst.close()
+    if copied != expected:
+        raise RuntimeError(f"归档 {table} 行数不一致: 源 {expected} / 归档 {copied}")
+    return path
+
+
+def _expire(base: str, cutoff: str, archive: bool) -> tuple[int, int]:
+    """删除 base 中日期早于 cutoff 的分区，返回 (分区数, 行数)。"""
+    conn = get_reader()
+    tables = [t for t in partition_tables(conn, base) if partition_day(t) and partition_day(t) < cutoff]
+    rows = 0
+    for table in tables:
+        if archive:
+            path = archive_partition(table)
+            print(f"[Retention] 归档 {table} → {path}")
+        rows += drop_partition(table)
+    return len(tables), rows
+
+
+def _cutoff(today: datetime, days: int) -> str:
+    return (today - timedelta(days=days)).strftime("%Y%m%d")
+
+
+def run_retention(
+    today: datetime | None = None,
+    downsample_days: int | None = RETENTION_DOWNSAMPLE_DAYS,
+    interval: int = RETENTION_DOWNSAMPLE_SECONDS,
+    snapshot_days: int | None = RETENTION_SNAPSHOT_DAYS,
+    trade_days: int | None = RETENTION_TRADE_DAYS,
+    archive: bool = RETENTION_ARCHIVE,
+) -> dict[str, int]:
+    """执行一次保留任务：拆分原表 → 删除过期分区 → 降采样旧快照分区。天数为 None 的步骤跳过。
+
+    未启用按日分区（STORAGE_PARTITION_BY_DAY=False）时不拆分原表，只处理已有的分区。
+    """
+    today = today or datetime.now(timezone.utc)
+    stats = {"moved_snapshots": 0, "moved_trades": 0, "downsampled_partitions": 0, "downsampled_rows": 0,
+             "dropped_snapshot_partitions": 0, "dropped_snapshot_rows": 0,
+             "dropped_trade_partitions": 0, "dropped_trade_rows": 0}
+
+    moved = split_legacy() if STORAGE_PARTITION_BY_DAY else {"orderbook_snapshots": 0, "trades": 0}
+    stats["moved_snapshots"], stats["moved_trades"] = moved["orderbook_snapshots"], moved["trades"]
+    if any(moved.values()):
+        print(f"[Retention] 原表拆入日分区: 快照 {moved['orderbook_snapshots']} / 成交 {moved['trades']}")
+
+    if snapshot_days is not None:
+        n, rows = _expire("orderbook_snapshots", _cutoff(today, snapshot_days), archive)
+        stats["dropped_snapshot_partitions"], stats["dropped_snapshot_rows"] = n, rows
+    if trade_days is not None:
+        n, rows = _expire("trades", _cutoff(today, trade_days), archive)
+        stats["dropped_trade_partitions"], stats["dropped_trade_rows"] = n, rows
+
+    if downsample_days is not None:
+        cutoff = _cutoff(today, downsample_days)
+        for table in partition_tables(get_reader(), "orderbook_snapshots"):
+            day = partition_day(table)
+            if day is None or day >= cutoff:
+                continue
+            removed = downsample_partition(table, interval)
+            stats["downsampled_partitions"] += 1
+            stats["downsampled_rows"] += removed
+            if removed:
+                print(f"[Retention] 降采样 {table}: 删除 {removed} 条")
+    return stats
@@ -0,0 +1,130 @@
+"""成交去重过滤器 — 写线程在 INSERT OR IGNORE 之前剔除已入库的成交，省掉注定被唯一约束拒绝的插入
+
+  - 键与 trades_fetcher._merge_deduplicate 一致: (transaction_hash, trade_timestamp, round(size, 8),
+    side, proxy_wallet)，保存其 64 位 blake2b 指纹；已有 N 个指纹时单次误判（把新成交当成重复）
+    的概率约 N / 2^64，200 万条约 1e-13
+  - 只记录确认在库中的成交：本批指纹先记为待定，写线程提交成功后并入，事务回滚时丢弃
+  - 有界：两代集合轮换，当前代满 capacity/2 时丢弃上一代，最近写入的成交始终在过滤器内
+  - 关闭时持久化，文件头记录各成交表的最大 id；加载时任一表缺失或最大 id 变小（库被重建、
+    分区被删除或拆分）即整体作废，过滤器只会漏判、不会误挡
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+from array import array
+from typing import Iterable, Iterator
+
+from config import TRADE_DEDUP_CAPACITY
+
+_MAGIC = b"PMTD1\n"
+
+
+def trade_key(t: dict) -> tuple:
+    """成交去重键（与 trades 表唯一约束对应，size 保留 8 位小数）。"""
+    return (
+        t.get("transaction_hash", ""),
+        t.get("trade_timestamp", 0),
+        round(t.get("size", 0), 8),
+        t.get("side", ""),
+        t.get("proxy_wallet", ""),
+    )
+
+
+def fingerprint(t: dict) -> int:
+    """去重键的 64 位指纹（跨进程稳定，可持久化）。"""
+    tx, ts, size, side, wallet = trade_key(t)
+    digest = hashlib.blake2b(f"{tx}|{ts}|{size!r}|{side}|{wallet}".encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "little")
+
+
+class TradeDedupFilter:
+    """写线程独占的成交指纹集合（不加锁）。"""
+
+    def __init__(self, capacity: int = TRADE_DEDUP_CAPACITY):
+        self.capacity = capacity
+        self._current: set[int] = set()
+        self._previous: set[int] = set()
+        self._pending: set[int] = set()
+        self.stats = {"checked": 0, "filtered": 0, "admitted": 0, "db_duplicates": 0, "loaded": 0}
+
+    def __len__(self) -> int:
+        return len(self._current) + len(self._previous)
+
+    def __contains__(self, fp: int) -> bool:
+        return fp in self._current or fp in self._previous or fp in self._pending
+
+    def admit(self, rows: Iterable[dict]) -> Iterator[dict]:
+        """惰性产出过滤器中没有的成交，并把它们的指纹记为待定（批内重复也只放行一次）。"""
+        for r in rows:
+            fp = fingerprint(r)
+            self.stats["checked"] += 1
+            if fp in self:
+                self.stats["filtered"] += 1
+                continue
+            self._pending.add(fp)
+            self.stats["admitted"] += 1
+            yield r
+
+    def seed(self, rows: Iterable[dict]):
+        """直接并入已确认在库中的成交（迁移旧数据时用），按顺序写入，超出容量时保留最后的部分。"""
+        for r in rows:
+            self._current.add(fingerprint(r))
+            if len(self._current) >= self.capacity // 2:
+                self._previous, self._current = self._current, set()
+
+    def commit(self):
+        """事务提交后：待定指纹并入当前代，必要时轮换。"""
+        if not self._pending:
+            return
+        self._current |= self._pending
+        self._pending = set()
+        if len(self._current) >= self.capacity // 2:
+            self._previous, self._current = self._current, set()
+
+    def rollback(self):
+        self._pending.clear()
+
+    def clear(self):
+        self._current.clear()
+        self._previous.clear()
+        self._pending.clear()
+
+    def snapshot(self) -> dict[str, float]:
+        st = dict(self.stats)
+        st["size"] = len(self)
+        st["hit_rate"] = round(st["filtered"] / st["checked"], 4) if st["checked"] else 0.0
+        return st
+
+    # ── 持久化 ────────────────────────────────────────────
+
+    def save(self, path: str, marks: dict[str, int]):
+        """写入 path（先写临时文件再替换）；marks 为保存时各成交表的最大 id。"""
+        header = json.dumps({"marks": marks, "previous": len(self._previous), "current": len(self._current)})
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(_MAGIC)
+            f.write(header.encode() + b"\n")
+            array("Q", self._previous).tofile(f)
+            array("Q", self._current).tofile(f)
+        os.replace(tmp, path)
+
+    def load(self, path: str, marks: dict[str, int]) -> bool:
+        """从 path 加载；文件缺失、格式不符或与当前库不一致时返回 False（过滤器保持为空）。"""
+        try:
+            with open(path, "rb") as f:
+                if f.readline() != _MAGIC:
+                    return False
+                header = json.loads(f.readline())
+                saved = header["marks"]
+                if any(table not in marks or marks[table] < hi for table, hi in saved.items()):
+                    return False
+                previous, current = array("Q"), array("Q")
+                previous.fromfile(f, header["previous"])
+                current.fromfile(f, header["current"])
+        except (OSError, EOFError, ValueError, KeyError):
+            return False
+        self._previous, self._current = set(previous), set(current)
+        self.stats["loaded"] = len(self)
+        return True
@@ -0,0 +1,66 @@
+"""中间价 K 线：单边盘口（mid_price=0）的快照不参与聚合。"""
+import pytest
+
+from src import database, duckdb_store
+
+BUCKET = 1_735_689_600   # 2025-01-01T00:00:00Z
+TOKEN = "tok-1"
+
+
+def _snapshot(second: int, mid: float) -> dict:
+    bid, ask = (mid - 0.01, mid + 0.01) if mid else (0, 0.55)
+    return {
+        "token_id": TOKEN, "condition_id": "0xcond",
+        "snapshot_time": f"2025-01-01T00:00:{second:02d}+00:00",
+        "bids": [{"price": f"{bid:.2f}", "size": "10"}] if bid else [],
+        "asks": [{"price": f"{ask:.2f}", "size": "10"}],
+        "best_bid": bid, "best_ask": ask, "spread": round(ask - bid, 6), "mid_price": mid,
+        "last_trade_price": None, "tick_size": "0.01", "total_bid_depth": 10 if bid else 0, "total_ask_depth": 10,
+    }
+
+
+# 第 0 / 59 秒是单边盘口：若被计入，open / close / low 都会变成 0
+ROWS = [_snapshot(0, 0), _snapshot(10, 0.50), _snapshot(20, 0.40), _snapshot(30, 0.60), _snapshot(59, 0)]
+
+
+def _minute_bar() -> dict:
+    bars = database.get_mid_candles(TOKEN, 60)
+    assert len(bars) == 1 and bars[0]["bucket"] == BUCKET
+    return bars[0]
+
+
+def _assert_two_sided_only(bar: dict):
+    assert (bar["open"], bar["high"], bar["low"], bar["close"]) == (0.50, 0.60, 0.40, 0.60)
+    assert bar["samples"] == 3
+
+
+@pytest.fixture
+def sqlite_db(tmp_path):
+    database.set_backend("sqlite", str(tmp_path / "test.db"))
+    database.set_candle_intervals([60])
+    database.init_db()
+    yield
+    database.close_db()
+
+
+def test_incremental_skips_one_sided_books(sqlite_db):
+    database.save_orderbook_snapshots(ROWS)
+    _assert_two_sided_only(_minute_bar())
+
+
+def test_rebuild_skips_one_sided_books(sqlite_db):
+    database.save_orderbook_snapshots(ROWS)
+    database.rebuild_candles()
+    _assert_two_sided_only(_minute_bar())
+
+
+@pytest.mark.skipif(not duckdb_store.available(), reason="未安装 duckdb")
+def test_duckdb_view_skips_one_sided_books(tmp_path):
+    database.set_backend("duckdb", str(tmp_path / "test.duckdb"))
+    database.set_candle_intervals([60])
+    database.init_db()
+    try:
+        database.save_orderbook_snapshots(ROWS)
+        _assert_two_sided_only(_minute_bar())
+    finally:
+        database.set_backend("sqlite")
@@ -0,0 +1,47 @@
+"""事件分页预取：末页（不满一页或空页）返回后不再请求更后面的 offset。"""
+import asyncio
+
+import pytest
+
+from config import EVENTS_PAGE_SIZE
+from src.discovery.events_fetcher import _PagePrefetch
+
+
+def _crawl(total: int, depth: int = 3) -> tuple[list[int], list[int]]:
+    """翻完 total 条事件，返回 (请求过的 offset, 各页行数)；每页交付后让出几次事件循环，模拟入库耗时。"""
+    requested: list[int] = []
+
+    async def _fetch(offset: int):
+        requested.append(offset)
+        await asyncio.sleep(0)
+        return list(range(offset, min(offset + EVENTS_PAGE_SIZE, total)))
+
+    async def _run():
+        pages = _PagePrefetch(_fetch, 0, depth)
+        sizes = []
+        try:
+            while True:
+                data = await pages.next()
+                sizes.append(len(data))
+                for _ in range(3):
+                    await asyncio.sleep(0)
+                if len(data) < EVENTS_PAGE_SIZE:
+                    return sizes
+        finally:
+            pages.close()
+
+    sizes = asyncio.run(_run())
+    return requested, sizes
+
+
+@pytest.mark.parametrize("total, pages", [
+    (EVENTS_PAGE_SIZE // 2, 1),            # 只有一页且不满
+    (EVENTS_PAGE_SIZE * 5 // 2, 3),        # 末页不满
+    (EVENTS_PAGE_SIZE * 2, 3),             # 恰好整页，末页为空
+    (EVENTS_PAGE_SIZE * 12 + 1, 13),
+])
+def test_no_requests_past_last_page(total, pages):
+    requested, sizes = _crawl(total)
+    assert sum(sizes) == total
+    assert len(sizes) == pages
+    assert sorted(requested) == [i * EVENTS_PAGE_SIZE for i in range(pages)]